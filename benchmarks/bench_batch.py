@@ -0,0 +1,36 @@
+# Measures batch evaluation throughput with 1, 2, 4... workers, up to the
+# number of CPUs. Each item is parsed and normalized by a worker.
+#
+#   python -m benchmarks.bench_batch
+
+import time
+from os import cpu_count
+
+from lamedh import batch
+
+ITEMS = 64
+PLUS = '(λm.λn.λf.λx.((m f) ((n f) x)))'
+
+
+def numeral(n):
+    return '(λf.λx.%s)' % ('(f ' * n + 'x' + ')' * n)
+
+
+def items():
+    for i in range(ITEMS):
+        yield f'({PLUS} {numeral(i % 4 + 4)}) {numeral(i % 3 + 4)}'
+
+
+def measure(workers):
+    start = time.perf_counter()
+    outcomes = list(batch.evaluate(items(), 'goto_normal_form', max_steps=1000, workers=workers))
+    elapsed = time.perf_counter() - start
+    assert all(outcome.ok for outcome in outcomes)
+    print(f'{workers:3} workers: {elapsed * 1000:9.1f} ms, {ITEMS / elapsed:7.1f} items/s')
+
+
+if __name__ == '__main__':
+    workers = 1
+    while workers <= (cpu_count() or 1):
+        measure(workers)
+        workers *= 2
@@ -0,0 +1,41 @@
+# Measures normalization by evaluation of arithmetic on Church numerals, with
+# and without native numerals and booleans: factorial through the Y combinator.
+#
+#   python -m benchmarks.bench_church
+
+import time
+
+from lamedh.expr import Expr
+from lamedh.expr.church import known_shapes
+from lamedh.expr.nbe import normalize
+
+Y = '(λf.((λx.(f (x x))) (λx.(f (x x)))))'
+IF = '(λb.λx.λy.((b x) y))'
+ISZERO = '(λn.((n (λx.λt.λf.f)) (λt.λf.t)))'
+MULT = '(λm.λn.λf.(m (n f)))'
+PRED = '(λn.λf.λx.(((n (λg.λh.(h (g f)))) (λu.x)) (λu.u)))'
+ONE = '(λf.λx.(f x))'
+FACT = f'({Y} (λr.λn.((({IF} ({ISZERO} n)) {ONE}) (({MULT} n) (r ({PRED} n))))))'
+
+N = 8
+MAX_STEPS = 10 ** 7
+
+
+def numeral(n):
+    return '(λf.λx.%s)' % ('(f ' * n + 'x' + ')' * n)
+
+
+def measure(natives):
+    expr = Expr.from_string(f'{FACT} {numeral(N)}')
+    start = time.perf_counter()
+    result, steps = normalize(expr, max_steps=MAX_STEPS, natives=natives)
+    elapsed = time.perf_counter() - start
+    label = 'native' if natives else 'pure'
+    print(f'{label:>6}: {elapsed * 1000:9.1f} ms, {steps:8} steps')
+    return result
+
+
+if __name__ == '__main__':
+    known_shapes()  # parsed once, not part of the measure
+    print(f'factorial of {N}')
+    assert str(measure(natives=True)) == str(measure(natives=False))
@@ -0,0 +1,36 @@
+# Compares the 'clean' format printed in a single pass with removing the
+# parentheses one pair at a time (parsing the text after each one), on
+# terms of growing size, like the ones verbose evaluations print.
+#
+#   python -m benchmarks.bench_clean
+
+import time
+
+from lamedh.expr import Expr
+from lamedh.parsing.printer import clean_string
+from lamedh.terminal import CleanFormatter
+
+
+def church(size):
+    return Expr.from_string('λf x.' + 'f (' * size + 'x' + ')' * size)
+
+
+def combinators(size):
+    return Expr.from_string('(λx y z.x z (y z)) ' * size + 'λx.x')
+
+
+def measure(label, printer, expr):
+    start = time.perf_counter()
+    text = printer(expr)
+    elapsed = time.perf_counter() - start
+    print(f'{label:>10}: {expr.size():6} nodes in {elapsed:7.3f} s')
+    return text
+
+
+if __name__ == '__main__':
+    reparsed = CleanFormatter().reparsed
+    for term in (church, combinators):
+        for size in (10, 50, 100):
+            expr = term(size)
+            assert measure('reparsed', reparsed, expr) == measure('one pass', clean_string, expr)
+        measure('one pass', clean_string, term(20000))
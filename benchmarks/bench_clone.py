@@ -0,0 +1,46 @@
+# Compares Expr.clone against copy.deepcopy (what clone used to be), measuring
+# time and allocations per beta step of goto_normal_form.
+#
+#   python -m benchmarks.bench_clone
+
+from copy import deepcopy
+import time
+import tracemalloc
+
+from lamedh.expr import Expr
+
+MULT = '(λm n f.m (n f)) (λf x.f (f (f (f (f (f x)))))) (λf x.f (f (f (f (f (f (f (f x))))))))'
+
+
+def normalize(expr):
+    root = expr.clone()
+    steps = 0
+    while not root.is_normal_form():
+        root = root.get_innermost_redex().reduce().goto_root()
+        steps += 1
+    return steps
+
+
+def measure(label):
+    expr = Expr.from_string(MULT)
+    start = time.perf_counter()
+    steps = normalize(expr)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    normalize(expr)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{label:>9}: {steps} steps, {elapsed / steps * 1e6:8.1f} µs/step, '
+          f'peak allocated {peak / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    measure('clone')
+    original_clone = Expr.clone
+    Expr.clone = lambda self, meter=None: deepcopy(self)
+    try:
+        measure('deepcopy')
+    finally:
+        Expr.clone = original_clone
@@ -0,0 +1,45 @@
+# Loads a layered prelude, each definition using the ones before it, in the
+# terminal and measures the memory the definitions take, against what they
+# would take expanded (each one with the ones it uses copied into it).
+#
+#   python -m benchmarks.bench_definitions
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from lamedh.terminal import Terminal
+
+LAYERS = 16
+
+
+def prelude():
+    yield 'L0 = λf x.f x'
+    for i in range(1, LAYERS):
+        yield f'L{i} = λf.L{i - 1} (L{i - 1} f)'
+
+
+def measure():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'layers.lmd')
+        with open(path, 'w') as file:
+            file.write('\n'.join(prelude()))
+        terminal = Terminal()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            terminal.load_file(path)
+        elapsed = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    stored = sum(terminal.memory[name].size() for name in terminal.memory)
+    expanded = sum(terminal.memory.unfold(name).size() for name in terminal.memory)
+    print(f'{LAYERS} layers loaded in {elapsed * 1000:.1f} ms, {current / 1024:.1f} KiB')
+    print(f'nodes stored: {stored}, nodes expanded: {expanded}')
+
+
+if __name__ == '__main__':
+    measure()
@@ -0,0 +1,57 @@
+# Compares loading a workspace of many definitions dumped as text (parsed
+# line by line) and in the binary format, with the terminal's load command.
+#
+#   python -m benchmarks.bench_dump
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from lamedh.expr import Expr
+from lamedh.terminal import Terminal
+
+DEFINITIONS = 100000
+TEMPLATES = [
+    'λf x.f (f (f x))',
+    '(λx.(x x)) (λy.y)',
+    'λm n f.m (n f)',
+    'let <a, b> := <1, 2>, c := a + b in c * 2',
+    'λx y z.x z (y z)',
+]
+
+
+def workspace():
+    terminal = Terminal()
+    templates = [Expr.from_string(txt) for txt in TEMPLATES]
+    for i in range(DEFINITIONS):
+        terminal.memory['D%s' % i] = templates[i % len(templates)].clone()
+    return terminal
+
+
+def load(path):
+    terminal = Terminal()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        terminal.load_file(path)
+    elapsed = time.perf_counter() - start
+    assert len(terminal.memory) == DEFINITIONS
+    return elapsed
+
+
+def measure(terminal, directory, filename):
+    path = os.path.join(directory, filename)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        terminal.dump_memory(path)
+    dumped = time.perf_counter() - start
+    print(f'{filename:>12}: {os.path.getsize(path) / 1024:8.1f} KiB, dumped in {dumped:6.2f} s, '
+          f'loaded in {load(path):6.2f} s')
+
+
+if __name__ == '__main__':
+    terminal = workspace()
+    with tempfile.TemporaryDirectory() as directory:
+        measure(terminal, directory, 'memory.lmdb')
+        measure(terminal, directory, 'memory.lmd')
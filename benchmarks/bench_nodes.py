@@ -0,0 +1,44 @@
+# Measures the cost of creating expression nodes: bytes per node and
+# nanoseconds per allocation, for each kind of node of the lambda calculus.
+#
+#   python -m benchmarks.bench_nodes
+#   python -O -m benchmarks.bench_nodes   (without the assertions of constructors)
+
+import time
+import tracemalloc
+
+from lamedh.expr import Var, Lam, App
+
+N = 100000
+
+
+def build(kind, n):
+    if kind == 'Var':
+        return [Var('x') for _ in range(n)]
+    x = Var('x')
+    if kind == 'Lam':
+        return [Lam('x', x) for _ in range(n)]
+    return [App(x, x) for _ in range(n)]
+
+
+def measure(kind):
+    build(kind, 1000)  # warm up
+
+    start = time.perf_counter_ns()
+    build(kind, N)
+    elapsed = time.perf_counter_ns() - start
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    nodes = build(kind, N)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the list holding the nodes is not part of the nodes
+    size = after - before - (nodes.__sizeof__())
+
+    print(f'{kind:>4}: {elapsed / N:7.1f} ns/node, {size / N:6.1f} bytes/node')
+
+
+if __name__ == '__main__':
+    for kind in ['Var', 'Lam', 'App']:
+        measure(kind)
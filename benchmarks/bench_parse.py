@@ -0,0 +1,56 @@
+# Compares the parser backends of Expr.from_string on a .lmd-like file of
+# definitions, each one parsed on its own as the terminal does, and on a
+# single long expression to show how each one scales with the input size.
+#
+#   python -m benchmarks.bench_parse
+
+import time
+
+from lamedh.expr import Expr
+
+DEFINITIONS = [
+    'λx.x',
+    'λx y.x',
+    'λf g x.f x (g x)',
+    'λ n f x.f (n f x)',
+    '/b x y.b (c x y) y',
+    'λm n f.m (n f)',
+    'rec λf.λn.if (n == 0) then 1 else n * f (n - 1)',
+    'let <a, b> := <1, 2>, c := a + b in c * 2',
+    'letrec even := λn.if n == 0 then true else odd (n - 1), odd := λn.if n == 0 then false else even (n - 1) in even 10',
+    '(λx.x x) (λx.x x)',
+    '<a, <b, c>>.1.0 + a * b',
+]
+
+
+def source(lines):
+    return ['D%s = %s' % (i, DEFINITIONS[i % len(DEFINITIONS)]) for i in range(lines)]
+
+
+def measure(backend, lines):
+    text = '\n'.join(lines)
+    start = time.perf_counter()
+    for line in lines:
+        Expr.from_string(line.split('=', 1)[1], backend=backend)
+    elapsed = time.perf_counter() - start
+    print(f'{backend:>10}: {len(lines)} definitions in {elapsed:7.3f} s, '
+          f'{len(lines) / elapsed:9.0f} lines/s, {len(text) / 1024 / elapsed:8.1f} KiB/s')
+
+
+def scaling(backend, sizes):
+    for size in sizes:
+        text = ' + '.join('(f x%s)' % i for i in range(size))
+        start = time.perf_counter()
+        Expr.from_string(text, backend=backend)
+        elapsed = time.perf_counter() - start
+        print(f'{backend:>10}: {size:6} operands in {elapsed:7.3f} s, {elapsed / size * 1e6:8.1f} µs/operand')
+
+
+if __name__ == '__main__':
+    Expr.from_string('x', backend='earley')  # builds the grammar outside the timings
+    lines = source(500)
+    for backend in ('earley', 'precedence'):
+        measure(backend, lines)
+    # Earley is cubic on the ambiguous operator chains, keep it small
+    scaling('earley', [10, 20, 40])
+    scaling('precedence', [10, 20, 40, 1000, 10000])
@@ -0,0 +1,38 @@
+# Loads a large prelude with the terminal twice: the first time it's parsed
+# (and compiled), the second one it's read from the compiled .lmdc file.
+#
+#   python -m benchmarks.bench_prelude
+
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from lamedh.terminal import Terminal
+
+DEFINITIONS = 10000
+
+
+def prelude():
+    yield 'I = λx.x'
+    yield 'K = λx y.x'
+    yield 'S = λf g x.f x (g x)'
+    for i in range(DEFINITIONS - 3):
+        yield f'D{i} = λf x.S K (K I) (f x) {i}'
+
+
+def load(path):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Terminal().load_file(path)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'prelude.lmd')
+        with open(path, 'w') as file:
+            file.write('\n'.join(prelude()))
+        print(f'{DEFINITIONS} definitions, parsed in {load(path):6.2f} s, '
+              f'loaded compiled in {load(path):6.2f} s')
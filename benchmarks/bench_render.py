@@ -0,0 +1,37 @@
+# Times printing terms of growing size as the terminal does: str, the pretty
+# formatter (colors), as_tree, and a trace line cut at TRACE_WIDTH, which
+# doesn't depend on the size of the term.
+#
+#   python -m benchmarks.bench_render
+
+import time
+
+from lamedh.expr import Expr
+from lamedh.terminal import NormalFormatter, PrettyFormatter
+
+TRACE_WIDTH = 120
+
+
+def church(size):
+    # deeply nested, as church numerals are
+    return Expr.from_string('λf x.' + 'f (' * size + 'x' + ')' * size)
+
+
+def measure(label, printer, expr):
+    start = time.perf_counter()
+    printer(expr)
+    elapsed = time.perf_counter() - start
+    size = expr.size()
+    print(f'{label:>10}: {size:7} nodes in {elapsed:7.3f} s, {elapsed / size * 1e6:6.2f} µs/node')
+
+
+if __name__ == '__main__':
+    pretty, trace = PrettyFormatter(), PrettyFormatter(width=TRACE_WIDTH)
+    for size in (1000, 10000, 100000):
+        expr = church(size)
+        measure('str', str, expr)
+        measure('pretty', pretty, expr)
+        if size <= 10000:
+            # indents each line by its depth, its text grows with size * depth
+            measure('as_tree', NormalFormatter().as_tree, expr)
+        measure('trace', trace, expr)
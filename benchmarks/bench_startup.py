@@ -0,0 +1,39 @@
+# Measures the cold start of lamedh: importing the terminal, creating it and
+# parsing a first expression, each in a fresh interpreter, against a budget.
+#
+#   python -m benchmarks.bench_startup
+
+import subprocess
+import sys
+import time
+
+RUNS = 10
+BUDGET = 0.25  # seconds, on top of starting the interpreter
+
+STEPS = {
+    'python': 'pass',
+    'import': 'import lamedh.cli',
+    'terminal': 'import lamedh.cli; lamedh.cli.Terminal()',
+    'first parse': 'import lamedh.cli; lamedh.cli.Terminal().parse_expr("(λx.x x) (λy.y)")',
+}
+
+
+def cold_start(code):
+    # best of RUNS, to leave out the noise of the machine
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    baseline = None
+    for label, code in STEPS.items():
+        elapsed = cold_start(code)
+        if baseline is None:
+            baseline = elapsed
+        overhead = elapsed - baseline
+        verdict = '' if label == 'python' else ('ok' if overhead <= BUDGET else 'OVER BUDGET')
+        print(f'{label:>12}: {elapsed * 1000:7.1f} ms, {overhead * 1000:7.1f} ms over python {verdict}')
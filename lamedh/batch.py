@@ -0,0 +1,118 @@
+# Evaluates many independent expressions over a pool of processes.
+#
+#   for outcome in batch.evaluate(texts, 'evalN', max_steps=1000, budget=Budget(seconds=1)):
+#       print(outcome.index, outcome.result or outcome.error)
+#
+# Items are expression strings (parsed by the workers, so parsing runs in
+# parallel too) or Expr objects. Each one is evaluated on its own, with the
+# same max_steps and budget (see lamedh.budget), so a single item can't take
+# the whole job down: it ends with an error instead of a result.
+#
+# Results stream back as they're ready, in the order of the items, or in the
+# order they complete. Only a bounded window of items is in flight, so items
+# can be a generator over a huge input.
+#
+# Expressions go to the workers and back in the binary format (see
+# lamedh.expr.binary), not pickled: pickle recurses on every node, and it
+# would fail on deep terms.
+
+import pickle
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from os import cpu_count
+
+from lamedh.expr import Expr, binary
+
+STRATEGIES = ('evalN', 'evalE', 'goto_normal_form')
+
+
+class Outcome:
+    # What evaluating the index-th item ended in: its result (an Expr), or
+    # the exception raised (StopEvaluation, BudgetExceeded, a parsing error...)
+
+    def __init__(self, index, result=None, error=None, seconds=0):
+        self.index = index
+        self.result = result
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<Outcome %s: %r>' % (self.index, self.result if self.ok else self.error)
+
+
+def evaluate_item(index, item, strategy, max_steps, budget, kwargs):
+    # runs in the workers
+    started = time.perf_counter()
+    try:
+        expr = Expr.from_string(item) if isinstance(item, str) else binary.loads(item)
+        result = getattr(expr, strategy)(max_steps, budget=budget, **kwargs)
+        outcome = Outcome(index, result=binary.dumps(result))
+    except Exception as e:
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            # it can't be sent back to the main process as it is
+            e = RuntimeError('%s: %s' % (type(e).__name__, e))
+        outcome = Outcome(index, error=e)
+    outcome.seconds = time.perf_counter() - started
+    return outcome
+
+
+def received(outcome):
+    # the outcome sent back by a worker, with its result read back
+    if outcome.ok:
+        try:
+            outcome.result = binary.loads(outcome.result)
+        except Exception as e:
+            outcome.result, outcome.error = None, e
+    return outcome
+
+
+def evaluate(items, strategy='evalN', max_steps=25, budget=None, workers=None, ordered=True, **kwargs):
+    # Generator of the Outcome of each item. kwargs are passed to the strategy (like backend).
+    # workers: number of processes, defaults to the number of CPUs
+    if strategy not in STRATEGIES:
+        raise ValueError('Unknown strategy %s. Options are: %s' % (strategy, ', '.join(STRATEGIES)))
+    workers = workers or cpu_count() or 1
+    window = 4 * workers
+    items = iter(enumerate(items))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            # next item to the pool, None if there are no more
+            entry = next(items, None)
+            if entry is None:
+                return None
+            index, item = entry
+            if isinstance(item, Expr):
+                item = binary.dumps(item)
+            return executor.submit(evaluate_item, index, item, strategy, max_steps, budget, kwargs)
+
+        if ordered:
+            pending = deque()
+            while True:
+                while len(pending) < window:
+                    future = submit()
+                    if future is None:
+                        break
+                    pending.append(future)
+                if not pending:
+                    return
+                yield received(pending.popleft().result())
+        else:
+            pending = set()
+            while True:
+                while len(pending) < window:
+                    future = submit()
+                    if future is None:
+                        break
+                    pending.add(future)
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield received(future.result())
@@ -0,0 +1,105 @@
+# Limits on the resources an evaluation may use, besides max_steps.
+#
+# Every evaluation entry point of Expr (goto_canonical, goto_normal_form,
+# evalN, evalE and evalL) takes a `budget`. While it runs, the backend
+# checks a Meter of it on every step, which raises BudgetExceeded (a
+# StopEvaluation) carrying the statistics measured so far.
+#
+# Nodes are the size of the term being reduced or evaluated. Only backends
+# building terms measure it (named, debruijn and the visitors), environment
+# based backends are bounded by time and memory only.
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Budget:
+    # None means no limit:
+    #   seconds: wall-clock time
+    #   nodes: size of the term being reduced or evaluated
+    #   memory: peak of the memory allocated while evaluating, in bytes. It's
+    #           traced with tracemalloc, which makes evaluation much slower
+
+    def __init__(self, seconds=None, nodes=None, memory=None):
+        self.seconds = seconds
+        self.nodes = nodes
+        self.memory = memory
+
+    def __repr__(self):
+        limits = ['%s=%s' % (name, getattr(self, name)) for name in ('seconds', 'nodes', 'memory')
+                  if getattr(self, name) is not None]
+        return 'Budget(%s)' % ', '.join(limits)
+
+
+class Meter:
+    # What an evaluation has used so far, checked against its budget
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.steps = 0
+        self.nodes = None
+        self.started = time.perf_counter()
+        self.tracing = False
+        if budget.memory is not None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+        self.baseline, self.initial_peak = self.traced()
+
+    def traced(self):
+        # (current, peak) memory allocated, in bytes
+        if self.budget.memory is None:
+            return (0, 0)
+        return tracemalloc.get_traced_memory()
+
+    def memory(self):
+        # peak of the memory allocated since the meter started, in bytes. Without
+        # reset_peak, a peak reached before that doesn't count: current memory is used
+        current, peak = self.traced()
+        return (peak if peak > self.initial_peak else current) - self.baseline
+
+    def check(self, steps, nodes=None):
+        budget = self.budget
+        self.steps = steps
+        if nodes is not None:
+            self.nodes = nodes
+            if budget.nodes is not None and nodes > budget.nodes:
+                self.exceeded('nodes', budget.nodes)
+        if budget.seconds is not None and time.perf_counter() - self.started > budget.seconds:
+            self.exceeded('seconds', budget.seconds)
+        if budget.memory is not None and self.memory() > budget.memory:
+            self.exceeded('memory', budget.memory)
+
+    def exceeded(self, resource, limit):
+        from lamedh.expr import BudgetExceeded  # type: ignore
+        raise BudgetExceeded('Reached max %s: %s' % (resource, limit), resource, self.stats())
+
+    def stats(self):
+        # steps, seconds, nodes (None if not measured) and peak memory (None if not traced)
+        return {
+            'steps': self.steps,
+            'seconds': time.perf_counter() - self.started,
+            'nodes': self.nodes,
+            'memory': self.memory() if self.budget.memory is not None else None,
+        }
+
+    def stop(self):
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+
+@contextmanager
+def metering(budget):
+    # Meter of budget while the block runs, or None if there's no budget
+    if budget is None:
+        yield None
+        return
+    meter = Meter(budget)
+    try:
+        yield meter
+    finally:
+        meter.stop()
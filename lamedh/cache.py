@@ -0,0 +1,134 @@
+# Memoization of reductions and evaluations.
+#
+# Results are keyed by a digest of the expression text, the operation and the
+# backend, so the same definitions are not reduced again and again. The text
+# and not the alpha-equivalence class (see Expr.alpha_digest) is what's
+# digested: alpha-equivalent expressions reduce to results with different
+# names for their bound variables, and each one must get its own names back.
+#
+# Only finished reductions are cached, together with the max_steps they were
+# run with: a cached result is used if the new call allows at least as many
+# steps, otherwise the reduction runs again (and may stop before finishing).
+#
+# Besides the in-memory LRU, results can be kept on disk, one file per result,
+# so they survive between sessions.
+
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+from inspect import signature
+import os
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.lamedh', 'cache')
+
+
+class Entry:
+
+    def __init__(self, result, max_steps):
+        self.result = result
+        self.max_steps = max_steps
+
+
+class ResultCache:
+
+    def __init__(self, maxsize=1024, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, expr, operation, backend):
+        digest = hashlib.sha1(str(expr).encode('utf-8')).hexdigest()
+        return '%s-%s-%s' % (digest, operation, backend)
+
+    def get(self, key, max_steps):
+        # Returns a copy of the cached result, or None
+        entry = self.entries.get(key)
+        if entry is None and self.directory:
+            entry = self.load(key)
+            if entry is not None:
+                self.remember(key, entry)
+        if entry is None or entry.max_steps > max_steps:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.result.clone()
+
+    def put(self, key, result, max_steps):
+        entry = self.entries.get(key)
+        if entry is not None and entry.max_steps <= max_steps:
+            return
+        entry = Entry(result.clone(), max_steps)
+        self.remember(key, entry)
+        if self.directory:
+            self.save(key, entry)
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        # in memory only, files on disk are kept
+        self.entries.clear()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.lmd')
+
+    def save(self, key, entry):
+        # written aside and then moved, so readers never find half written files
+        path = self.path(key)
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as file:
+            file.write('%s\n%s\n' % (entry.max_steps, entry.result))
+        os.replace(tmp_path, path)
+
+    def load(self, key):
+        from lamedh.expr import Expr  # type: ignore
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path) as file:
+                max_steps, txt = file.read().split('\n', 1)
+            return Entry(Expr.from_string(txt.strip()), int(max_steps))
+        except Exception:
+            # unreadable files are just ignored, they'll be written again
+            return None
+
+
+def memoized(finished, whole_tree=False):
+    # Decorator for the Expr methods that reduce or evaluate, adding them a `cache`
+    # argument (a ResultCache, or None to not use any).
+    #   finished(result): tells if the result is final, or the operation stopped before
+    #   whole_tree: the operation works on the root of the tree, not on the node itself
+    def decorator(operation):
+        arguments = signature(operation)
+
+        @wraps(operation)
+        def wrapper(expr, *args, cache=None, **kwargs):
+            if cache is None:
+                return operation(expr, *args, **kwargs)
+            call = arguments.bind(expr, *args, **kwargs)
+            call.apply_defaults()
+            max_steps = call.arguments['max_steps']
+            target = expr.goto_root() if whole_tree else expr
+            key = cache.key(target, operation.__name__, call.arguments.get('backend'))
+            result = cache.get(key, max_steps)
+            if result is not None:
+                if call.arguments.get('verbose'):
+                    # the steps aren't known, only where they ended
+                    formatter = call.arguments.get('kwargs', {}).get('formatter', str)
+                    print('cached result (steps not shown) ->', formatter(result))
+                return result
+            result = operation(expr, *args, **kwargs)
+            if finished(result):
+                cache.put(key, result, max_steps)
+            return result
+        return wrapper
+    return decorator
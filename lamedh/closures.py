@@ -0,0 +1,72 @@
+# Environment based evaluation helpers.
+#
+# Instead of substituting an argument into a body (and cloning it for every
+# occurrence), environment based evaluators keep the body untouched and pair
+# it with a mapping from variable names to the arguments they stand for.
+# Only when a result needs to be shown it is read back into a plain Expr.
+
+
+class Thunk:
+    # An expression paired with the environment it has to be evaluated in.
+    # Once evaluated, `value` keeps the result so it's shared among all the
+    # occurrences of the variable bound to it (call-by-need).
+
+    def __init__(self, expr, env):
+        self.expr = expr
+        self.env = env
+        self.value = None
+        self._readback = None
+
+    def readback(self):
+        # Reads back the expression as written, not its value, so results are
+        # the same the substitution based evaluators produce
+        if self._readback is None:
+            read_back(self)
+        return self._readback
+
+    def readback_env(self):
+        # the expression, and the thunks bound to its free variables
+        env = self.env
+        return self.expr, {name: env[name] for name in self.expr.free_var_names() if name in env}
+
+
+class Closure(Thunk):
+    # A lambda paired with the environment it was evaluated in.
+    # Closures are canonical forms, they are their own value.
+
+    def __init__(self, lam, env):
+        super().__init__(lam, env)
+        self.value = self
+
+    @property
+    def lam(self):
+        return self.expr
+
+
+def readback(expr, env):
+    # Builds the Expr that results of substituting, in expr, every
+    # variable bound in env by the read back of the thunk it's bound to
+    return Thunk(expr, env).readback()
+
+
+def read_back(thunk):
+    # Reads back thunk, and the thunks it depends on, bottom-up. Environments
+    # may be long chains of thunks, so it's done with an explicit stack
+    stack = [thunk]
+    while stack:
+        current = stack[-1]
+        if current._readback is not None:
+            stack.pop()
+            continue
+        expr, dependencies = current.readback_env()
+        pending = [t for t in dependencies.values() if t._readback is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if dependencies:
+            # substitution may rename binders in-place, and expr is still in use
+            mapping = {name: t._readback for name, t in dependencies.items()}
+            current._readback = expr.clone().substitute(mapping)
+        else:
+            current._readback = expr.clone()
@@ -0,0 +1,58 @@
+# Compiled .lmd files, so loading them again doesn't parse them again.
+#
+# The definitions parsed from a source file are saved next to it, in a file
+# with the same name and the .lmdc extension: the digest of the source they
+# were parsed from, followed by them in binary format (see lamedh.expr.binary).
+# Loading the source again takes a single read of that file, as long as the
+# digest is the one of the source. When the source changes it's parsed (and
+# compiled) again.
+
+from hashlib import blake2b
+import os
+
+from lamedh.expr import binary
+
+MAGIC = b'\x89LMC'
+EXTENSION = '.lmdc'
+DIGEST_SIZE = 16
+
+
+def path_for(source_path):
+    return os.path.splitext(source_path)[0] + EXTENSION
+
+
+def header(source):
+    return MAGIC + blake2b(source, digest_size=DIGEST_SIZE).digest()
+
+
+def load(source_path, source):
+    # Definitions compiled from source (bytes), see binary.load_definitions.
+    # None if they were not compiled, or were compiled from another source
+    try:
+        with open(path_for(source_path), 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    expected = header(source)
+    if not data.startswith(expected):
+        return None
+    try:
+        return binary.load_definitions(data[len(expected):])
+    except Exception:
+        # unreadable files are just ignored, they'll be written again
+        return None
+
+
+def save(source_path, source, definitions):
+    # Definitions are (name, expr) pairs. Written aside and then moved, so readers
+    # never find half written files. Sources in read only directories are just
+    # not compiled
+    path = path_for(source_path)
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(header(source) + binary.dump_definitions(definitions))
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,655 @@
+# Compiles lambda expressions into Python closures.
+#
+# Every node of the expression becomes a Python function `code(env, run)`
+# that evaluates it, so evaluating doesn't pay for dispatching on node types,
+# nor for substituting or copying sub-trees. Environments are linked tuples
+# (innermost binder, rest of the environment) holding, for each variable
+# bound by an enclosing lambda (or let, or letrec), what it's bound to:
+#   - call-by-name (evalN): a Thunk, the operand and the environment where
+#     it was found. It's evaluated again every time the variable is used
+#   - call-by-value (evalE): the Value the operand evaluated to
+#
+# Compiled code doesn't hold the nodes of the expression, it refers to them
+# by position in pre-order (see Run.nodes), so it's cached per alpha-
+# equivalence class of expressions, and values read back with the names of
+# the very expression being evaluated.
+#
+# Calls in tail position (the body of the applied function, the operand a
+# variable is bound to in call-by-name) are not made, code returns them as a
+# (code, env) pair instead, and `trampoline` makes them. Other evaluations of
+# sub-expressions (the operator of an application, the operands of an
+# operator...) are tail calls too, after pushing to Run.frames what to do with
+# their value. So neither long evaluations nor deep expressions grow the
+# Python stack. Compiling is done with an explicit stack too.
+#
+# Steps are accounted exactly like EvalVisitor does, see lamedh.machines,
+# except for recursion. rec and letrec don't unfold their definitions every
+# time they are used: the knot is tied instead, the environment of a
+# recursive function holds the function itself (see Knot). Calling it costs
+# an App rule, and recursive functions run in time linear in the number of
+# calls they make.
+#
+# Values of the applicative language are Constants and Components (tuples),
+# errors are raised as EvalErrorException and are the result of evaluating.
+
+from weakref import WeakKeyDictionary
+
+from lamedh import closures
+from lamedh.expr import Var, Lam, App, StopEvaluation, CantEvalException, EvalErrorException
+from lamedh.expr.applicative import (
+    BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse, Error, TypeError,
+    Tuple, Indexing, LetIn, LetRec, Rec, ConstType, UNARY_OPERATIONS, BINARY_OPERATIONS,
+    SHORT_CIRCUITS, constant,
+)
+
+NORMAL = 'normal'
+EAGER = 'eager'
+
+
+class Run:
+    # State of an evaluation of compiled code
+
+    def __init__(self, root, max_steps, meter=None):
+        self.root = root
+        self.nodes = preorder(root)
+        self.steps = 0
+        self.max_steps = max_steps
+        self.meter = meter
+        # continuations waiting for the value of a sub-expression, innermost
+        # last: (then, data) continues with then(value, data, run)
+        self.frames = []
+
+    def step(self):
+        if self.steps >= self.max_steps:
+            raise StopEvaluation('Reached max number of steps: %s' % self.max_steps)
+        self.steps += 1
+        if self.meter:
+            self.meter.check(self.steps)
+
+    def mapping(self, node, env):
+        # {name: value or thunk} of the variables bound by env at node. Binder
+        # names are the ones of the nodes enclosing node, innermost first
+        mapping = {}
+        while node is not self.root:
+            child, node = node, node.parent
+            for name in reversed(binders(node, child)):
+                value, env = env
+                mapping.setdefault(name, value)
+        return mapping
+
+
+class Thunk(closures.Thunk):
+    # An operand, and the environment where it was found
+
+    def __init__(self, code, node, env, run):
+        super().__init__(node, env)
+        self.code = code
+        self.run = run
+
+    def readback_env(self):
+        mapping = self.run.mapping(self.expr, self.env)
+        return self.expr, {name: mapping[name] for name in self.expr.free_var_names() if name in mapping}
+
+
+class Value(Thunk):
+    # A lambda and its environment. body is the compiled code of its body
+
+    def __init__(self, body, node, env, run):
+        super().__init__(None, node, env, run)
+        self.body = body
+
+
+class Knot(Value):
+    # What a recursively defined variable is bound to. Its environment holds
+    # the knot itself, so it's read back as its definition instead: a thunk
+    # reading back like the rec or letrec unfolding it stands for.
+    # The body, node and environment are tied once the knot exists: those
+    # of the lambda it's a copy of. Knots of rec on evalN are thunks instead,
+    # with the code evaluating the body of rec again
+
+    def __init__(self, definition, run):
+        super().__init__(None, None, None, run)
+        self.definition = definition
+
+    def readback_env(self):
+        return Var(PLACEHOLDER), {PLACEHOLDER: self.definition}
+
+
+class Recursion(Thunk):
+    # What a variable defined by letrec is bound to on evalN: evaluating it
+    # is an Abs rule, its value is the knot. The knot is its environment
+
+    def __init__(self, knot, run):
+        super().__init__(recall, None, knot, run)
+
+    def readback_env(self):
+        return self.env.readback_env()
+
+
+def recall(knot, run):
+    # the code of Recursion thunks
+    run.step()
+    return knot
+
+
+class Template(closures.Thunk):
+    # Reads back as expr, with its placeholder variables substituted
+
+    def __init__(self, expr, dependencies):
+        super().__init__(expr, None)
+        self.dependencies = dependencies
+
+    def readback_env(self):
+        return self.expr, self.dependencies
+
+
+class Constant(closures.Thunk):
+    # A natural or boolean, as a Python value
+
+    def __init__(self, constant):
+        super().__init__(None, None)
+        self.constant = constant
+
+    @property
+    def kind(self):
+        return ConstType.Boolean if isinstance(self.constant, bool) else ConstType.Natural
+
+    def readback_env(self):
+        return constant(self.constant), {}
+
+
+class Components(closures.Thunk):
+    # A tuple: Values of its components on evalE, Thunks on evalN
+
+    def __init__(self, elems):
+        super().__init__(None, None)
+        self.elems = elems
+
+    def readback_env(self):
+        names = ['%s%s' % (PLACEHOLDER, i) for i in range(len(self.elems))]
+        return Tuple([Var(name) for name in names]), dict(zip(names, self.elems))
+
+
+class Projection(Thunk):
+    # A component of a tuple that's not evaluated yet, on evalN. It's its own
+    # environment, its code is project
+
+    def __init__(self, source, index, run):
+        super().__init__(project, None, None, run)
+        self.env = self
+        self.source = source
+        self.index = index
+
+    def readback_env(self):
+        return Indexing(Var(PLACEHOLDER), NaturalConstant(str(self.index))), {PLACEHOLDER: self.source}
+
+
+# names of the variables read back values are substituted in, no variable
+# of a parsed expression has them
+PLACEHOLDER = '#'
+
+
+def type_error(msg):
+    raise EvalErrorException(TypeError(), msg)
+
+
+def constant_value(value, kind):
+    # Python value of a constant of the given kind (any kind if None)
+    if not isinstance(value, Constant) or kind not in (None, value.kind):
+        type_error('Expected %s, got %s' % (kind.name if kind else 'a constant', repr(value.readback())))
+    return value.constant
+
+
+def component(container, index):
+    if not isinstance(container, Components) or index >= len(container.elems):
+        type_error('Cant index %s with %s' % (repr(container.readback()), index))
+    return container.elems[index]
+
+
+def project(projection, run):
+    # the code of projections: the Indexing rule
+    run.step()
+    source = projection.source
+    run.frames.append((select, projection.index))
+    return (source.code, source.env)
+
+
+def select(container, index, run):
+    # continues evaluating the index-th component of container
+    elem = component(container, index)
+    return (elem.code, elem.env)
+
+
+def binders(node, child):
+    # names node binds in the environment of its child, in the order they are bound
+    if isinstance(node, Lam):
+        return [node.var_name]
+    if isinstance(node, LetRec) or (isinstance(node, LetIn) and child is node.in_expr):
+        names = []
+        for pattern in node.patterns:
+            stack = [pattern]
+            while stack:
+                p = stack.pop()
+                if p.var:
+                    names.append(p.var.var_name)
+                else:
+                    stack.extend(reversed(p.sub_patterns))
+        return names
+    return []
+
+
+def trampoline(code, env, run):
+    # makes the calls code returns, and gives the values to the frames pushed meanwhile
+    frames = run.frames
+    base = len(frames)
+    result = code(env, run)
+    while True:
+        while type(result) is tuple:
+            code, env = result
+            result = code(env, run)
+        if len(frames) == base:
+            return result
+        then, data = frames.pop()
+        result = then(result, data, run)
+
+
+def preorder(root):
+    nodes = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(list(node.children())))
+    return nodes
+
+
+def lookup(index):
+    # function finding the variable index-th binder of an environment
+    if index == 0:
+        return lambda env: env[0]
+    if index == 1:
+        return lambda env: env[1][0]
+    def find(env):
+        for _ in range(index):
+            env = env[1]
+        return env[0]
+    return find
+
+
+def child_positions(node, position):
+    # positions of the children of the node at position
+    positions = []
+    position += 1
+    for child in node.children():
+        positions.append(position)
+        position += child.size()
+    return positions
+
+
+class Compiler:
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+
+    def compile(self, root):
+        # Code of root. Children are compiled before their parent, with an
+        # explicit stack. Names of the enclosing binders are linked lists,
+        # (innermost name, rest of the names)
+        codes = []
+        position = 0
+        # each stack item is (node, names, None), or (node, names, (its position,
+        # number of children)) once its children were pushed to the stack
+        stack = [(root, None, None)]
+        while stack:
+            node, names, pushed = stack.pop()
+            if pushed is not None:
+                node_position, count = pushed
+                children = codes[len(codes) - count:]
+                del codes[len(codes) - count:]
+                method = getattr(self, 'compile_' + node.__class__.__name__.lower())
+                codes.append(method(node, node_position, names, children))
+                continue
+            node_position = position
+            position += 1
+            if isinstance(node, Var):
+                codes.append(self.compile_var(node, node_position, names))
+                continue
+            cant_eval = self.cant_eval(node, node_position)
+            if cant_eval is not None:
+                # its children are not compiled, but they are numbered
+                position += node.size() - 1
+                codes.append(cant_eval)
+                continue
+            children = list(node.children())
+            stack.append((node, names, (node_position, len(children))))
+            for child in reversed(children):
+                child_names = names
+                for name in binders(node, child):
+                    child_names = (name, child_names)
+                stack.append((child, child_names, None))
+        return codes.pop()
+
+    def cant_eval(self, node, position):
+        # code raising CantEvalException for nodes that can't be evaluated, or None
+        if isinstance(node, LetRec):
+            for pattern in node.patterns:
+                if not pattern.var:
+                    def cant_eval(env, run):
+                        raise CantEvalException('Cant evaluate letrec defining %s' % pattern)
+                    return cant_eval
+            return None
+        if hasattr(self, 'compile_' + node.__class__.__name__.lower()):
+            return None
+        def cant_eval(env, run):
+            raise CantEvalException('Cant evaluate %s' % repr(run.nodes[position]))
+        return cant_eval
+
+    def compile_var(self, node, position, names):
+        index = 0
+        while names is not None:
+            name, names = names
+            if name == node.var_name:
+                break
+            index += 1
+        else:
+            def free(env, run):
+                raise CantEvalException('Cant evaluate variable %s' % repr(run.nodes[position]))
+            return free
+        find = lookup(index)
+        if self.strategy == NORMAL:
+            def var(env, run):
+                thunk = find(env)
+                return (thunk.code, thunk.env)
+            return var
+        def var(env, run):
+            # variables are bound to canonical forms, evaluating them is an Abs rule
+            run.step()
+            return find(env)
+        return var
+
+    def compile_lam(self, node, position, names, children):
+        body, = children
+        def lam(env, run):
+            run.step()
+            return Value(body, run.nodes[position], env, run)
+        return lam
+
+    def compile_app(self, node, position, names, children):
+        operator, operand = children
+        if self.strategy == NORMAL:
+            _, operand_position = child_positions(node, position)
+            def apply(function, env, run):
+                function = function_value(function)
+                argument = Thunk(operand, run.nodes[operand_position], env, run)
+                return (function.body, (argument, function.env))
+        else:
+            def apply_to(argument, function, run):
+                return (function.body, (argument, function.env))
+            def apply(function, env, run):
+                run.frames.append((apply_to, function_value(function)))
+                return (operand, env)
+        def app(env, run):
+            run.step()
+            run.frames.append((apply, env))
+            return (operator, env)
+        return app
+
+    # -- Applicative language
+    def compile_booleanconstant(self, node, position, names, children):
+        value = node.python_value
+        def const(env, run):
+            run.step()
+            return Constant(value)
+        return const
+
+    compile_naturalconstant = compile_booleanconstant
+
+    def compile_error(self, node, position, names, children):
+        kind = node.__class__
+        def error(env, run):
+            run.step()
+            raise EvalErrorException(kind())
+        return error
+
+    compile_typeerror = compile_error
+
+    def compile_unaryop(self, node, position, names, children):
+        operation, kind = UNARY_OPERATIONS[node.operator]
+        operand, = children
+        def compute(value, data, run):
+            return Constant(operation(constant_value(value, kind)))
+        def unaryop(env, run):
+            run.step()
+            run.frames.append((compute, None))
+            return (operand, env)
+        return unaryop
+
+    def compile_binaryop(self, node, position, names, children):
+        operation, kind = BINARY_OPERATIONS[node.operator]
+        short_circuit = SHORT_CIRCUITS.get(node.operator, None)
+        left, right = children
+        def compute(right_value, left_value, run):
+            value = constant_value(right_value, kind or left_value.kind)
+            try:
+                return Constant(operation(left_value.constant, value))
+            except ZeroDivisionError:
+                raise EvalErrorException(Error(), 'Division by zero')
+        def evaluate_right(left_value, env, run):
+            value = constant_value(left_value, kind)
+            if value is short_circuit:
+                return Constant(value)
+            run.frames.append((compute, left_value))
+            return (right, env)
+        def binaryop(env, run):
+            run.step()
+            run.frames.append((evaluate_right, env))
+            return (left, env)
+        return binaryop
+
+    def compile_ifthenelse(self, node, position, names, children):
+        guard, then_body, else_body = children
+        def choose(guard_value, env, run):
+            if constant_value(guard_value, ConstType.Boolean):
+                return (then_body, env)
+            return (else_body, env)
+        def ifthenelse(env, run):
+            run.step()
+            run.frames.append((choose, env))
+            return (guard, env)
+        return ifthenelse
+
+    def compile_tuple(self, node, position, names, children):
+        elems = children
+        if self.strategy == NORMAL:
+            # components are not evaluated
+            positions = child_positions(node, position)
+            def components(env, run):
+                run.step()
+                return Components([Thunk(code, run.nodes[p], env, run) for code, p in zip(elems, positions)])
+        else:
+            def evaluate_next(value, data, run):
+                env, values = data
+                values.append(value)
+                if len(values) == len(elems):
+                    return Components(values)
+                run.frames.append((evaluate_next, data))
+                return (elems[len(values)], env)
+            def components(env, run):
+                run.step()
+                if not elems:
+                    return Components([])
+                run.frames.append((evaluate_next, (env, [])))
+                return (elems[0], env)
+        return components
+
+    def compile_indexing(self, node, position, names, children):
+        container, _ = children
+        index = node.index.python_value
+        if self.strategy == NORMAL:
+            then = select
+        else:
+            def then(container, index, run):
+                return component(container, index)
+        def indexing(env, run):
+            run.step()
+            run.frames.append((then, index))
+            return (container, env)
+        return indexing
+
+    def compile_letin(self, node, position, names, children):
+        body, *definitions = children
+        patterns = node.patterns
+        if self.strategy == NORMAL:
+            _, *positions = child_positions(node, position)
+            def letin(env, run):
+                run.step()
+                bound = []
+                for pattern, code, p in zip(patterns, definitions, positions):
+                    bind_thunk(pattern, Thunk(code, run.nodes[p], env, run), bound, run)
+                return (body, extend(env, bound))
+        else:
+            def bind_next(value, data, run):
+                env, bound, i = data
+                bind_value(patterns[i], value, bound)
+                i += 1
+                if i == len(definitions):
+                    return (body, extend(env, bound))
+                run.frames.append((bind_next, (env, bound, i)))
+                return (definitions[i], env)
+            def letin(env, run):
+                run.step()
+                run.frames.append((bind_next, (env, [], 0)))
+                return (definitions[0], env)
+        return letin
+
+    def compile_letrec(self, node, position, names, children):
+        # each defined variable is bound to a knot, its lambda in the environment holding the knots
+        body, *definitions = children
+        indexes = range(len(definitions))
+        def tie_next(value, data, run):
+            inner, knots, i = data
+            tie(knots[i], value)
+            i += 1
+            if i == len(definitions):
+                return (body, inner)
+            run.frames.append((tie_next, (inner, knots, i)))
+            return (definitions[i], inner)
+        def letrec(env, run):
+            run.step()
+            knots = [Knot(LetRecDefinition(position, i, env, run), run) for i in indexes]
+            if self.strategy == NORMAL:
+                inner = extend(env, [Recursion(knot, run) for knot in knots])
+            else:
+                inner = extend(env, knots)
+            run.frames.append((tie_next, (inner, knots, 0)))
+            return (definitions[0], inner)
+        return letrec
+
+    def compile_rec(self, node, position, names, children):
+        body, = children
+        if self.strategy == NORMAL:
+            # rec e is e (rec e): being λf.b the canonical form of e, rec e is b with f
+            # bound to a knot evaluating b again, in that same environment
+            def unfold(function, env, run):
+                function = function_value(function)
+                knot = Knot(Thunk(None, run.nodes[position], env, run), run)
+                knot.code, knot.env = function.body, (knot, function.env)
+                return (knot.code, knot.env)
+        else:
+            # being λf.b the canonical form of e, rec e is b with f bound to the
+            # canonical form of b itself, which must be a lambda
+            def tie_value(value, knot, run):
+                if isinstance(value, Value):
+                    tie(knot, value)
+                return value
+            def unfold(function, env, run):
+                function = function_value(function)
+                knot = Knot(Template(Rec(Var(PLACEHOLDER)), {PLACEHOLDER: function}), run)
+                run.frames.append((tie_value, knot))
+                return (function.body, (knot, function.env))
+        def rec(env, run):
+            run.step()
+            run.frames.append((unfold, env))
+            return (body, env)
+        return rec
+
+
+class LetRecDefinition(Thunk):
+    # Reads back like the index-th variable defined by the letrec at position,
+    # evaluated in env
+
+    def __init__(self, position, index, env, run):
+        super().__init__(None, run.nodes[position], env, run)
+        self.index = index
+
+    def readback_env(self):
+        letrec = self.expr
+        mapping = self.run.mapping(letrec, self.env)
+        expr = letrec.unfolding(letrec.sub_exprs[self.index])
+        return expr, {name: mapping[name] for name in expr.free_var_names() if name in mapping}
+
+
+def function_value(value):
+    if not isinstance(value, Value):
+        type_error('Cant apply %s' % repr(value.readback()))
+    if value.body is None:
+        # a knot not tied yet, by a rec which body is not a lambda
+        raise CantEvalException('Cant evaluate %s before its definition' % repr(value.readback()))
+    return value
+
+
+def tie(knot, value):
+    # knot becomes a copy of the lambda value
+    knot.body, knot.expr, knot.env = value.body, value.expr, value.env
+
+
+def extend(env, bound):
+    for value in bound:
+        env = (value, env)
+    return env
+
+
+def bind_value(pattern, value, bound):
+    # appends to bound what the variables of pattern are bound to, matched against value
+    if pattern.var:
+        bound.append(value)
+    elif isinstance(value, Components) and len(value.elems) == len(pattern.sub_patterns):
+        for sub_pattern, elem in zip(pattern.sub_patterns, value.elems):
+            bind_value(sub_pattern, elem, bound)
+    else:
+        type_error('Cant match %s with %s' % (pattern, repr(value.readback())))
+
+
+def bind_thunk(pattern, thunk, bound, run):
+    # same than bind_value, but thunk is not evaluated: variables are bound to its components
+    if pattern.var:
+        bound.append(thunk)
+    else:
+        for i, sub_pattern in enumerate(pattern.sub_patterns):
+            bind_thunk(sub_pattern, Projection(thunk, i, run), bound, run)
+
+
+# compiled code of alpha-equivalence classes of expressions, per strategy
+_compiled = WeakKeyDictionary()
+
+
+def compile_expr(expr, strategy):
+    per_strategy = _compiled.setdefault(expr.alpha_key(), {})
+    if strategy not in per_strategy:
+        per_strategy[strategy] = Compiler(strategy).compile(expr)
+    return per_strategy[strategy]
+
+
+def evaluate(expr, strategy, max_steps=25, verbose=False, formatter=None, meter=None):
+    # Returns the canonical form of expr, like the evaluation visitors.
+    # Verbose output shows the result only, there's no trace of the evaluation
+    code = compile_expr(expr, strategy)
+    run = Run(expr, max_steps, meter)
+    try:
+        result = trampoline(code, None, run).readback()
+    except EvalErrorException as error:
+        result = error.result
+    if verbose:
+        msg = ' step ' + ('%s/%s' % (run.steps, max_steps)).rjust(6)
+        print(msg + ' -> ' + (formatter or str)(result))
+    return result
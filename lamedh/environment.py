@@ -0,0 +1,94 @@
+# The definitions of the Terminal: a mapping from names to expressions, as
+# they were written.
+#
+# A definition refers to the definitions of its free names at the time it's
+# made. They are shared, not copied into it, so memory grows with the size
+# of what was written, not with the size of the expanded terms. Expressions
+# are unfolded (the definitions they refer to substituted into them, all the
+# way down) only when an operation needs the whole term.
+#
+# Redefining or deleting a name doesn't change the definitions made before,
+# they keep referring to the old one: the same as if they had been expanded
+# when they were made.
+
+from collections.abc import MutableMapping
+
+from lamedh.expr import Expr
+
+
+class Definition:
+    __slots__ = ('expr', 'references')
+
+    def __init__(self, expr, references):
+        self.expr = expr
+        self.references = references  # free name -> Definition
+
+
+class Environment(MutableMapping):
+    # hidden: names that are stored but can't be referred to
+
+    def __init__(self, hidden=()):
+        self.hidden = frozenset(hidden)
+        self.definitions = {}
+
+    def __getitem__(self, name):
+        return self.definitions[name].expr
+
+    def __setitem__(self, name, expr):
+        self.define(name, expr)
+
+    def define(self, name, expr, free_names=None):
+        # free_names of expr, if they're known, spare computing them. A name
+        # defined again goes to the end, after the names it may refer to
+        definition = Definition(expr, self.references(expr, free_names))
+        self.definitions.pop(name, None)
+        self.definitions[name] = definition
+
+    def __delitem__(self, name):
+        del self.definitions[name]
+
+    def __iter__(self):
+        return iter(self.definitions)
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def references(self, expr, free_names=None):
+        # current definitions of the free names of expr
+        if free_names is None:
+            if not isinstance(expr, Expr):
+                return {}
+            free_names = expr.free_var_names()
+        return {name: self.definitions[name] for name in free_names
+                if name in self.definitions and name not in self.hidden}
+
+    def is_current(self, name):
+        # tells if the definitions name refers to are still the ones of their names
+        return all(self.definitions.get(reference) is definition
+                   for reference, definition in self.definitions[name].references.items())
+
+    def unfold(self, name):
+        # new tree with the expression of name, unfolded
+        return unfold(self.definitions[name])
+
+    def unfold_expr(self, expr):
+        # new tree with expr unfolded with the current definitions
+        return unfold(Definition(expr, self.references(expr)))
+
+
+def unfold(definition):
+    # Unfolds the definitions it refers to first, each one once, with an explicit stack
+    unfolded = {}  # id of each definition -> its expression, unfolded
+    stack = [(definition, False)]
+    while stack:
+        current, references_done = stack.pop()
+        if id(current) in unfolded:
+            continue
+        if references_done:
+            mapping = {name: unfolded[id(reference)] for name, reference in current.references.items()}
+            expr = current.expr.clone()
+            unfolded[id(current)] = expr.substitute(mapping) if mapping else expr
+        else:
+            stack.append((current, True))
+            stack.extend((reference, False) for reference in current.references.values())
+    return unfolded[id(definition)]
@@ -1,2 +1,3 @@
 from .expr import Expr, Var, App, Lam, StopEvaluation
-from .expr import StopEvaluation, CantEvalException, CantReduceException, CantReduceToCanonicalException
\ No newline at end of file
+from .expr import StopEvaluation, CantEvalException, CantReduceException, CantReduceToCanonicalException
+from .expr import EvalErrorException, BudgetExceeded
@@ -1,6 +1,7 @@
 from enum import Enum
+import operator
 from typing import Any
-from lamedh.expr import Expr
+from lamedh.expr import Expr, Var, Lam
 from lamedh.bidict import NameSymbolMap
 
 ConstType = Enum('ConstType', ['Natural', 'Boolean'])
@@ -23,8 +24,40 @@ BinaryOpTable = NameSymbolMap({
     'and': 'And',
 })
 
+# Python implementation of each operator, and the kind of constants it works on
+# (None: any kind, as long as both operands are of the same kind)
+UNARY_OPERATIONS = {
+    'Negative': (operator.neg, ConstType.Natural),
+    'Not': (operator.not_, ConstType.Boolean),
+}
+BINARY_OPERATIONS = {
+    'Sum': (operator.add, ConstType.Natural),
+    'Minus': (operator.sub, ConstType.Natural),
+    'Times': (operator.mul, ConstType.Natural),
+    'Div': (operator.floordiv, ConstType.Natural),
+    'Reminder': (operator.mod, ConstType.Natural),
+    'Equal': (operator.eq, None),
+    'NotEqual': (operator.ne, None),
+    'LessThan': (operator.lt, ConstType.Natural),
+    'LessThanEqual': (operator.le, ConstType.Natural),
+    'MoreThan': (operator.gt, ConstType.Natural),
+    'MoreThanEqual': (operator.ge, ConstType.Natural),
+    'Or': (operator.or_, ConstType.Boolean),
+    'And': (operator.and_, ConstType.Boolean),
+}
+# operators that don't need their right operand when the left one is this value
+SHORT_CIRCUITS = {'Or': True, 'And': False}
+
+
+def constant(value):
+    # the constant node of a Python bool or int
+    if isinstance(value, bool):
+        return BooleanConstant('true' if value else 'false')
+    return NaturalConstant(str(value))
+
 
 class Error(Expr):
+    __slots__ = ()
 
     def __repr__(self):
         return '<Error>'
@@ -34,6 +67,8 @@ class Error(Expr):
 
 
 class TypeError(Expr):
+    __slots__ = ()
+
     def __repr__(self):
         return '<TypeError>'
 
@@ -42,10 +77,23 @@ class TypeError(Expr):
 
 
 class BooleanConstant(Expr):
+    __slots__ = ('value', )
     kind = ConstType.Boolean
+    canonical = True
 
     def __init__(self, value):
         self.value = value
+        self.preserve_tree_structure()
+
+    @property
+    def python_value(self):
+        return self.value == 'true'
+
+    def rebuild(self, children):
+        return self.__class__(self.value)
+
+    def key_data(self):
+        return (self.value, )
 
     def __repr__(self):
         name = self.__class__.__name__
@@ -56,49 +104,87 @@ class BooleanConstant(Expr):
 
 
 class NaturalConstant(BooleanConstant):
+    __slots__ = ()
     kind = ConstType.Natural
 
+    @property
+    def python_value(self):
+        return int(self.value)
+
 
 class UnaryOp(Expr):
+    __slots__ = ('operator', 'operand')
     def __init__(self, operator, operand):
         assert operator in UnaryOpTable.names()
         self.operator = operator
         self.operand = operand
+        self.preserve_tree_structure()
 
     def children(self):
         return [self.operand]
 
+    def rebuild(self, children):
+        return self.__class__(self.operator, *children)
+
+    def key_data(self):
+        return (self.operator, )
+
     @property
     def operator_symbol(self):
         return UnaryOpTable.symbol_of(self.operator)
 
+    @property
+    def operand_kind(self):
+        return UNARY_OPERATIONS[self.operator][1]
+
+    def compute(self, value):
+        return UNARY_OPERATIONS[self.operator][0](value)
+
     def to_string(self, func, name=''):
         return f'{name}({func(self.operator_symbol)} {func(self.operand)})'
 
 
 class BinaryOp(Expr):
+    __slots__ = ('operator', 'left', 'right')
     def __init__(self, operator, left, right):
         assert operator in BinaryOpTable.names()
         self.operator = operator
         self.left = left
         self.right = right
+        self.preserve_tree_structure()
 
     def children(self):
         return [self.left, self.right]
 
+    def rebuild(self, children):
+        return self.__class__(self.operator, *children)
+
+    def key_data(self):
+        return (self.operator, )
+
     @property
     def operator_symbol(self):
         return BinaryOpTable.symbol_of(self.operator)
 
+    @property
+    def operand_kind(self):
+        return BINARY_OPERATIONS[self.operator][1]
+
+    def compute(self, left, right):
+        # raises ZeroDivisionError on division (or reminder) by zero
+        return BINARY_OPERATIONS[self.operator][0](left, right)
+
     def to_string(self, func, name=''):
         return f'{name}({func(self.left)} {func(self.operator_symbol)} {func(self.right)})'
 
 
 class IfThenElse(Expr):
+    __slots__ = ('guard', 'then_body', 'else_body')
     def __init__(self, guard, then_body, else_body):
         self.guard = guard
         self.then_body = then_body
         self.else_body = else_body
+        self.preserve_tree_structure()
 
     def children(self):
         return [self.guard, self.then_body, self.else_body]
@@ -108,12 +194,18 @@ class IfThenElse(Expr):
 
 
 class Tuple(Expr):
+    __slots__ = ('elems', )
+    canonical = True
     def __init__(self, elems):
         self.elems = elems[:]
+        self.preserve_tree_structure()
 
     def children(self):
         return self.elems[:]
 
+    def rebuild(self, children):
+        return self.__class__(list(children))
+
     def to_string(self, func, name=''):
         args = ', '.join(map(func, self.elems))
         if name: name += ':'
@@ -121,9 +213,11 @@ class Tuple(Expr):
 
 
 class Indexing(Expr):
+    __slots__ = ('container', 'index')
     def __init__(self, container, index):
         self.container = container
         self.index = index
+        self.preserve_tree_structure()
 
     def children(self):
         return [self.container, self.index]
@@ -138,12 +232,31 @@ class Pattern:
     var = None
     sub_patterns = None
     def __init__(self, var_or_pattern):
-        from lamedh.expr import Var
         if isinstance(var_or_pattern, Var):
             self.var = var_or_pattern
         else:
             self.sub_patterns = [Pattern(p) for p in var_or_pattern]
 
+    def raw(self):
+        # what the constructor expects, with fresh Var nodes
+        if self.var:
+            return Var(self.var.var_name)
+        return [p.raw() for p in self.sub_patterns]
+
+    def names(self):
+        # the variable name, or nested tuples of names
+        if self.var:
+            return self.var.var_name
+        return tuple(p.names() for p in self.sub_patterns)
+
+    def rename(self, old_name, new_name):
+        if self.var:
+            if self.var.var_name == old_name:
+                self.var.rename(new_name)
+        else:
+            for p in self.sub_patterns:
+                p.rename(old_name, new_name)
+
     def to_string(self, func, name=''):
         if self.var:
             return func(self.var)
@@ -160,6 +273,9 @@ class Pattern:
 
 
 class LetIn(Expr):
+    __slots__ = ('in_expr', 'patterns', 'sub_exprs')
+    str_prefix = 'let '
+
     def __init__(self, definitions, in_expr):
         patterns, sub_exprs = zip(*definitions)
         assert isinstance(patterns, tuple)
@@ -167,36 +283,102 @@ class LetIn(Expr):
         self.in_expr = in_expr
         self.patterns = [Pattern(p) for p in patterns]
         self.sub_exprs = sub_exprs
+        self.preserve_tree_structure()
 
     def children(self):
         yield self.in_expr
         for child in self.sub_exprs:
             yield child
 
+    def rebuild(self, children):
+        in_expr, *sub_exprs = children
+        patterns = [p.raw() for p in self.patterns]
+        return self.__class__(list(zip(patterns, sub_exprs)), in_expr)
+
+    def definitions(self):
+        return list(zip(self.patterns, self.sub_exprs))
+
+    def replace_child(self, old, new):
+        new.parent = self
+        if self.in_expr is old:
+            self.in_expr = new
+        self.sub_exprs = tuple(new if sub is old else sub for sub in self.sub_exprs)
+        self.invalidate_cache()
+
+    def rename(self, old_name, new_name):
+        # renames a variable bound by the patterns, and its occurrences
+        for pattern in self.patterns:
+            pattern.rename(old_name, new_name)
+        children = list(self.children())
+        for position in self.key_scope()[1]:
+            child = children[position]
+            self.replace_child(child, child.substitute({old_name: Var(new_name)}))
+        self.invalidate_cache()
+
+    def key_data(self):
+        # names bound by let are part of the key: alpha-equivalence is only
+        # taken into account for lambdas
+        return tuple(p.names() for p in self.patterns)
+
+    def key_scope(self):
+        # definitions are bound in the in expression only
+        return (self.bound_names(), (0, ))
+
+    def bound_names(self):
+        names = []
+        for pattern in self.patterns:
+            stack = [pattern]
+            while stack:
+                p = stack.pop()
+                if p.var:
+                    names.append(p.var.var_name)
+                else:
+                    stack.extend(p.sub_patterns)
+        return tuple(sorted(set(names)))
+
     def to_string(self, func, name=''):
         args = ', '.join(
             f'{func(pattern)}:={func(sub_expr)}' for pattern, sub_expr in zip(self.patterns, self.sub_exprs))
         return f'({name}{args} in {func(self.in_expr)})'
 
-    def __str__(self):
-        return self.to_string(str, 'let ')
-
 
 class LetRec(LetIn):
+    __slots__ = ()
+    str_prefix = 'letrec '
+
     def __init__(self, definitions, in_expr):
         super().__init__(definitions, in_expr)
         # just finish ensuring that definitions are abstractions
-        from lamedh.expr import Lam
         for sub in self.sub_exprs:
             assert isinstance(sub, Lam)
 
-    def __str__(self):
-        return self.to_string(str, 'letrec ')
+    def key_scope(self):
+        # definitions are bound in the in expression, and in the definitions themselves
+        return (self.bound_names(), tuple(range(1 + len(self.sub_exprs))))
+
+    def unfolding(self, definition):
+        # what a variable defined as the lambda definition stands for: the lambda,
+        # which body is wrapped in the letrec again
+        from lamedh.visitors import var_name_generator_numerical
+        lam = definition.clone()
+        taken = self.free_var_names().union(self.bound_names(), lam.body.free_var_names())
+        if lam.var_name in self.free_var_names() or lam.var_name in self.bound_names():
+            # otherwise the lambda would capture free variables of the definitions,
+            # or the letrec would capture the variable of the lambda
+            name_gen = var_name_generator_numerical(lam.var_name)
+            new_name = lam.var_name
+            while new_name in taken:
+                new_name = next(name_gen)
+            lam.rename(new_name)
+        wrapped = self.rebuild([lam.body] + [sub.clone() for sub in self.sub_exprs])
+        return Lam(lam.var_name, wrapped)
 
 
 class Rec(Expr):
+    __slots__ = ('body', )
     def __init__(self, body):
         self.body = body
+        self.preserve_tree_structure()
 
     def children(self):
         return [self.body]
@@ -0,0 +1,292 @@
+# Compact binary format for expressions, and for lists of named definitions
+# (what the Terminal dumps and loads).
+#
+#   header:      MAGIC, then the version (a varint)
+#   names:       how many, then each one as its length and its utf-8 bytes
+#   definitions: how many, then each one as the index of its name, its free
+#                names (how many, and their indices) and its tree
+#
+# Numbers are unsigned LEB128 varints. Trees are written in pre-order, each
+# node as its tag and its data, names (and constant values) as indices in
+# the names table:
+#   Var: name             Lam: name, body            App: operator, operand
+#   constants: value      UnaryOp, BinaryOp: operator name, operands
+#   Tuple: number of elements, elements              LetIn, LetRec: number
+#   of definitions, their patterns, in expression, definitions
+#   and the rest of the nodes just their children.
+# Patterns are tagged too: a Var with its name, or a tuple with how many
+# patterns, followed by them.
+#
+# Both writing and reading go with explicit stacks, so trees of any depth
+# can be dumped.
+
+import gc
+from contextlib import contextmanager
+
+from lamedh.expr.expr import Var, Lam, App
+from lamedh.expr.applicative import (
+    BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse,
+    Error, TypeError, Tuple, Indexing, LetIn, LetRec, Rec
+)
+
+MAGIC = b'\x89LMD'
+VERSION = 1
+
+NODES = [Var, Lam, App, BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse,
+         Error, TypeError, Tuple, Indexing, LetIn, LetRec, Rec]
+TAGS = {node_type: tag for tag, node_type in enumerate(NODES)}
+PATTERN_VAR, PATTERN_TUPLE = 0, 1
+# nodes which data is a name (or constant value, or operator name)
+NAMED = (Var, Lam, BooleanConstant, NaturalConstant, UnaryOp, BinaryOp)
+# number of children of the nodes that always have the same
+CHILDREN = {Var: 0, Lam: 1, App: 2, BooleanConstant: 0, NaturalConstant: 0, UnaryOp: 1, BinaryOp: 2,
+            IfThenElse: 3, Error: 0, TypeError: 0, Indexing: 2, Rec: 1}
+
+
+class FormatError(ValueError):
+    pass
+
+
+def is_binary(data):
+    # tells if data (the first bytes of a file are enough) is in this format
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dumps(expr):
+    return dump_definitions([('', expr)])
+
+
+def loads(data):
+    definitions = load_definitions(data)
+    if len(definitions) != 1:
+        raise FormatError('Expected a single expression, found %s' % len(definitions))
+    return definitions[0][1]
+
+
+def dump_definitions(definitions):
+    # bytes with the given (name, expr) pairs, any iterable of them
+    writer = Writer()
+    count = 0
+    for name, expr in definitions:
+        writer.varint(writer.name(name))
+        free_names = expr.free_var_names()
+        writer.varint(len(free_names))
+        for free_name in sorted(free_names):
+            writer.varint(writer.name(free_name))
+        writer.tree(expr)
+        count += 1
+    out = Writer()
+    out.buffer += MAGIC
+    out.varint(VERSION)
+    out.varint(len(writer.names))
+    for name in writer.names:
+        encoded = name.encode('utf-8')
+        out.varint(len(encoded))
+        out.buffer += encoded
+    out.varint(count)
+    out.buffer += writer.buffer
+    return bytes(out.buffer)
+
+
+@contextmanager
+def paused_gc():
+    # Building lots of nodes (parent links make cycles) runs the cyclic garbage
+    # collector over and over, going through all the nodes built each time,
+    # and none of them is garbage
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load_definitions(data):
+    # list of the (name, expr, free names) of the definitions in data. Free
+    # names are stored so they don't have to be computed walking the trees
+    with paused_gc():
+        return read_definitions(data)
+
+
+def read_definitions(data):
+    if not is_binary(data):
+        raise FormatError('Not a lamedh binary file')
+    reader = Reader(data, len(MAGIC))
+    version = reader.varint()
+    if version != VERSION:
+        raise FormatError('Unsupported version %s, expected %s' % (version, VERSION))
+    names = []
+    for _ in range(reader.varint()):
+        size = reader.varint()
+        names.append(reader.bytes(size).decode('utf-8'))
+    reader.names = names
+    definitions = []
+    for _ in range(reader.varint()):
+        name = reader.name()
+        free_names = frozenset(reader.name() for _ in range(reader.varint()))
+        definitions.append((name, reader.tree(), free_names))
+    return definitions
+
+
+class Writer:
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.names = []
+        self.indices = {}
+
+    def varint(self, number):
+        buffer = self.buffer
+        while number >= 0x80:
+            buffer.append((number & 0x7f) | 0x80)
+            number >>= 7
+        buffer.append(number)
+
+    def name(self, name):
+        # index of name in the table, added if it's not there yet
+        index = self.indices.get(name)
+        if index is None:
+            index = self.indices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def tree(self, expr):
+        varint, name = self.varint, self.name
+        stack = [expr]
+        while stack:
+            node = stack.pop()
+            node_type = type(node)
+            if node_type not in TAGS:
+                raise FormatError('Can not write nodes of type %s' % node_type.__name__)
+            varint(TAGS[node_type])
+            if node_type is Var or node_type is Lam:
+                varint(name(node.var_name))
+            elif node_type is BooleanConstant or node_type is NaturalConstant:
+                varint(name(node.value))
+            elif node_type is UnaryOp or node_type is BinaryOp:
+                varint(name(node.operator))
+            elif node_type is Tuple:
+                varint(len(node.elems))
+            elif node_type is LetIn or node_type is LetRec:
+                varint(len(node.patterns))
+                for pattern in node.patterns:
+                    self.pattern(pattern)
+            stack.extend(reversed(list(node.children())))
+
+    def pattern(self, pattern):
+        # patterns are small, written recursively
+        if pattern.var:
+            self.varint(PATTERN_VAR)
+            self.varint(self.name(pattern.var.var_name))
+        else:
+            self.varint(PATTERN_TUPLE)
+            self.varint(len(pattern.sub_patterns))
+            for sub_pattern in pattern.sub_patterns:
+                self.pattern(sub_pattern)
+
+
+class Reader:
+
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+        self.names = []
+
+    def varint(self):
+        data, position = self.data, self.position
+        number = shift = 0
+        try:
+            while True:
+                byte = data[position]
+                position += 1
+                number |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+        except IndexError:
+            raise FormatError('Unexpected end of data')
+        self.position = position
+        return number
+
+    def bytes(self, size):
+        if self.position + size > len(self.data):
+            raise FormatError('Unexpected end of data')
+        chunk = self.data[self.position:self.position + size]
+        self.position += size
+        return chunk
+
+    def name(self):
+        index = self.varint()
+        if index >= len(self.names):
+            raise FormatError('Unknown name %s' % index)
+        return self.names[index]
+
+    def tree(self):
+        # Reads the nodes in pre-order, then builds them from the last one:
+        # by then the trees of its children are the last ones built.
+        # Most numbers fit in a byte, those are read inline
+        data, names = self.data, self.names
+        nodes = []
+        pending = 1  # nodes still to be read
+        try:
+            while pending:
+                tag = data[self.position]
+                self.position += 1
+                if tag >= len(NODES):
+                    raise FormatError('Unknown node tag %s' % tag)
+                node_type = NODES[tag]
+                count = CHILDREN.get(node_type)
+                if node_type in NAMED:
+                    index = data[self.position]
+                    if index < 0x80:
+                        self.position += 1
+                    else:
+                        index = self.varint()
+                    value = names[index]
+                elif node_type is Tuple:
+                    value = count = self.varint()
+                elif node_type is LetIn or node_type is LetRec:
+                    value = [self.pattern() for _ in range(self.varint())]
+                    count = 1 + len(value)
+                else:
+                    value = None
+                nodes.append((node_type, value, count))
+                pending += count - 1
+        except IndexError:
+            raise FormatError('Unexpected end of data, or unknown name')
+        built = []
+        pop = built.pop
+        for node_type, value, count in reversed(nodes):
+            if node_type is Var:
+                node = Var(value)
+            elif node_type is App:
+                operator = pop()
+                node = App(operator, pop())
+            elif node_type is Lam:
+                node = Lam(value, pop())
+            else:
+                children = [pop() for _ in range(count)]
+                node = build(node_type, value, children)
+            built.append(node)
+        return built[0]
+
+    def pattern(self):
+        kind = self.varint()
+        if kind == PATTERN_VAR:
+            return Var(self.name())
+        return [self.pattern() for _ in range(self.varint())]
+
+
+def build(node_type, data, children):
+    # the nodes other than Var, Lam and App
+    if node_type in (BooleanConstant, NaturalConstant):
+        return node_type(data)
+    if node_type in (UnaryOp, BinaryOp):
+        return node_type(data, *children)
+    if node_type is Tuple:
+        return Tuple(children)
+    if node_type is LetIn or node_type is LetRec:
+        in_expr, *sub_exprs = children
+        return node_type(list(zip(data, sub_exprs)), in_expr)
+    return node_type(*children)
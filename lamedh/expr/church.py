@@ -0,0 +1,233 @@
+# Native Church numerals and booleans for normalization by evaluation.
+#
+# Church numerals (λf.λx.f (f ... x)) and booleans (λx.λy.x, λx.λy.y) found
+# in a term are evaluated into Church values, holding a Python int or bool,
+# and well known combinators working on them (Suc, AND, ...) into Combinator
+# values, that compute natively when applied to Church values. Either of them
+# behaves like the lambda they stand for when applied to anything else, so
+# normal forms are the same (up to the names of bound variables) than
+# reducing the lambda terms. They are only read back into lambda terms at the end.
+#
+# Terms are recognized by their shape as De Bruijn terms, that is, modulo
+# alpha-equivalence. Each native computation counts as a single step.
+
+from lamedh.expr.debruijn import to_debruijn, Abs, Apply, Bound
+from lamedh.expr.nbe import Native, Thunk, VAR, APP
+
+# Well known combinators: name, arity, and lambda term
+COMBINATORS = [
+    ('suc', 1, 'λn.λf.λx.(f ((n f) x))'),
+    ('plus', 2, 'λm.λn.λf.λx.((m f) ((n f) x))'),
+    ('mult', 2, 'λm.λn.λf.(m (n f))'),
+    ('pred', 1, 'λn.λf.λx.(((n (λg.λh.(h (g f)))) (λu.x)) (λu.u))'),
+    ('iszero', 1, 'λn.((n (λx.(λt.(λf.f)))) (λt.(λf.t)))'),
+    ('not', 1, 'λb.λx.λy.((b y) x)'),
+    ('and', 2, 'λb.λc.λx.λy.((b ((c x) y)) y)'),
+    ('or', 2, 'λb.λc.λx.λy.((b x) ((c x) y))'),
+    ('if', 3, 'λb.λx.λy.((b x) y)'),
+]
+
+MAX_SHAPE_SIZE = 40
+# code of `f x`, in an environment (x, (f, None))
+APPLY_F = (APP, (VAR, 1), (VAR, 0))
+
+
+def shape(term, limit=MAX_SHAPE_SIZE):
+    # hashable structure of a closed term, or None if it has more than limit nodes
+    counter = [0]
+    def walk(term):
+        counter[0] += 1
+        if counter[0] > limit:
+            raise OverflowError
+        if isinstance(term, Bound):
+            return term.index
+        if isinstance(term, Abs):
+            return ('λ', walk(term.body))
+        return (walk(term.operator), walk(term.operand))
+    try:
+        return walk(term)
+    except OverflowError:
+        return None
+
+
+_shapes = None
+
+
+def known_shapes():
+    # {shape: (name, arity)}, parsed on first use
+    global _shapes
+    if _shapes is None:
+        from lamedh.expr import Expr  # type: ignore
+        _shapes = {}
+        for name, arity, txt in COMBINATORS:
+            _shapes[shape(to_debruijn(Expr.from_string(txt)))] = (name, arity)
+    return _shapes
+
+
+def church_value(term):
+    # the int (or bool for λx.λy.x) of a Church numeral term, or None
+    if not (isinstance(term, Abs) and isinstance(term.body, Abs)):
+        return None
+    body = term.body.body
+    if isinstance(body, Bound) and body.index == 1:
+        return True
+    count = 0
+    while isinstance(body, Apply) and isinstance(body.operator, Bound) and body.operator.index == 1:
+        body = body.operand
+        count += 1
+    if isinstance(body, Bound) and body.index == 0:
+        return count
+    return None
+
+
+def church_term(value, names):
+    # the lambda term of a Church numeral or boolean
+    f_name, x_name = names
+    if value is True:
+        return Abs(f_name, Abs(x_name, Bound(1)))
+    body = Bound(0)
+    for _ in range(int(value)):
+        body = Apply(Bound(1), body)
+    return Abs(f_name, Abs(x_name, body))
+
+
+def as_int(value):
+    if isinstance(value, Church) and not value.args and value.value is not True:
+        return int(value.value)
+    return None
+
+
+def as_bool(value):
+    if isinstance(value, Church) and not value.args and (value.value is True or value.value == 0):
+        return bool(value.value)
+    return None
+
+
+class Church(Native):
+
+    def __init__(self, normalizer, value, names, args=()):
+        # names of the binders of the lambda term, so it reads back like reducing it would
+        super().__init__(normalizer, 2, args)
+        self.value = value
+        self.names = names
+
+    def with_args(self, args):
+        return Church(self.normalizer, self.value, self.names, args)
+
+    def compute(self, f, x):
+        if self.value is True:
+            return f.force()
+        result = x
+        for _ in range(int(self.value)):
+            result = Thunk(APPLY_F, (result, (f, None)), self.normalizer)
+        return result.force()
+
+    def term(self):
+        return church_term(self.value, self.names)
+
+    def readback_term(self):
+        return None if self.args else self.term()
+
+    def lambda_value(self):
+        return self.normalizer.evaluate(self.term(), natives=False)
+
+
+class Combinator(Native):
+
+    def __init__(self, normalizer, name, arity, term, args=()):
+        super().__init__(normalizer, arity, args)
+        self.name = name
+        self.term = term
+
+    def with_args(self, args):
+        return Combinator(self.normalizer, self.name, self.arity, self.term, args)
+
+    def compute(self, *args):
+        return getattr(self, 'compute_' + self.name)(*args)
+
+    def lambda_value(self):
+        return self.normalizer.evaluate(self.term, natives=False)
+
+    def church(self, value, names=None):
+        # Numerals larger than max_steps are left to the lambda term: big ints
+        # are cheap, but a numeral reads back as a term as big as its value, and
+        # natively a few steps reach values far too big to read back. The term
+        # only grows as its steps go. The binders are named like the ones
+        # reducing the lambda term leaves, by default the two after the arguments
+        if value is not True and value > self.normalizer.max_steps:
+            return None
+        if names is None:
+            term = self.term
+            for _ in range(self.arity):
+                term = term.body
+            names = (term.name, term.body.name)
+        return Church(self.normalizer, value, names)
+
+    def compute_suc(self, n):
+        n = as_int(n.force())
+        return None if n is None else self.church(n + 1)
+
+    def compute_plus(self, m, n):
+        m = as_int(m.force())
+        n = None if m is None else as_int(n.force())
+        return None if n is None else self.church(m + n)
+
+    def compute_mult(self, m, n):
+        # λm.λn.λf.(m (n f)): the second binder is the one of m
+        m_value = m.force()
+        m = as_int(m_value)
+        names = None if m is None else (self.term.body.body.name, m_value.names[1])
+        if m == 0:
+            return self.church(0, names)  # n is not needed
+        n = None if m is None else as_int(n.force())
+        return None if n is None else self.church(m * n, names)
+
+    def compute_pred(self, n):
+        n = as_int(n.force())
+        return None if n is None else self.church(max(n - 1, 0))
+
+    def compute_iszero(self, n):
+        # λn.((n (λx.λt.λf.f)) (λt.λf.t)): the result is one of its lambdas
+        n = as_int(n.force())
+        if n is None:
+            return None
+        body = self.term.body
+        result = body.operand if n == 0 else body.operator.operand.body
+        return self.church(n == 0, (result.name, result.body.name))
+
+    def compute_not(self, b):
+        b = as_bool(b.force())
+        return None if b is None else self.church(not b)
+
+    def compute_and(self, b, c):
+        b = as_bool(b.force())
+        if b is False:
+            return self.church(False)  # c is not needed
+        c = None if b is None else as_bool(c.force())
+        return None if c is None else self.church(c)
+
+    def compute_or(self, b, c):
+        b = as_bool(b.force())
+        if b is True:
+            return self.church(True)  # c is not needed
+        c = None if b is None else as_bool(c.force())
+        return None if c is None else self.church(c)
+
+    def compute_if(self, b, x, y):
+        b = as_bool(b.force())
+        if b is None:
+            return None
+        return x.force() if b else y.force()
+
+
+def recognize(term, normalizer):
+    # the native value of a closed term, or None
+    value = church_value(term)
+    if value is not None:
+        names = (term.name, term.body.name)
+        return Church(normalizer, value, names)
+    known = known_shapes().get(shape(term))
+    if known is not None:
+        name, arity = known
+        return Combinator(normalizer, name, arity, term)
+    return None
@@ -0,0 +1,279 @@
+# Nameless (De Bruijn indexed) representation of pure lambda terms.
+#
+# Terms are immutable, so reductions share every subtree they don't touch,
+# and bound variables are indices instead of names, so substitution never
+# needs to rename. Names are only produced again by `from_debruijn`, when a
+# term needs to be displayed or handed back as an Expr.
+
+from lamedh.expr.expr import Var, Lam, App, CantReduceToCanonicalException
+from lamedh.visitors import BaseVisitor, var_name_generator_numerical
+
+
+class Term:
+    # redices: number of redices in the term
+    # loose: indices pointing outside of the term (relative to the term's root)
+    # max_loose: max(loose), or -1 if the term doesn't have loose indices
+    # free_names: names of the free (not indexed) variables in the term
+    # size: number of nodes of the term
+    redices = 0
+    loose = frozenset()
+    max_loose = -1
+    free_names = frozenset()
+    size = 1
+
+    def is_redex(self):
+        return False
+
+
+class Bound(Term):
+
+    def __init__(self, index):
+        self.index = index
+        self.loose = frozenset([index])
+        self.max_loose = index
+
+    def __repr__(self):
+        return f'<Bound:{self.index}>'
+
+
+class Free(Term):
+
+    def __init__(self, name):
+        self.name = name
+        self.free_names = frozenset([name])
+
+    def __repr__(self):
+        return f'<Free:{self.name}>'
+
+
+class Abs(Term):
+
+    def __init__(self, name, body):
+        # name is just a hint for from_debruijn, it plays no role on reductions
+        self.name = name
+        self.body = body
+        self.redices = body.redices
+        self.loose = frozenset(i - 1 for i in body.loose if i > 0)
+        self.max_loose = body.max_loose - 1 if body.max_loose > 0 else -1
+        self.free_names = body.free_names
+        self.size = 1 + body.size
+
+    def __repr__(self):
+        return f'Abs(λ{self.name}.{repr(self.body)})'
+
+
+class Apply(Term):
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+        self.redices = operator.redices + operand.redices + (1 if self.is_redex() else 0)
+        self.loose = operator.loose | operand.loose
+        self.max_loose = max(operator.max_loose, operand.max_loose)
+        self.free_names = operator.free_names | operand.free_names
+        self.size = 1 + operator.size + operand.size
+
+    def is_redex(self):
+        return isinstance(self.operator, Abs)
+
+    def __repr__(self):
+        return f'Apply({repr(self.operator)} {repr(self.operand)})'
+
+
+class ToDeBruijnVisitor(BaseVisitor):
+    # binders holds the names of the enclosing lambdas, as a linked list
+    # (innermost name, rest of the binders), so entering a lambda copies nothing
+
+    def enter_lam(self, expr, binders):
+        return ((expr.var_name, binders), )
+
+    def visit_var(self, expr, visited_children, binders):
+        index = 0
+        while binders is not None:
+            name, binders = binders
+            if name == expr.var_name:
+                return Bound(index)
+            index += 1
+        return Free(expr.var_name)
+
+    def visit_lam(self, expr, visited_children, binders):
+        return Abs(expr.var_name, visited_children[0])
+
+    def visit_app(self, expr, visited_children, binders):
+        return Apply(*visited_children)
+
+
+def to_debruijn(expr):
+    return ToDeBruijnVisitor().visit(expr, None)
+
+
+def from_debruijn(term, binders=None):
+    # binders holds the names given to the enclosing Abs, innermost last.
+    # Done with an explicit stack, normal forms may be very deep terms
+    binders = list(binders or [])
+    results = []
+    stack = [term]
+    while stack:
+        term = stack.pop()
+        if term == 'app':
+            operand = results.pop()
+            results.append(App(results.pop(), operand))
+        elif term == 'lam':
+            results.append(Lam(binders.pop(), results.pop()))
+        elif isinstance(term, Bound):
+            results.append(Var(binders[-1 - term.index]))
+        elif isinstance(term, Free):
+            results.append(Var(term.name))
+        elif isinstance(term, Apply):
+            stack.extend(['app', term.operand, term.operator])
+        else:
+            # Abs: keep the hinted name unless it would capture some other variable of the body
+            names_not_to_use = set(term.body.free_names)
+            names_not_to_use.update(binders[-i] for i in term.body.loose if i > 0)
+            name = term.name
+            if name in names_not_to_use:
+                name_gen = var_name_generator_numerical(name)
+                while name in names_not_to_use:
+                    name = next(name_gen)
+            binders.append(name)
+            stack.extend(['lam', term.body])
+    return results.pop()
+
+
+def rebuild(term, replace, depth=0):
+    # term with its subterms replaced by replace(subterm, depth), depth being
+    # the number of Abs around the subterm plus the given one. Subterms for
+    # which replace returns None are rebuilt from their replaced children.
+    # Done with an explicit stack, like from_debruijn
+    results = []
+    # each stack item is (term, depth), or (term, None) once its children
+    # were pushed to the stack
+    stack = [(term, depth)]
+    while stack:
+        term, depth = stack.pop()
+        if depth is None:
+            if isinstance(term, Abs):
+                results.append(Abs(term.name, results.pop()))
+            else:
+                operand = results.pop()
+                results.append(Apply(results.pop(), operand))
+            continue
+        replaced = replace(term, depth)
+        if replaced is not None:
+            results.append(replaced)
+        elif isinstance(term, Abs):
+            stack.extend([(term, None), (term.body, depth + 1)])
+        else:
+            stack.extend([(term, None), (term.operand, depth), (term.operator, depth)])
+    return results.pop()
+
+
+def shift(term, amount, cutoff=0):
+    # adds amount to every index of term that points beyond cutoff
+    def replace(term, cutoff):
+        if term.max_loose < cutoff:
+            return term
+        if isinstance(term, Bound):
+            return Bound(term.index + amount)
+        return None
+    return rebuild(term, replace, cutoff)
+
+
+def instantiate(body, arg, depth=0):
+    # replaces index `depth` by arg, and removes the binder that index refers to
+    def replace(body, depth):
+        if body.max_loose < depth:
+            return body
+        if isinstance(body, Bound):
+            if body.index == depth:
+                return shift(arg, depth)
+            return Bound(body.index - 1)
+        return None
+    return rebuild(body, replace, depth)
+
+
+def beta(redex):
+    return instantiate(redex.operator.body, redex.operand)
+
+
+def replace_on_path(path, term):
+    # rebuilds the terms of path (pairs of term and the side it was left by,
+    # outermost first) with term at its end
+    for parent, side in reversed(path):
+        if isinstance(parent, Abs):
+            term = Abs(parent.name, term)
+        elif side == 'operator':
+            term = Apply(term, parent.operand)
+        else:
+            term = Apply(parent.operator, term)
+    return term
+
+
+def reduce_innermost(term):
+    # reduces the last redex in pre-order, same choice that Expr.get_innermost_redex makes
+    path = []
+    while True:
+        if isinstance(term, Abs):
+            path.append((term, 'body'))
+            term = term.body
+        elif term.operand.redices:
+            path.append((term, 'operand'))
+            term = term.operand
+        elif term.operator.redices:
+            path.append((term, 'operator'))
+            term = term.operator
+        else:
+            return replace_on_path(path, beta(term))
+
+
+def reduce_outermost(term):
+    # reduces the first redex in pre-order, same choice that Expr.get_outermost_redex makes
+    path = []
+    while True:
+        if isinstance(term, Abs):
+            path.append((term, 'body'))
+            term = term.body
+        elif term.is_redex():
+            return replace_on_path(path, beta(term))
+        elif term.operator.redices:
+            path.append((term, 'operator'))
+            term = term.operator
+        else:
+            path.append((term, 'operand'))
+            term = term.operand
+
+
+def goto_normal_form(expr, max_steps=25, verbose=False, **kwargs):
+    # Same reduction sequence (and same verbose output) than Expr.goto_normal_form
+    step = 0
+    def show(term):
+        str_expr = kwargs.get('formatter', str)(from_debruijn(term))
+        print('step', step, '->', str_expr, '    %s redices' % term.redices)
+    term = to_debruijn(expr.goto_root())
+    if verbose:
+        show(term)
+    meter = kwargs.get('meter')
+    while term.redices and step < max_steps:
+        term = reduce_innermost(term)
+        step += 1
+        if meter:
+            meter.check(step, term.size)
+        if verbose:
+            show(term)
+    return from_debruijn(term)
+
+
+def goto_canonical(expr, max_steps=25, verbose=False, meter=None):
+    # Same reduction sequence (and same verbose output) than Expr.goto_canonical
+    term = to_debruijn(expr.goto_root())
+    step = 0
+    while not isinstance(term, Abs) and step < max_steps:
+        if not term.redices:
+            raise CantReduceToCanonicalException
+        term = reduce_outermost(term)
+        step += 1
+        if meter:
+            meter.check(step, term.size)
+        if verbose:
+            print(from_debruijn(term))
+    return from_debruijn(term)
@@ -1,14 +1,27 @@
-from copy import deepcopy
-
+from lamedh.budget import metering
+from lamedh.cache import memoized
 from lamedh.tree import TreeNode
-from lamedh.visitors import FreeVarVisitor, BoundVarVisitor, SubstituteVisitor, RedicesVisitor
-from lamedh.visitors import EvalNormalVisitor, EvalEagerVisitor
+from lamedh.expr import intern
+from lamedh.visitors import FreeVarVisitor, BoundVarVisitor, SubstituteVisitor, RedicesVisitor, CloneVisitor
+from lamedh.visitors import EvalNormalVisitor, EvalEagerVisitor, EvalLazyVisitor
 
 
 class StopEvaluation(Exception):
     pass
 
 
+class BudgetExceeded(StopEvaluation):
+    # evaluation used more than its Budget of resource (seconds, nodes or memory).
+    # stats: what it used until then, see budget.Meter.stats
+    def __init__(self, msg, resource, stats):
+        super().__init__(msg)
+        self.resource = resource
+        self.stats = stats
+
+    def __reduce__(self):
+        return (self.__class__, (str(self), self.resource, self.stats))
+
+
 class CantEvalException(Exception):
     pass
 
@@ -17,22 +30,76 @@ class CantReduceException(Exception):
     pass
 
 
+class EvalErrorException(Exception):
+    # evaluation ended in an error: result is the Error or TypeError expression
+    def __init__(self, result, msg=''):
+        super().__init__(msg or str(result))
+        self.result = result
+
+
 class CantReduceToCanonicalException(Exception):
     pass
 
 
+def check_backend(backend, known_backends):
+    if backend not in known_backends:
+        raise ValueError('Unknown backend %s. Options are: %s' % (backend, ', '.join(known_backends)))
+
+
 class Expr(TreeNode):
+    # Data about the subtree of each node, computed on demand and dropped by
+    # invalidate_cache whenever the subtree is mutated:
+    #  - number of redices, see count_redices
+    #  - names of the free variables, see free_var_names
+    #  - interned alpha-equivalence key, see alpha_key
+    #  - number of nodes, see size
+    CACHED_ATTRS = ('_redex_count', '_free_names', '_alpha_key', '_size')
+    __slots__ = CACHED_ATTRS
+    # canonical forms are the results of evaluations
+    canonical = False
 
     @staticmethod
-    def from_string(expr_str):
+    def from_string(expr_str, backend='precedence'):
+        # Both backends parse the same trees. The precedence parser runs in
+        # linear time, handing the inputs Earley resolves by ties over to it
         # import here to avoid circular import error
-        from lamedh.parsing.simple import parser  # type: ignore
+        if backend == 'earley':
+            from lamedh.parsing.simple import parser  # type: ignore
+        else:
+            check_backend(backend, ['precedence', 'earley'])
+            from lamedh.parsing.precedence import parser  # type: ignore
         return parser.parse(expr_str)
 
-    def clone(self):
-        return deepcopy(self)
+    def __init__(self):
+        self.preserve_tree_structure()
+
+    def preserve_tree_structure(self):
+        super().preserve_tree_structure()
+        self._redex_count = self._free_names = self._alpha_key = self._size = None
+
+    def clone(self, meter=None):
+        # copies this subtree (not its ancestors). The copy is a new root.
+        # With a meter, the budget is checked while copying
+        return CloneVisitor(meter).visit(self)
+
+    def __getstate__(self):
+        # pickled without the cached values: alpha keys are interned per process
+        return {name: getattr(self, name) for cls in type(self).__mro__
+                for name in getattr(cls, '__slots__', ()) if name not in self.CACHED_ATTRS}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        for attr in self.CACHED_ATTRS:
+            setattr(self, attr, None)
+
+    def rebuild(self, children):
+        # new node of the same kind than self, with the given children
+        return self.__class__(*children)
 
     def get_free_vars(self):
+        # the free Var nodes, one per occurrence. It's a list: Var nodes are
+        # equal when they have the same name, a set would keep only one of them
         return FreeVarVisitor().visit(self)
 
     def is_redex(self):
@@ -48,97 +115,289 @@ class Expr(TreeNode):
         root = self.goto_root()
         return RedicesVisitor().visit(root)
 
+    def count_redices(self):
+        # Number of redices in this subtree. Cached per node, so after a reduction
+        # only the spliced subtree and its ancestors need to be counted again.
+        return self.compute_cached('_redex_count', 'combine_redex_counts')
+
+    def combine_redex_counts(self, children_counts):
+        return (1 if self.is_redex() else 0) + sum(children_counts)
+
+    def free_var_names(self):
+        # frozenset with the names of the free variables of this subtree. Cached per node
+        return self.compute_cached('_free_names', 'combine_free_var_names')
+
+    def combine_free_var_names(self, children_names):
+        scope = self.key_scope()
+        if scope is not None:
+            names, positions = scope
+            children_names = [child_names.difference(names) if i in positions else child_names
+                              for i, child_names in enumerate(children_names)]
+        return frozenset().union(*children_names)
+
+    def size(self):
+        # Number of nodes in this subtree. Cached per node
+        return self.compute_cached('_size', 'combine_sizes')
+
+    def combine_sizes(self, children_sizes):
+        return 1 + sum(children_sizes)
+
+    def alpha_key(self):
+        # Interned key of this subtree, the same object for all alpha-equivalent expressions
+        return self.compute_cached('_alpha_key', 'combine_alpha_keys')
+
+    def combine_alpha_keys(self, children_keys):
+        return intern.intern(self.__class__.__name__, self.key_data(), children_keys, self.key_scope())
+
+    def key_data(self):
+        # hashable data, besides the children, that tells apart nodes of the same class
+        return ()
+
+    def key_scope(self):
+        # for nodes binding names (other than Lam): the names, and the positions
+        # of the children where they are bound. See intern.Key
+        return None
+
+    def alpha_digest(self):
+        # hex string identifying this subtree up to alpha-equivalence. Stable between runs
+        return self.alpha_key().hexdigest()
+
+    def __eq__(self, other):
+        # alpha-equivalence
+        if not isinstance(other, Expr):
+            return NotImplemented
+        return self.alpha_key() is other.alpha_key()
+
+    def __hash__(self):
+        return hash(self.alpha_key())
+
+    def compute_cached(self, attr, combine):
+        # Computes attr bottom-up with an explicit stack, only on nodes that don't have it
+        # cached. The method named `combine` of each node builds its value from the values
+        # of its children
+        stack = [(self, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if getattr(node, attr) is not None:
+                continue
+            if children_done:
+                children_values = [getattr(child, attr) for child in node.children()]
+                setattr(node, attr, getattr(node, combine)(children_values))
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+        return getattr(self, attr)
+
+    def invalidate_cache(self):
+        # Must be called on a node whenever its subtree is mutated in-place.
+        # Values are only cached on a node if they're cached in all its subtree, so
+        # once a node without cached values is found, its ancestors don't have any either
+        node = self
+        while node is not None:
+            if all(getattr(node, attr) is None for attr in self.CACHED_ATTRS):
+                break
+            for attr in self.CACHED_ATTRS:
+                setattr(node, attr, None)
+            node = node.parent
+
+    def get_outermost_redex(self):
+        # Same as get_redices()[0], but only walks down a single path of the tree
+        node = self.goto_root()
+        if not node.count_redices():
+            return None
+        while not node.is_redex():
+            node = next(c for c in node.children() if c.count_redices())
+        return node
+
+    def get_innermost_redex(self):
+        # Same as get_redices()[-1], but only walks down a single path of the tree
+        node = self.goto_root()
+        if not node.count_redices():
+            return None
+        while True:
+            children = [c for c in node.children() if c.count_redices()]
+            if not children:
+                return node
+            node = children[-1]
+
     def is_normal_form(self):
-        return len(self.get_redices()) == 0
+        return self.goto_root().count_redices() == 0
 
     def is_canonical(self):
-        root = self.goto_root()
-        return isinstance(root, Lam)
+        return self.goto_root().canonical
 
-    def reduce(self):
+    def reduce(self, meter=None):
         raise CantReduceException()
 
-    def substitute(self, substitution_map):
-        substituted = SubstituteVisitor().visit(self, substitution_map)
+    def substitute(self, substitution_map, meter=None):
+        # The expression is consumed: subtrees that have nothing to be
+        # substituted are moved into the result, not copied. With a meter, the
+        # budget is checked on the copies made, so a single substitution
+        # making a huge term is bounded too
+        substituted = SubstituteVisitor(meter).visit(self, substitution_map)
+        substituted.parent = None
         return substituted
 
-    def goto_canonical(self, max_steps=25, verbose=False):
-        root = self.goto_root().clone()
-        step = 0
-        while not root.is_canonical() and step < max_steps:
-            redices = root.get_redices()
-            if not redices:
-                raise CantReduceToCanonicalException
-            redex = redices[0]  # try to reduce outer most first
-            root = redex.reduce().goto_root()
-            step += 1
-            if verbose:
-                print(root)
-        return root
-
-    def goto_normal_form(self, max_steps=25, verbose=False, **kwargs):
-        step = 0
-        def show(expr):
-            str_expr = kwargs.get('formatter', str)(expr)
-            print('step', step, '->', str_expr, '    %s redices' % len(expr.get_redices()))
-        root = self.goto_root().clone()
-        if verbose:
-            show(root)
-        while not root.is_normal_form() and step < max_steps:
-            redices = root.get_redices()
-            if not redices:
-                raise CantReduceToCanonicalException
-            redex = redices[-1]  # try to reduce inner most first, always
-            root = redex.reduce().goto_root()
-            step += 1
+    def goto_canonical(self, max_steps=25, verbose=False, backend='named', budget=None):
+        with metering(budget) as meter:
+            if backend == 'debruijn':
+                from lamedh.expr import debruijn  # type: ignore
+                return debruijn.goto_canonical(self, max_steps=max_steps, verbose=verbose, meter=meter)
+            check_backend(backend, ['named', 'debruijn'])
+            root = self.goto_root().clone()
+            step = 0
+            while not root.is_canonical() and step < max_steps:
+                redex = root.get_outermost_redex()  # try to reduce outer most first
+                if redex is None:
+                    raise CantReduceToCanonicalException
+                root = redex.reduce(meter).goto_root()
+                step += 1
+                if meter:
+                    meter.check(step, root.size())
+                if verbose:
+                    print(root)
+            return root
+
+    @memoized(finished=lambda result: result.is_normal_form(), whole_tree=True)
+    def goto_normal_form(self, max_steps=25, verbose=False, backend='named', budget=None, **kwargs):
+        with metering(budget) as meter:
+            if backend == 'debruijn':
+                from lamedh.expr import debruijn  # type: ignore
+                return debruijn.goto_normal_form(self, max_steps=max_steps, verbose=verbose, meter=meter, **kwargs)
+            if backend == 'nbe':
+                from lamedh.expr import nbe  # type: ignore
+                try:
+                    return nbe.goto_normal_form(self, max_steps=max_steps, verbose=verbose, meter=meter,
+                                                **kwargs)
+                except BudgetExceeded:
+                    raise
+                except StopEvaluation:
+                    # nbe has no intermediate terms to stop at, the named backend gives the
+                    # one reached in max_steps, like the other backends
+                    if verbose:
+                        print('nbe needs more than %s steps, reducing with the named backend' % max_steps)
+            check_backend(backend, ['named', 'debruijn', 'nbe'])
+            step = 0
+            def show(expr):
+                str_expr = kwargs.get('formatter', str)(expr)
+                print('step', step, '->', str_expr, '    %s redices' % expr.count_redices())
+            root = self.goto_root().clone()
             if verbose:
                 show(root)
-        return root
-
-    def evalN(self, max_steps=25, verbose=False, **kwargs):
-        visitor = EvalNormalVisitor(max_steps=max_steps, verbose=verbose, **kwargs)
-        return visitor.visit(self, '')
-
-    def evalE(self, max_steps=25, verbose=False, **kwargs):
-        visitor = EvalEagerVisitor(max_steps=max_steps, verbose=verbose, **kwargs)
-        return visitor.visit(self, '')
+            while not root.is_normal_form() and step < max_steps:
+                redex = root.get_innermost_redex()  # try to reduce inner most first, always
+                if redex is None:
+                    raise CantReduceToCanonicalException
+                root = redex.reduce(meter).goto_root()
+                step += 1
+                if meter:
+                    meter.check(step, root.size())
+                if verbose:
+                    show(root)
+            return root
+
+    @memoized(finished=lambda result: True)
+    def evalN(self, max_steps=25, verbose=False, backend='visitor', budget=None, **kwargs):
+        with metering(budget) as meter:
+            if backend == 'krivine':
+                from lamedh.machines import KrivineMachine  # type: ignore
+                return KrivineMachine(max_steps=max_steps, verbose=verbose, meter=meter, **kwargs).run(self)
+            if backend == 'compiled':
+                from lamedh import compiler  # type: ignore
+                return compiler.evaluate(self, compiler.NORMAL, max_steps=max_steps, verbose=verbose,
+                                         meter=meter, **kwargs)
+            check_backend(backend, ['visitor', 'krivine', 'compiled'])
+            visitor = EvalNormalVisitor(max_steps=max_steps, verbose=verbose, meter=meter, **kwargs)
+            return visitor.evaluate(self)
+
+    @memoized(finished=lambda result: True)
+    def evalE(self, max_steps=25, verbose=False, backend='visitor', budget=None, **kwargs):
+        with metering(budget) as meter:
+            if backend == 'cek':
+                from lamedh.machines import CEKMachine  # type: ignore
+                return CEKMachine(max_steps=max_steps, verbose=verbose, meter=meter, **kwargs).run(self)
+            if backend == 'compiled':
+                from lamedh import compiler  # type: ignore
+                return compiler.evaluate(self, compiler.EAGER, max_steps=max_steps, verbose=verbose,
+                                         meter=meter, **kwargs)
+            check_backend(backend, ['visitor', 'cek', 'compiled'])
+            visitor = EvalEagerVisitor(max_steps=max_steps, verbose=verbose, meter=meter, **kwargs)
+            return visitor.evaluate(self)
+
+    def evalL(self, max_steps=25, verbose=False, backend='visitor', budget=None, **kwargs):
+        # Same canonical form than evalN, but each argument is evaluated at most once
+        check_backend(backend, ['visitor'])
+        with metering(budget) as meter:
+            visitor = EvalLazyVisitor(max_steps=max_steps, verbose=verbose, meter=meter, **kwargs)
+            return visitor.visit(self, '', {}).readback()
 
 
 class Var(Expr):
+    __slots__ = ('var_name', )
 
     def __init__(self, name):
         self.var_name = name
+        self.parent = None
+        self._redex_count = self._free_names = self._alpha_key = self._size = None
 
-    def __repr__(self):
-        return f'<Var:{self.var_name}>'
-
-    def __str__(self):
+    def to_string(self, func, name=''):
+        if name:
+            return f'<{name}:{self.var_name}>'
         return self.var_name
 
+    def pieces(self, func, name):
+        return [self.to_string(func, name)]
+
     def rename(self, new_name):
         assert isinstance(new_name, str)
         self.var_name = new_name
+        self.invalidate_cache()
+
+    def combine_free_var_names(self, children_names):
+        return frozenset([self.var_name])
+
+    def combine_alpha_keys(self, children_keys):
+        return intern.free(self.var_name)
+
+    def rebuild(self, children):
+        return self.__class__(self.var_name)
 
 
 class Lam(Expr):
+    __slots__ = ('var_name', 'body')
+    canonical = True
 
     def __init__(self, name, body):
         assert isinstance(name, str)
+        assert isinstance(body, Expr), f'Body {body} of λ{name} is not an Expr'
         self.var_name = name
         self.body = body
+        body.parent = self
+        self.parent = None
+        self._redex_count = self._free_names = self._alpha_key = self._size = None
 
-    def __repr__(self):
-        return f'Lam(λ{self.var_name}.{repr(self.body)})'
+    def to_string(self, func, name=''):
+        return f'{name}(λ{self.var_name}.{func(self.body)})'
 
-    def __str__(self):
-        return f'(λ{self.var_name}.{self.body})'
+    def pieces(self, func, name):
+        return [f'{name}(λ{self.var_name}.', self.body, ')']
 
     def children(self):
         return [self.body]
 
+    def rebuild(self, children):
+        return self.__class__(self.var_name, *children)
+
+    def combine_free_var_names(self, children_names):
+        return children_names[0] - {self.var_name}
+
+    def combine_alpha_keys(self, children_keys):
+        return intern.abs_(self.var_name, children_keys[0])
+
     def replace_child(self, old, new):
         new.parent = self
         self.body = new
+        self.invalidate_cache()
 
     def bound_var_occurrence(self):
         # Returns all occurrences of variables this lambda's is binding
@@ -149,34 +408,45 @@ class Lam(Expr):
         for occ in self.bound_var_occurrence():
             occ.rename(new_name)
         self.var_name = new_name
+        self.invalidate_cache()
 
 
 class App(Expr):
+    __slots__ = ('operator', 'operand')
 
     def __init__(self, operator, operand):
+        assert isinstance(operator, Expr), f'Operator {operator} is not an Expr'
+        assert isinstance(operand, Expr), f'Operand {operand} is not an Expr'
         self.operator = operator
         self.operand = operand
+        operator.parent = operand.parent = self
+        self.parent = None
+        self._redex_count = self._free_names = self._alpha_key = self._size = None
 
     def children(self):
         return [self.operator, self.operand]
 
-    def __repr__(self):
-        return f'App({repr(self.operator)} {repr(self.operand)})'
+    def to_string(self, func, name=''):
+        return f'{name}({func(self.operator)} {func(self.operand)})'
 
-    def __str__(self):
-        return f'({self.operator} {self.operand})'
+    def pieces(self, func, name):
+        return [f'{name}(', self.operator, ' ', self.operand, ')']
 
     def is_redex(self):
         return isinstance(self.operator, Lam)
 
+    def combine_alpha_keys(self, children_keys):
+        return intern.app(*children_keys)
+
     def replace_child(self, old, new):
         new.parent = self
-        if self.operator == old:
+        if self.operator is old:
             self.operator = new
-        if self.operand == old:
+        if self.operand is old:
             self.operand = new
+        self.invalidate_cache()
 
-    def reduce(self):
+    def reduce(self, meter=None):
         # Reducing redices WILL modify objects in-place.
         # If needed to preserve original structure, caller must make a copy
         # before calling reduce
@@ -185,8 +455,8 @@ class App(Expr):
 
         lam = self.operator
         arg = self.operand
-        mapping = {lam.var_name: arg.clone()}
-        substituted = lam.body.substitute(mapping)
+        mapping = {lam.var_name: arg}  # each occurrence gets its own clone
+        substituted = lam.body.substitute(mapping, meter)
 
         if self.parent:
             self.parent.replace_child(self, substituted)
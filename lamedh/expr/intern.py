@@ -0,0 +1,130 @@
+# Hash-consed store of alpha-equivalence keys of expressions.
+#
+# The key of an expression is its locally nameless form: variables bound
+# inside the expression are replaced by De Bruijn indices, free variables keep
+# their names. Two expressions are alpha-equivalent iff their keys are equal.
+#
+# Keys are interned: building a key equal to an existing one returns that
+# same object, so keys of alpha-equivalent expressions are always the same
+# object and comparing them is just `is`. Every key has a digest of its
+# structure too, that doesn't change between runs (unlike hash() of strings),
+# so it can be used to identify expressions outside of the process.
+#
+# Expr nodes can't be shared the same way (they know their parent, and are
+# reduced in-place), but they cache their key. See Expr.alpha_key
+
+from hashlib import blake2b
+from weakref import WeakValueDictionary
+
+FREE = 'free'
+BOUND = 'bound'
+ABS = 'abs'
+APP = 'app'
+
+DIGEST_SIZE = 16
+
+
+class Key:
+    # Do not create them directly, use intern (or free, bound, abs_, app).
+    # Nodes binding names other than lambdas (like let) keep them by name in
+    # scope: a pair with the bound names, and the positions of the children
+    # where they are bound
+    __slots__ = ('tag', 'data', 'children', 'scope', 'free_names', 'digest', 'hash', '__weakref__')
+
+    def __init__(self, tag, data, children, scope):
+        self.tag = tag
+        self.data = data
+        self.children = children
+        self.scope = scope
+        if tag == FREE:
+            self.free_names = frozenset(data)
+        else:
+            names = [c.free_names for c in children]
+            if scope:
+                bound_names, positions = scope
+                for i in positions:
+                    names[i] = names[i].difference(bound_names)
+            self.free_names = frozenset().union(*names)
+        h = blake2b(digest_size=DIGEST_SIZE)
+        h.update(('%s:%r:%r:%s;' % (tag, data, scope, len(children))).encode('utf-8'))
+        for child in children:
+            h.update(child.digest)
+        self.digest = h.digest()
+        self.hash = int.from_bytes(self.digest[:8], 'little', signed=True)
+
+    def __hash__(self):
+        return self.hash
+
+    def hexdigest(self):
+        return self.digest.hex()
+
+    def __repr__(self):
+        if not self.children:
+            return '<%s:%s>' % (self.tag, ','.join(map(str, self.data)))
+        return '<%s%s %s>' % (self.tag, self.data or '', ' '.join(map(repr, self.children)))
+
+
+# Keys are kept alive by the expressions (and keys) using them, and removed
+# from the store once nothing uses them any more
+_store = WeakValueDictionary()
+
+
+def intern(tag, data=(), children=(), scope=None):
+    # data is a tuple with whatever identifies the node besides its children
+    lookup = (tag, data, scope) + tuple(map(id, children))
+    key = _store.get(lookup)
+    if key is None:
+        key = Key(tag, data, tuple(children), scope)
+        _store[lookup] = key
+    return key
+
+
+def store_size():
+    return len(_store)
+
+
+def free(name):
+    return intern(FREE, (name, ))
+
+
+def bound(index):
+    return intern(BOUND, (index, ))
+
+
+def app(operator, operand):
+    return intern(APP, (), (operator, operand))
+
+
+def abs_(name, body):
+    # key of the lambda binding `name` in the expression with key body
+    return intern(ABS, (), (close(body, name), ))
+
+
+def close(key, name):
+    # Replaces free(name) by the bound index pointing to a lambda just above key.
+    # Only keys with name free need to be rebuilt, the rest are kept as they are
+    if name not in key.free_names:
+        return key
+    closed = {}
+    stack = [(key, 0, False)]
+    while stack:
+        node, depth, children_done = stack.pop()
+        if (node, depth) in closed:
+            continue
+        if name not in node.free_names:
+            closed[node, depth] = node
+        elif node.tag == FREE:
+            closed[node, depth] = bound(depth)
+        else:
+            child_depth = depth + 1 if node.tag == ABS else depth
+            # children where name is bound again by node are kept as they are
+            shadowed = node.scope[1] if node.scope and name in node.scope[0] else ()
+            to_close = [c for i, c in enumerate(node.children) if i not in shadowed]
+            if children_done:
+                children = [c if i in shadowed else closed[c, child_depth]
+                            for i, c in enumerate(node.children)]
+                closed[node, depth] = intern(node.tag, node.data, children, node.scope)
+            else:
+                stack.append((node, depth, True))
+                stack.extend((c, child_depth, False) for c in to_close)
+    return closed[key, 0]
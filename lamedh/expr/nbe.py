@@ -0,0 +1,280 @@
+# Normalization by evaluation of pure lambda terms.
+#
+# Instead of rewriting the term one beta step at a time, the term is compiled
+# into code that an abstract machine evaluates into a semantic domain:
+#   - Function: a lambda, applying it gives the value of its body
+#   - Neutral: a variable (free, or introduced while reading back) applied
+#     to some arguments. Nothing can reduce it any further
+# and values are read back into a term in normal form.
+#
+# Arguments are passed as Thunks that are evaluated at most once, so terms with
+# a normal form are normalized (like with normal order) and arguments used
+# several times are normalized once.
+#
+# Compiling, evaluating and reading back are done with explicit stacks: the
+# machine keeps the arguments waiting to be applied and the thunks waiting
+# for their value in a list of frames, so deep terms (like large Church
+# numerals) or long evaluations (like omega) don't reach the recursion limit.
+#
+# Steps: each time a Function is applied counts as a beta step. This is not the
+# number of steps the named backend does (arguments are shared, and reduced
+# in a different order) but it's bounded by max_steps in the same way.
+#
+# Church numerals and booleans, and the usual combinators on them, are
+# evaluated natively unless natives=False, see lamedh.expr.church.
+
+from abc import ABCMeta, abstractmethod
+
+from lamedh.expr.debruijn import to_debruijn, from_debruijn, Bound, Free, Abs, Apply
+from lamedh.expr.expr import StopEvaluation
+
+# Kinds of code: (VAR, index), (CONST, value), (ABS, name, body code) and
+# (APP, operator code, operand code)
+VAR, CONST, ABS, APP = range(4)
+# Kinds of frames of the machine: (ARGUMENT, thunk) waits for a value to
+# apply it to the thunk, (UPDATE, thunk) to store it as the thunk's value
+ARGUMENT, UPDATE = range(2)
+
+
+class Function:
+
+    def __init__(self, name, body, env):
+        # name is just a hint for the read back lambda
+        self.name = name
+        self.body = body
+        self.env = env
+
+
+class Native(Function, metaclass=ABCMeta):
+    # Function with a native implementation, computing once `arity` arguments
+    # are given. `compute` returns None when it can't work with the arguments,
+    # then they are given to the value of the lambda term it stands for
+    name = None
+
+    def __init__(self, normalizer, arity, args=()):
+        self.normalizer = normalizer
+        self.arity = arity
+        self.args = args
+
+    @abstractmethod
+    def with_args(self, args):
+        pass
+
+    @abstractmethod
+    def compute(self, *args):
+        pass
+
+    @abstractmethod
+    def lambda_value(self):
+        pass
+
+    def readback_term(self):
+        # the term of the value if known without unfolding it, or None
+        return None
+
+    def apply(self, thunk):
+        args = self.args + (thunk, )
+        if len(args) < self.arity:
+            return self.with_args(args)
+        result = self.compute(*args)
+        if result is None:
+            return self.unfold(args)
+        return result
+
+    def unfold(self, args=None):
+        # the value of the lambda term, applied to args
+        value = self.lambda_value()
+        for arg in (self.args if args is None else args):
+            value = self.normalizer.apply(value, arg)
+        return value
+
+
+class Neutral:
+
+    def __init__(self, head, args=()):
+        # head is a Free term, or the level (an int) of a variable introduced by read back
+        self.head = head
+        self.args = args
+
+
+class Thunk:
+
+    def __init__(self, code, env, normalizer):
+        self.code = code
+        self.env = env
+        self.normalizer = normalizer
+        self.value = None
+
+    @classmethod
+    def evaluated(cls, value):
+        thunk = cls(None, None, None)
+        thunk.value = value
+        return thunk
+
+    def force(self):
+        if self.value is None:
+            self.normalizer.run(self.code, self.env, [(UPDATE, self)])
+        return self.value
+
+
+class Normalizer:
+
+    def __init__(self, max_steps=25, natives=True, meter=None):
+        self.steps = 0
+        self.max_steps = max_steps
+        self.natives = natives
+        self.meter = meter
+
+    def step(self):
+        if self.steps >= self.max_steps:
+            raise StopEvaluation('Reached max number of steps: %s' % self.max_steps)
+        self.steps += 1
+        if self.meter:
+            self.meter.check(self.steps)
+
+    def apply(self, value, thunk):
+        return self.run(None, None, [(ARGUMENT, thunk)], value)
+
+    def run(self, code, env, frames, value=None):
+        # Evaluates code in env (or takes value, if code is None) and gives
+        # the result to the frames, innermost last. Returns the value left
+        # once they are all done. Environments are linked lists of thunks,
+        # (innermost binder thunk, rest of environment)
+        while True:
+            while code is not None:
+                kind = code[0]
+                if kind == APP:
+                    operand = code[2]
+                    if operand[0] == VAR:
+                        # shares the thunk instead of wrapping it in another one
+                        thunk = env
+                        for _ in range(operand[1]):
+                            thunk = thunk[1]
+                        thunk = thunk[0]
+                    else:
+                        thunk = Thunk(operand, env, self)
+                    frames.append((ARGUMENT, thunk))
+                    code = code[1]
+                elif kind == VAR:
+                    for _ in range(code[1]):
+                        env = env[1]
+                    thunk = env[0]
+                    if thunk.value is None:
+                        frames.append((UPDATE, thunk))
+                        code, env = thunk.code, thunk.env
+                    else:
+                        value, code = thunk.value, None
+                elif kind == CONST:
+                    value, code = code[1], None
+                else:
+                    value, code = Function(code[1], code[2], env), None
+            if not frames:
+                return value
+            kind, thunk = frames.pop()
+            if kind == UPDATE:
+                thunk.value = value
+                thunk.code = thunk.env = None
+            elif isinstance(value, Native):
+                self.step()
+                value = value.apply(thunk)
+            elif isinstance(value, Function):
+                self.step()
+                code, env = value.body, (thunk, value.env)
+            else:
+                value = Neutral(value.head, value.args + (thunk, ))
+
+    def compile(self, term, natives=None):
+        # Returns the code of term, see VAR, CONST... Done with an explicit
+        # stack, like from_debruijn
+        if natives is None:
+            natives = self.natives
+        results = []
+        # each stack item is (term, False), or (term, True) once its children
+        # were pushed to the stack
+        stack = [(term, False)]
+        while stack:
+            term, pushed = stack.pop()
+            if pushed:
+                if isinstance(term, Abs):
+                    results.append((ABS, term.name, results.pop()))
+                else:
+                    operand = results.pop()
+                    results.append((APP, results.pop(), operand))
+            elif isinstance(term, Bound):
+                results.append((VAR, term.index))
+            elif isinstance(term, Free):
+                results.append((CONST, Neutral(term)))
+            elif isinstance(term, Abs):
+                native = None
+                if natives and term.max_loose < 0 and not term.free_names:
+                    from lamedh.expr import church
+                    native = church.recognize(term, self)
+                if native is not None:
+                    results.append((CONST, native))
+                else:
+                    stack.extend([(term, True), (term.body, False)])
+            else:
+                stack.extend([(term, True), (term.operand, False), (term.operator, False)])
+        return results.pop()
+
+    def evaluate(self, term, natives=None):
+        return self.run(self.compile(term, natives), None, [])
+
+    def readback(self, value):
+        # Term in normal form of value. Done with an explicit stack, since
+        # normal forms (of Church numerals, for instance) may be very deep
+        results = []
+        stack = [('read', value, 0)]
+        while stack:
+            task = stack.pop()
+            if task[0] == 'read':
+                _, value, depth = task
+                if isinstance(value, Native):
+                    term = value.readback_term()
+                    if term is not None:
+                        results.append(term)
+                    else:
+                        stack.append(('read', value.unfold(), depth))
+                elif isinstance(value, Function):
+                    variable = Thunk.evaluated(Neutral(depth))
+                    body = self.run(value.body, (variable, value.env), [])
+                    stack.append(('abs', value.name))
+                    stack.append(('read', body, depth + 1))
+                else:
+                    stack.append(('spine', value.head, len(value.args), depth))
+                    for thunk in reversed(value.args):
+                        stack.append(('read', thunk.force(), depth))
+            elif task[0] == 'abs':
+                results.append(Abs(task[1], results.pop()))
+            else:
+                _, head, n_args, depth = task
+                term = head if isinstance(head, Free) else Bound(depth - head - 1)
+                args = results[len(results) - n_args:]
+                del results[len(results) - n_args:]
+                for arg in args:
+                    term = Apply(term, arg)
+                results.append(term)
+        return results.pop()
+
+    def normalize(self, term):
+        return self.readback(self.evaluate(term))
+
+
+def normalize(expr, max_steps=25, natives=True, meter=None):
+    # Returns the normal form of expr, and the number of beta steps it took.
+    # Raises StopEvaluation if it needs more than max_steps
+    normalizer = Normalizer(max_steps=max_steps, natives=natives, meter=meter)
+    term = normalizer.normalize(to_debruijn(expr.goto_root()))
+    return from_debruijn(term), normalizer.steps
+
+
+def goto_normal_form(expr, max_steps=25, verbose=False, **kwargs):
+    # Intermediate terms don't exist, verbose output shows the first and last ones only
+    formatter = kwargs.get('formatter', str)
+    if verbose:
+        root = expr.goto_root()
+        print('step', 0, '->', formatter(root), '    %s redices' % root.count_redices())
+    result, steps = normalize(expr, max_steps=max_steps, meter=kwargs.get('meter'))
+    if verbose:
+        print('step', steps, '->', formatter(result), '    0 redices')
+    return result
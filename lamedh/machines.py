@@ -0,0 +1,136 @@
+# Abstract machines evaluating lambda expressions with environments and an
+# explicit stack. No sub-tree is copied nor substituted while evaluating, and
+# there is no Python recursion involved, so they are alternative backends for
+# the (recursive, substitution based) evaluation visitors.
+#
+# Steps are accounted exactly like EvalVisitor does (one step per Abs or App
+# rule applied) so max_steps means the same for every backend.
+
+from lamedh.closures import Thunk, Closure, readback
+from lamedh.expr import Var, Lam, App, StopEvaluation, CantEvalException
+
+
+class Machine:
+
+    def __init__(self, max_steps, verbose=False, formatter=None, meter=None) -> None:
+        self.steps = 0
+        self.max_steps = max_steps
+        self.verbose = verbose
+        self.formatter = formatter
+        self.meter = meter
+
+    def format(self, expr):
+        if self.formatter:
+            return self.formatter(expr)
+        else:
+            return str(expr)
+
+    def _register_step(self):
+        if self.steps >= self.max_steps:
+            raise StopEvaluation('Reached max number of steps: %s' % self.max_steps)
+        self.steps += 1
+        if self.meter:
+            self.meter.check(self.steps)
+
+    def show(self, expr):
+        msg = ' step ' + ('%s/%s' % (self.steps, self.max_steps)).rjust(6)
+        print(msg + ' -> ' + self.format(expr))
+
+    def run(self, expr):
+        # returns the Expr of the canonical form of expr
+        return self.evaluate(expr).readback()
+
+
+class KrivineMachine(Machine):
+    # Normal order (call-by-name) evaluation to canonical form.
+    # The state is a term, the environment its free variables are bound in,
+    # and the stack of arguments (thunks) the term is being applied to.
+
+    def evaluate(self, expr):
+        term, env, stack = expr, {}, []
+        while True:
+            if isinstance(term, App):
+                self._register_step()
+                stack.append(Thunk(term.operand, env))
+                term = term.operator
+            elif isinstance(term, Lam):
+                self._register_step()
+                if self.verbose:
+                    self.show(self.readback_state(term, env, stack))
+                if not stack:
+                    return Closure(term, env)
+                env = dict(env)
+                env[term.var_name] = stack.pop()
+                term = term.body
+            elif isinstance(term, Var):
+                if term.var_name not in env:
+                    raise CantEvalException('Cant evaluate variable %s' % repr(term))
+                thunk = env[term.var_name]
+                term, env = thunk.expr, thunk.env
+            else:
+                raise CantEvalException('Cant evaluate %s' % repr(term))
+
+    def readback_state(self, term, env, stack):
+        # the expression the machine is evaluating, as a plain Expr
+        expr = readback(term, env)
+        for thunk in reversed(stack):
+            expr = App(expr, thunk.readback())
+        return expr
+
+
+class CEKMachine(Machine):
+    # Eager (call-by-value) evaluation to canonical form.
+    # The state is either a term being evaluated in an environment, or a value
+    # being returned; and the continuation: a stack of frames saying what to
+    # do with that value:
+    #   (ARG, operand, env): the value is an operator, evaluate its operand next
+    #   (CALL, closure): the value is the operand to which closure is applied
+    ARG = 'arg'
+    CALL = 'call'
+
+    def evaluate(self, expr):
+        term, env, continuation = expr, {}, []
+        value = None
+        while True:
+            if value is None:
+                if isinstance(term, App):
+                    self._register_step()
+                    continuation.append((self.ARG, term.operand, env))
+                    term = term.operator
+                    continue
+                elif isinstance(term, Lam):
+                    self._register_step()
+                    value = Closure(term, env)
+                elif isinstance(term, Var):
+                    if term.var_name not in env:
+                        raise CantEvalException('Cant evaluate variable %s' % repr(term))
+                    # variables are bound to canonical forms, evaluating them is an Abs rule
+                    self._register_step()
+                    value = env[term.var_name]
+                else:
+                    raise CantEvalException('Cant evaluate %s' % repr(term))
+                if self.verbose:
+                    self.show(self.readback_state(value, continuation))
+
+            if not continuation:
+                return value
+            frame = continuation.pop()
+            if frame[0] == self.ARG:
+                _, term, env = frame
+                continuation.append((self.CALL, value))
+            else:
+                closure = frame[1]
+                env = dict(closure.env)
+                env[closure.lam.var_name] = value
+                term = closure.lam.body
+            value = None
+
+    def readback_state(self, value, continuation):
+        # the expression the machine is evaluating, as a plain Expr
+        expr = value.readback()
+        for frame in reversed(continuation):
+            if frame[0] == self.ARG:
+                expr = App(expr, readback(frame[1], frame[2]))
+            else:
+                expr = App(frame[1].readback(), expr)
+        return expr
@@ -0,0 +1,444 @@
+# Deterministic parser of the lambda grammar (see lamedh.parsing.simple), in
+# linear time, building the same Expr trees as the Earley parser.
+#
+# The Earley grammar is ambiguous: it resolves every span by the order of the
+# alternatives of `app`. That order is what this parser implements as
+# precedence:
+#   - if, let, letrec, rec and unary operators take the rest of the
+#     expression they start, binary operators included: `- a + b` is
+#     `-(a + b)`. Unless they are an operand themselves (`a + - b`), then
+#     they take an application only
+#   - binary operators have all the same precedence, and associate to the left
+#   - the body of a lambda is an application: `λx.x y + 1` is `(λx.(x y)) + 1`,
+#     but for letrec definitions, that are lambdas
+#   - application associates to the left, a lambda argument takes the rest of
+#     the application: `f λx.x y` is `f (λx.(x y))`
+#   - indexing applies to variables, tuples, indexing and parentheses only
+#   - after an operand `<` starts a tuple only if no comparison parses, and
+#     `/` starts a lambda only if no division parses
+#
+# When alternatives rank the same (like `a + b + c d`, `f a b.0`, or `f rec x`
+# where keywords may be taken as variable names), Earley's choice depends on
+# the order it builds its parse forest. Those inputs, and the ones this
+# parser rejects, are handed to the Earley parser, so both parse the same
+# trees and raise the same errors. Expressions as printed by Expr, and the
+# usual programs, are never handed over.
+#
+# Parse functions are generators yielding the parse functions of their
+# sub-expressions, run with an explicit stack (see run), so deeply nested
+# expressions don't hit the recursion limit.
+
+import re
+
+from lamedh.expr import Lam, App, Var
+from lamedh.expr.applicative import (
+    BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse,
+    Error, TypeError, Tuple, Indexing, LetIn, Rec, LetRec,
+    UnaryOpTable, BinaryOpTable
+)
+
+NAME = 'name'
+NATURAL = 'natural'
+END = 'end'
+
+# contexts of an expression, besides the top level: the elements of a tuple,
+# ended by , or >, and local definitions, ended by ,
+TUPLE = 'tuple'
+DEFINITION = 'definition'
+
+CONSTANTS = {'true', 'false', 'error', 'typeerror'}
+WORD_OPERATORS = {s for s in BinaryOpTable.symbols() if s.isalpha()}
+WORD_UNARY_OPERATORS = {s for s in UnaryOpTable.symbols() if s.isalpha()}
+RESERVED = {'if', 'then', 'else', 'let', 'letrec', 'in', 'rec', 'lambda'} | CONSTANTS \
+    | WORD_OPERATORS | WORD_UNARY_OPERATORS
+LAMBDAS = {'λ', 'lambda', '/'}
+# names starting with these words, like notx, the Earley lexer always splits
+SPLIT_ALWAYS = CONSTANTS | WORD_UNARY_OPERATORS | {'rec'}
+# and with these, only when the input has the token the word goes with
+SPLIT_WITH = {'if': 'then', 'then': 'if', 'else': 'if', 'let': ':=', 'letrec': ':=',
+              'in': ':=', 'lambda': '.'}
+PREFIXES = {'if', 'let', 'letrec', 'rec'} | set(UnaryOpTable.symbols())
+
+TOKEN = re.compile(r'(?P<space>\s*)(?:(?P<name>[A-Za-z_][A-Za-z0-9_]*)|(?P<natural>[0-9]+)'
+                   r'|(?P<symbol>:=|==|!=|<=|>=|[λ()<>,.+\-*/%]))')
+
+
+class ParseError(Exception):
+    pass
+
+
+class Ambiguous(Exception):
+    # the input is where Earley parsing breaks ties, or may take keywords as
+    # variable names
+    pass
+
+
+def tokenize(text):
+    # list of (kind, value) tokens. Reserved words and symbols are their own kind
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    word_ended = False
+    # tokens that make names starting with a keyword ambiguous
+    needed = set()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise ParseError('Unexpected character %r at %s' % (text[position], position))
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in (NAME, NATURAL):
+            if word_ended and not match.group('space'):
+                # like 12x, the Earley lexer splits words
+                raise Ambiguous(value)
+            if kind == NAME and value not in RESERVED and value.startswith(tuple(RESERVED)):
+                # like notx, that may be `not x`. Other names, like inc or
+                # order, are only split where the keyword would fit
+                needed |= keyword_tokens(value, tokens)
+            word_ended = True
+        else:
+            word_ended = False
+        if kind == 'symbol' or value in RESERVED:
+            kind = value
+        tokens.append((kind, value))
+        position = match.end()
+    if needed & {kind for kind, _ in tokens}:
+        raise Ambiguous(text)
+    tokens.append((END, ''))
+    return tokens
+
+
+def keyword_tokens(name, tokens):
+    # the tokens that make Earley split name, a name starting with keywords.
+    # Raises Ambiguous if it splits it anyway
+    needed = set()
+    for word in RESERVED:
+        if not name.startswith(word):
+            continue
+        if word in SPLIT_ALWAYS:
+            raise Ambiguous(name)
+        if word in WORD_OPERATORS:
+            # like f order x, that may be `f or der x`. Earley can take the
+            # keywords before as names too
+            if tokens and (tokens[-1][0] in (NAME, NATURAL, ')', '>') or tokens[-1][1] in RESERVED):
+                raise Ambiguous(name)
+        else:
+            needed.add(SPLIT_WITH[word])
+    return needed
+
+
+def run(parse):
+    # runs the parse generator, and the generators it yields, with an explicit stack
+    stack = [parse]
+    result = None
+    while stack:
+        try:
+            stack.append(stack[-1].send(result))
+            result = None
+        except StopIteration as stop:
+            stack.pop()
+            result = stop.value
+    return result
+
+
+class PrecedenceParser:
+
+    def __init__(self, fallback=True):
+        # fallback: parse with Earley what this parser can't, instead of
+        # raising ParseError or Ambiguous
+        self.fallback = fallback
+
+    def parse(self, text):
+        try:
+            return self.parse_tokens(tokenize(text))
+        except (ParseError, Ambiguous):
+            if not self.fallback:
+                raise
+        from lamedh.parsing.simple import parser  # type: ignore
+        return parser.parse(text)
+
+    def parse_tokens(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.simple = False
+        # out of parentheses: guards and then branches being parsed, ifs,
+        # binary operators and tuples parsed
+        self.open_ifs = 0
+        self.ifs = 0
+        self.binops = 0
+        self.tuples = 0
+        expr = run(self.expr(True, None))
+        if self.peek() != END:
+            self.unexpected()
+        return expr
+
+    # -- tokens
+    def peek(self, offset=0):
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)][0]
+
+    def take(self, kind=None):
+        token_kind, value = self.tokens[self.position]
+        if kind is not None and token_kind != kind:
+            self.unexpected(kind)
+        self.position += 1
+        return value
+
+    def unexpected(self, expected=None):
+        kind, value = self.tokens[self.position]
+        msg = 'Unexpected %s' % (repr(value) if kind != END else 'end of input')
+        if expected:
+            msg += ', expected %r' % expected
+        raise ParseError(msg + ' at token %s' % self.position)
+
+    def starts_atom(self, offset=0):
+        kind = self.peek(offset)
+        return kind in (NAME, NATURAL, '(', '<') or kind in CONSTANTS
+
+    def starts_operand(self, offset=0):
+        kind = self.peek(offset)
+        return self.starts_atom(offset) or kind in LAMBDAS or kind in PREFIXES
+
+    def ends_operand(self, offset):
+        kind = self.peek(offset)
+        return kind in (NAME, NATURAL, ')', '>') or kind in CONSTANTS
+
+    def is_binary_operator(self, context):
+        kind = self.peek()
+        if context == TUPLE and kind == '>':
+            # it closes the tuple, unless the tuple is applied or compared
+            if self.starts_operand(1) or self.peek(1) in WORD_OPERATORS:
+                raise Ambiguous(kind)
+            return False
+        return kind in BinaryOpTable.symbols()
+
+    def starts_argument(self, context):
+        # whether the next token is an argument of the application before
+        kind = self.peek()
+        if kind == '<':
+            return self.starts_tuple(context)
+        if kind == '/':
+            offset = 1
+            while self.peek(offset) == NAME:
+                offset += 1
+            if offset == 1 or self.peek(offset) != '.':
+                return False
+            if self.peek(offset + 1) == NATURAL:
+                # like / x.0, a division too
+                raise Ambiguous(kind)
+            return True
+        if kind in ('if', 'rec') or kind in WORD_UNARY_OPERATORS:
+            # may be a variable named like the keyword
+            raise Ambiguous(kind)
+        return self.starts_atom() or kind in LAMBDAS or kind in ('let', 'letrec')
+
+    def starts_tuple(self, context):
+        # whether the < after an operand starts a tuple (if not, it's less
+        # than): it does if a , follows it. Looks ahead up to the end of the
+        # enclosing parentheses, let or if
+        depth = 0
+        tuples = 0
+        offset = 1
+        while True:
+            kind = self.peek(offset)
+            if kind == END:
+                return False
+            if kind in ('(', 'let', 'letrec', 'if'):
+                depth += 1
+            elif kind in (')', 'in', 'then', 'else', ':='):
+                if depth == 0:
+                    return False
+                if kind != 'then':
+                    depth -= 1
+            elif kind == '<' and not self.ends_operand(offset - 1):
+                tuples += 1
+            elif kind == '>' and tuples:
+                tuples -= 1
+            elif depth == 0 and kind in (',', '>'):
+                if kind == ',' and context is None:
+                    return True
+                # the , may be of the enclosing tuple or definitions, the > may
+                # close a tuple of one element
+                raise Ambiguous('<')
+            offset += 1
+
+    # -- grammar
+    def expr(self, top, context):
+        # top: binary operators are part of the expression, if not it's an operand
+        if top and self.peek() in PREFIXES:
+            return (yield self.prefixed(top, context))
+        left = yield self.operand(context, False)
+        if not top:
+            return left
+        symbols = []
+        operands = []
+        while self.is_binary_operator(context):
+            symbol = self.take()
+            self.binops += 1
+            if symbol in WORD_OPERATORS and self.peek() == '-':
+                # the operator may be a variable name
+                raise Ambiguous(symbol)
+            operands.append((yield self.operand(context, False)))
+            symbols.append(symbol)
+            if len(symbols) > 1 and (not self.simple or set(symbols) & WORD_OPERATORS):
+                # only chains of atoms and symbol operators are left associative
+                raise Ambiguous(symbol)
+            if len(symbols) == 1:
+                first_simple = self.simple
+            elif not first_simple:
+                raise Ambiguous(symbol)
+        for symbol, right in zip(symbols, operands):
+            left = BinaryOp(BinaryOpTable[symbol], left, right)
+        return left
+
+    def operand(self, context, argument):
+        # argument: the operand is the body of a lambda argument, that can't
+        # end in another lambda argument
+        if self.peek() in PREFIXES:
+            return (yield self.prefixed(False, context))
+        if self.peek() in LAMBDAS:
+            return (yield self.lam(False, context, argument))
+        expr = yield self.atom()
+        atoms = 1
+        while self.starts_argument(context):
+            kind = self.peek()
+            if kind in ('let', 'letrec') or argument and kind in LAMBDAS:
+                raise Ambiguous(kind)
+            if kind in LAMBDAS:
+                # takes the rest of the application. It's not a simple
+                # operand: in a chain of binary operators Earley may take it
+                # as the right side of any of them
+                expr = App(expr, (yield self.lam(False, context, True)))
+                atoms += 1
+                break
+            argument_expr = yield self.atom()
+            atoms += 1
+            if atoms > 2 and isinstance(argument_expr, Indexing):
+                raise Ambiguous('.')
+            expr = App(expr, argument_expr)
+        self.simple = atoms == 1
+        return expr
+
+    def prefixed(self, top, context):
+        # an expression starting with a keyword or unary operator. Its last
+        # sub-expression takes the rest
+        kind = self.take()
+        if not top and kind in {'if', 'rec'} | WORD_UNARY_OPERATORS and self.peek() in ('-', '<', '/'):
+            # like `a + rec - b`, that may be `(a + rec) - b`
+            raise Ambiguous(kind)
+        if kind == 'if':
+            # Earley may take if, then and else as variable names, and so
+            # assign them to other ifs, or parse binary operators and tuple
+            # elements out of an if
+            if self.open_ifs:
+                raise Ambiguous(kind)
+            self.ifs += 1
+            binops, tuples = self.binops, self.tuples
+            self.open_ifs += 1
+            guard = yield self.expr(True, None)
+            self.take('then')
+            ambiguous = self.peek() in ('-', '<', '/')
+            then_body = yield self.expr(True, None)
+            self.take('else')
+            self.open_ifs -= 1
+            ambiguous = ambiguous or self.peek() in ('-', '<', '/')
+            if not top and (ambiguous or self.binops != binops) or context and self.tuples != tuples:
+                raise Ambiguous(kind)
+            ifs = self.ifs
+            result = IfThenElse(guard, then_body, (yield self.expr(top, context)))
+            if self.ifs != ifs:
+                raise Ambiguous(kind)
+        elif kind in ('let', 'letrec'):
+            definitions = []
+            while True:
+                pattern = self.pattern()
+                self.take(':=')
+                if kind == 'letrec':
+                    if self.peek() not in LAMBDAS:
+                        self.unexpected('λ')
+                    definition = yield self.lam(True, DEFINITION, False)
+                else:
+                    definition = yield self.expr(True, DEFINITION)
+                definitions.append((pattern, definition))
+                if self.peek() != ',':
+                    break
+                self.take()
+            self.take('in')
+            factory = LetRec if kind == 'letrec' else LetIn
+            result = factory(definitions, (yield self.expr(top, context)))
+        elif kind == 'rec':
+            result = Rec((yield self.expr(top, context)))
+        else:
+            result = UnaryOp(UnaryOpTable[kind], (yield self.expr(top, context)))
+        self.simple = False
+        return result
+
+    def lam(self, top, context, argument):
+        self.take()
+        names = [self.take(NAME)]
+        while self.peek() == NAME:
+            names.append(self.take())
+        self.take('.')
+        if top:
+            body = yield self.expr(True, context)
+        elif self.peek() in PREFIXES:
+            if argument:
+                raise Ambiguous(self.peek())
+            body = yield self.prefixed(False, context)
+        else:
+            body = yield self.operand(context, argument)
+        for name in reversed(names):
+            body = Lam(name, body)
+        self.simple = False
+        return body
+
+    def atom(self):
+        kind = self.peek()
+        value = self.take()
+        indexable = True
+        if kind == NAME:
+            expr = Var(value)
+        elif kind == '(':
+            counters = self.open_ifs, self.ifs, self.binops, self.tuples
+            self.open_ifs = 0
+            expr = yield self.expr(True, None)
+            self.take(')')
+            self.open_ifs, self.ifs, self.binops, self.tuples = counters
+        elif kind == '<':
+            self.tuples += 1
+            elems = [(yield self.expr(True, TUPLE))]
+            while self.peek() == ',':
+                self.take()
+                elems.append((yield self.expr(True, TUPLE)))
+            self.take('>')
+            expr = Tuple(elems)
+        else:
+            indexable = False
+            if kind == NATURAL:
+                expr = NaturalConstant(value)
+            elif kind in ('true', 'false'):
+                expr = BooleanConstant(value)
+            elif kind == 'error':
+                expr = Error()
+            elif kind == 'typeerror':
+                expr = TypeError()
+            else:
+                self.position -= 1
+                self.unexpected()
+        while indexable and self.peek() == '.' and self.peek(1) == NATURAL:
+            self.take()
+            expr = Indexing(expr, NaturalConstant(self.take()))
+        return expr
+
+    def pattern(self):
+        if self.peek() == NAME:
+            return Var(self.take())
+        self.take('<')
+        patterns = [self.pattern()]
+        while self.peek() == ',':
+            self.take()
+            patterns.append(self.pattern())
+        self.take('>')
+        return patterns if len(patterns) > 1 else patterns[0]
+
+
+parser = PrecedenceParser()
@@ -0,0 +1,159 @@
+# Prints expressions with the parentheses CleanFormatter leaves, in a single
+# pass, instead of reparsing the text once per pair of parentheses.
+#
+# CleanFormatter goes through the pairs of str(expr) from left to right (so
+# parents before children), removing each one if the text still parses to
+# the same expression. The rules of the grammar (see
+# lamedh.parsing.precedence) tell when that happens:
+#   - an application needs parentheses only when it's an operand, as
+#     applications associate to the left
+#   - a lambda needs them only when something follows it before the end of
+#     the parentheses it's in, as its body takes the rest of them
+# But the closing parenthesis it removes isn't always the matching one: it
+# is the first one back at depth 1. So a pair at depth 2 or more is only
+# removed when nothing but closing parentheses is between its end and the
+# end of the pair at depth 1 around it. And at depth 0 it removes the end
+# of the first pair inside, which for an application starting with another
+# one removes the inner pair instead. It goes on down the operators like
+# that, and ends removing the outer pair only if all the arguments but the
+# last one are names.
+#
+# Only lambda terms, with constants, are printed here. If-then-else nodes
+# don't print in a form that parses, so nothing is removed from them. The
+# rest of the applicative language (operators, tuples, let...) raises
+# Unsupported.
+
+from lamedh.expr import Expr, Var, Lam, App
+from lamedh.expr.applicative import IfThenElse, BooleanConstant, NaturalConstant, Error, TypeError
+from lamedh.parsing.precedence import TOKEN, RESERVED
+
+OPERATOR, OPERAND, BODY = range(3)
+CONSTANTS = (BooleanConstant, NaturalConstant, Error, TypeError)
+
+
+class Unsupported(Exception):
+    pass
+
+
+def is_plain_name(name):
+    # names parsed as themselves, Earley can take others as keywords
+    match = TOKEN.fullmatch(name)
+    return (match is not None and match.lastgroup == 'name' and not match.group('space')
+            and not name.startswith(tuple(RESERVED)))
+
+
+def clean_string(expr):
+    if any(isinstance(node, IfThenElse) for node in walk(expr)):
+        return str(expr).strip()
+    return render(expr, bare_nodes(expr))
+
+
+def bare_nodes(expr):
+    # ids of the applications and lambdas which parentheses are removed
+    bare = set()
+    # (node, its role, pairs around it, followed before the end of the pair it's in,
+    #  ends with the pair at depth 1 around it, in the application a lambda argument
+    #  takes)
+    stack = [(expr, None, 0, False, False, False)]
+    while stack:
+        node, role, depth, followed, at_end, argument = stack.pop()
+        node_type = type(node)
+        if node_type is Var:
+            if not is_plain_name(node.var_name):
+                raise Unsupported(node.var_name)
+            continue
+        if node_type in CONSTANTS:
+            continue
+        if node_type is Lam:
+            if not is_plain_name(node.var_name):
+                raise Unsupported(node.var_name)
+            keep = followed or (depth >= 2 and not at_end)
+            if not keep and role == OPERAND and argument:
+                # a lambda argument ending in another one is ambiguous, it's
+                # up to the Earley parser
+                keep = not parses_without(expr, node, bare)
+        elif node_type is App:
+            if id(node) in bare:
+                keep = False
+            elif depth == 0:
+                removed = drops_operators(node, bare)
+                keep = role == OPERAND or not removed
+            else:
+                keep = role == OPERAND or (depth >= 2 and not at_end)
+        else:
+            raise Unsupported(node_type.__name__)
+        if not keep:
+            bare.add(id(node))
+        inner_depth = depth + keep
+        inner_at_end = at_end or (keep and depth == 1)
+        inner_argument = argument and not keep
+        if node_type is App:
+            stack.append((node.operand, OPERAND, inner_depth, followed and not keep, inner_at_end,
+                          inner_argument))
+            stack.append((node.operator, OPERATOR, inner_depth, True, False, inner_argument))
+        else:
+            stack.append((node.body, BODY, inner_depth, followed and not keep, inner_at_end,
+                          inner_argument or (not keep and role == OPERAND)))
+    return bare
+
+
+def drops_operators(app, bare):
+    # Removes the pairs of the applications down the operators of app, as
+    # removing app's pair at depth 0 does, and tells if app's own is removed
+    # at the end: when the operators end in a name or constant, and so do
+    # all the arguments but the last one
+    atoms_only = True
+    while type(app.operator) is App:
+        app = app.operator
+        bare.add(id(app))
+        atoms_only = atoms_only and type(app.operand) not in (App, Lam)
+    return type(app.operator) is not Lam and atoms_only
+
+
+def parses_without(expr, node, bare):
+    # tells if the text with the pairs removed so far, and the one of node,
+    # still parses to expr. The nodes not reached yet keep theirs
+    bare.add(id(node))
+    try:
+        return Expr.from_string(render(expr, bare)) == expr
+    except Exception:
+        return False
+    finally:
+        bare.discard(id(node))
+
+
+def render(expr, bare):
+    parts = []
+    stack = [expr]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        node_type = type(item)
+        if node_type is Var:
+            parts.append(item.var_name)
+            continue
+        if node_type in CONSTANTS:
+            parts.append(str(item))
+            continue
+        if id(item) not in bare:
+            parts.append('(')
+            stack.append(')')
+        if node_type is App:
+            stack.append(item.operand)
+            stack.append(' ')
+            stack.append(item.operator)
+        else:
+            parts.append('λ%s.' % item.var_name)
+            stack.append(item.body)
+    return ''.join(parts)
+
+
+def walk(expr):
+    # nodes of expr, with an explicit stack
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.children())
@@ -6,7 +6,7 @@ from lark.tree import Tree
 from lamedh.expr import Expr, Lam, App, Var
 from lamedh.expr.applicative import (
     BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse,
-    Error, TypeError, Tuple, LetIn, Rec, LetRec,
+    Error, TypeError, Tuple, Indexing, LetIn, Rec, LetRec,
     UnaryOpTable, BinaryOpTable
 )
 
@@ -18,6 +18,7 @@ grammar = f"""
 
 ?app: error
     | tuple
+    | tuple_indexing
     | const
     | ifthenelse
     | letin
@@ -38,10 +39,11 @@ var: NAME
 
 ifthenelse: "if" app "then" app "else" app
 
-tuple: _tuple_def | tuple_indexing
+tuple: _tuple_def
 _tuple_def: "<" app tuple_elem* ">"
 tuple_elem: "," app
-tuple_indexing: app "." NATURAL
+tuple_indexing: _indexable "." NATURAL
+_indexable: var | tuple | tuple_indexing | "(" app ")"
 
 pattern: var | "<" pattern pattern_elem* ">"
 pattern_elem: "," pattern
@@ -77,22 +79,43 @@ LAMBDA: "λ" | "lambda" | "/"
 class ParseLambdaVisitor:
 
      def __init__(self) -> None:
-          self.parser = Lark(grammar, start='start', parser='earley')
+          # building the Earley parser takes a while, and it's only needed
+          # for what the precedence parser hands over, so it's built on first use
+          self._parser = None
+
+     @property
+     def parser(self):
+          if self._parser is None:
+               self._parser = Lark(grammar, start='start', parser='earley')
+          return self._parser
 
      def parse(self, text):
           tree = self.parser.parse(text)
           return self.visit(tree)
 
      def visit(self, node):
-          if isinstance(node, Tree):
-               visited_children = [self.visit(c) for c in node.children]
-               assert isinstance(node.data, Token)
-               assert node.data.type == 'RULE'
-               custom_visit_method = 'visit_' + node.data.value
-               method = getattr(self, custom_visit_method, self.generic_visit)
-               return method(node, visited_children)
-          else:
-               return node
+          # post-order traversal with an explicit stack, so deeply nested
+          # expressions don't hit the recursion limit
+          results = []
+          stack = [(node, False)]
+          while stack:
+               node, children_visited = stack.pop()
+               if not isinstance(node, Tree):
+                    results.append(node)
+               elif not children_visited:
+                    stack.append((node, True))
+                    for child in reversed(node.children):
+                         stack.append((child, False))
+               else:
+                    count = len(node.children)
+                    visited_children = results[len(results) - count:]
+                    del results[len(results) - count:]
+                    assert isinstance(node.data, Token)
+                    assert node.data.type == 'RULE'
+                    custom_visit_method = 'visit_' + node.data.value
+                    method = getattr(self, custom_visit_method, self.generic_visit)
+                    results.append(method(node, visited_children))
+          return results[0]
 
      def generic_visit(self, node, visited_children):
           return visited_children[0]
@@ -173,6 +196,13 @@ class ParseLambdaVisitor:
           assert len(visited_children) >= 1
           return Tuple(visited_children)
 
+     def visit_tuple_indexing(self, node, visited_children):
+          assert len(visited_children) == 2
+          container, index_token = visited_children
+          assert isinstance(container, Expr)
+          assert isinstance(index_token, Token)
+          return Indexing(container, NaturalConstant(index_token.value))
+
      def local_definitions(self, node, visited_children, factory):
           assert len(visited_children) >= 2
           *local_vars, body = visited_children
@@ -0,0 +1,40 @@
+# The interactive prompt of the Terminal. prompt_toolkit takes a while to
+# import, so the Terminal imports this module the first time it prompts.
+
+import os
+from functools import lru_cache
+
+from prompt_toolkit import PromptSession
+from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+from prompt_toolkit.completion import Completer, FuzzyWordCompleter
+from prompt_toolkit.history import FileHistory
+
+histfile = os.path.join(os.path.expanduser("~"), ".lamedh_history")
+
+
+@lru_cache(maxsize=None)
+def session():
+    return PromptSession(history=FileHistory(histfile))
+
+
+def prompt(message, completer):
+    return session().prompt(
+        message, completer=completer, complete_while_typing=True, auto_suggest=AutoSuggestFromHistory()
+    )
+
+
+class PromptCompleter(Completer):
+    COMMAND_SEPARATOR = "-> "
+    def __init__(self, commands, operations, memory):
+        self.commands = commands
+        self.operations = operations
+        self.memory = memory
+
+    def get_completions(self, document, complete_event):
+        if self.COMMAND_SEPARATOR in document.text:
+            autocomplete_words = self.operations
+        else:
+            autocomplete_words = list(self.memory) + list(self.commands)
+            autocomplete_words.append(self.COMMAND_SEPARATOR)
+
+        return FuzzyWordCompleter(autocomplete_words).get_completions(document, complete_event)
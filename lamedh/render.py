@@ -0,0 +1,57 @@
+# Writes the text of trees (str and repr of expressions) piece by piece, in
+# a single pass with an explicit stack: each node gives its text as a list
+# of strings and children (see TreeNode.pieces), and the children are
+# expanded in place. Nothing is copied per level, so it takes time linear in
+# the size of the text, for trees of any depth.
+#
+# Pieces are generated lazily, so the text can be cut (by number of nodes,
+# or of characters) without going through the rest of the tree: traces of
+# verbose evaluations can show huge terms cheaply.
+
+ELLIPSIS = '...'
+
+
+def pieces(node, func=str, nodes=None):
+    # the text of node (its repr with func=repr), as strings. After the first
+    # `nodes` nodes, each of the rest is written as ELLIPSIS
+    expanded = 0
+    stack = [node]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        item = pop()
+        if isinstance(item, str):
+            if item:
+                yield item
+            continue
+        if nodes is not None and expanded >= nodes:
+            yield ELLIPSIS
+            continue
+        expanded += 1
+        name = type(item).__name__ if func is repr else item.str_prefix
+        extend(reversed(item.pieces(func, name)))
+
+
+def truncated(texts, width=None):
+    # the strings of texts up to `width` characters, and then ELLIPSIS if
+    # there were more
+    if width is None:
+        yield from texts
+        return
+    length = 0
+    for text in texts:
+        if length + len(text) > width:
+            yield text[:width - length]
+            yield ELLIPSIS
+            return
+        length += len(text)
+        yield text
+
+
+def render(node, func=str, width=None, nodes=None):
+    return ''.join(truncated(pieces(node, func, nodes), width))
+
+
+def write(node, stream, func=str, width=None, nodes=None):
+    # writes the text of node to stream, without building it whole
+    for text in truncated(pieces(node, func, nodes), width):
+        stream.write(text)
@@ -1,14 +1,14 @@
 import os
 import re
 import sys
+from functools import lru_cache
 
-from prompt_toolkit import PromptSession
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from prompt_toolkit.completion import Completer, FuzzyWordCompleter
-from prompt_toolkit.history import FileHistory
-
-from lamedh.expr import Expr
-from lamedh.visitors import SubstituteVisitor
+from lamedh import compiled
+from lamedh.cache import ResultCache, DEFAULT_DIRECTORY as DEFAULT_CACHE_DIRECTORY
+from lamedh.environment import Environment
+from lamedh.expr import Expr, binary
+from lamedh.parsing.printer import clean_string, Unsupported
+from lamedh.render import pieces, render, truncated
 
 # Commands are instructions that users give to the Terminal
 #    this dict defines 'command-name': 'function-to-call'
@@ -25,58 +25,55 @@ COMMANDS = {
 
 # Operations are (as the name says) actions that user want to be applied to a given
 # Lambda expression. Like evaluate, display, etc
-OPERATIONS = ['show', 'as_tree', 'goto_normal_form', 'evalN', 'evalE']
-
-
-histfile = os.path.join(os.path.expanduser("~"), ".lamedh_history")
-session = PromptSession(history=FileHistory(histfile))
+OPERATIONS = ['show', 'as_tree', 'goto_normal_form', 'evalN', 'evalE', 'evalL']
+# Operations whose results are memoized, only with LAMEDH_CACHE=1 (cached results
+# are shown without their steps). They are kept on disk, in LAMEDH_CACHE_DIR
+# (or ~/.lamedh/cache if not set)
+CACHED_OPERATIONS = ['goto_normal_form', 'evalN', 'evalE']
+CACHE_DIR = None
+if os.environ.get('LAMEDH_CACHE') == '1':
+    CACHE_DIR = os.environ.get('LAMEDH_CACHE_DIR') or DEFAULT_CACHE_DIRECTORY
 
 
 def clean_split(txt, delimiter):
     return map(lambda s:s.strip(), txt.split(delimiter, 1))
 
+def clean_split_all(txt, delimiter):
+    return map(lambda s:s.strip(), txt.split(delimiter))
+
 __location__ = os.path.realpath(
     os.path.join(os.getcwd(), os.path.dirname(__file__)))
 
 DEFAULT_NUMBER_OF_STEPS = 25
-HELP = open(os.path.join(__location__, 'help.txt')).read()
-HELP = HELP % DEFAULT_NUMBER_OF_STEPS
+# memory is dumped in binary format to files with this extension, see lamedh.expr.binary
+BINARY_EXTENSION = '.lmdb'
 
 
-class PromptCompleter(Completer):
-    COMMAND_SEPARATOR = "-> "
-    def __init__(self, commands, operations, memory):
-        self.commands = commands
-        self.operations = operations
-        self.memory = memory
-
-    def get_completions(self, document, complete_event):
-        if self.COMMAND_SEPARATOR in document.text:
-            autocomplete_words = self.operations
-        else:
-            autocomplete_words = list(self.memory) + list(self.commands)
-            autocomplete_words.append(self.COMMAND_SEPARATOR)
-
-        return FuzzyWordCompleter(autocomplete_words).get_completions(document, complete_event)
+@lru_cache(maxsize=None)
+def help_text():
+    with open(os.path.join(__location__, 'help.txt')) as help_file:
+        return help_file.read() % DEFAULT_NUMBER_OF_STEPS
 
 
 class Terminal:
     OUT = "OUT: "
     DEFAULT_NAME = '_'
-    HIDDEN_NAMES = [DEFAULT_NAME, 'FORMAT']
+    HIDDEN_NAMES = [DEFAULT_NAME, 'FORMAT', 'TRACE_WIDTH']
     RESERVED_NAMES = list(COMMANDS.keys()) + list(OPERATIONS)
 
     def __init__(self):
-        self.memory = {}
+        # definitions refer to the ones of their free names, see lamedh.environment
+        self.memory = Environment(hidden=self.HIDDEN_NAMES)
         self.formatters = {
             'normal': NormalFormatter(),
             'pretty': PrettyFormatter(),
             'clean': CleanFormatter()
         }
-        self.completer = PromptCompleter(COMMANDS, OPERATIONS, self.memory)
+        self.completer = None
+        self.cache = ResultCache(directory=CACHE_DIR) if CACHE_DIR else None
 
     def help(self, arguments_string):
-        print(HELP)
+        print(help_text())
 
     def exit(self, arguments_string):
         print('\nBye!')
@@ -87,18 +84,48 @@ class Terminal:
             print("Error: File not found: '%s'" % filename)
             return
         try:
-            with open(filename) as file:
-                contents = file.readlines()
-                for line in contents:
-                    if '=' not in line:
-                        continue
-                    new_name, raw_expr = clean_split(line, '=')
-                    self.add_definition(new_name, raw_expr)
+            with open(filename, 'rb') as file:
+                source = file.read()
+            if binary.is_binary(source):
+                self.define_loaded(binary.load_definitions(source), filename)
+                return
+            definitions = compiled.load(filename, source)
+            if definitions is not None:
+                self.define_loaded(definitions, filename)
+                return
+            lines = [line for line in source.decode().splitlines() if '=' in line]
+            parsed = []
+            for line in lines:
+                new_name, raw_expr = clean_split(line, '=')
+                expr = self.add_definition(new_name, raw_expr)
+                if expr is not None:
+                    parsed.append((new_name, expr))
+            if len(parsed) == len(lines):
+                # only when all of them could be defined, so errors are shown every time
+                compiled.save(filename, source, parsed)
         except Exception as e:
             print("Error: %s" % e)
 
+    def define_loaded(self, definitions, filename):
+        # definitions from a binary or compiled file. There's no need to parse nor
+        # print each one, the file may have lots of them
+        loaded = 0
+        with binary.paused_gc():
+            for new_name, expr, free_names in definitions:
+                if new_name in self.RESERVED_NAMES:
+                    print("Error: name '%s' is reserved" % new_name)
+                    continue
+                self.memory.define(new_name, expr, free_names)
+                loaded += 1
+        print('%s expressions loaded from "%s"' % (loaded, filename))
+
     def dump_memory(self, filename=None):
         print("Dumping expressions saved in memory", end='')
+        if filename and filename.endswith(BINARY_EXTENSION):
+            print(f' to binary file "{filename}"')
+            with open(filename, 'wb') as file:
+                file.write(binary.dump_definitions(self.dumped_definitions()))
+            return
         if filename:
             open_file = open(filename, 'w')
             print(f' to file "{filename}"')
@@ -107,23 +134,41 @@ class Terminal:
             open_file = sys.stdout
             print(":")
             dump_formatter = self.formatter
-        for k, v in self.memory.items():
-            if k in self.HIDDEN_NAMES:
-                continue
+        for k, v in self.dumped_definitions():
             print(f"{k} = {dump_formatter(v)}", file=open_file)
         if open_file is not sys.stdout:
             open_file.close()
 
+    def dumped_definitions(self):
+        # (name, expr) of the definitions to dump, that loaded in order define the same
+        for k, v in self.memory.items():
+            if k in self.HIDDEN_NAMES:
+                continue
+            if not self.memory.is_current(k):
+                # it refers to names redefined (or deleted) since then
+                v = self.memory.unfold(k)
+            yield k, v
+
     @property
     def formatter(self):
         default = self.formatters['pretty']
         name = str(self.memory.get('FORMAT', None))
         return self.formatters.get(name, default)
 
+    @property
+    def trace_formatter(self):
+        # the formatter for the steps of verbose evaluations, that cuts them
+        # at TRACE_WIDTH characters if it's set
+        width = str(self.memory.get('TRACE_WIDTH', ''))
+        if not width.isdigit():
+            return self.formatter
+        return type(self.formatter)(width=int(width))
+
     def autocomplete_prompt(self):
-        return session.prompt(
-            self.formatter.PS1, completer=self.completer, complete_while_typing=True, auto_suggest=AutoSuggestFromHistory()
-        )
+        from lamedh.prompt import prompt, PromptCompleter  # imported here, it's slow to import
+        if self.completer is None:
+            self.completer = PromptCompleter(COMMANDS, OPERATIONS, self.memory)
+        return prompt(self.formatter.PS1, self.completer)
 
     def main(self):
         self.greetings()
@@ -164,6 +209,7 @@ class Terminal:
             msg += ' %s' % self.formatter(parsed)
         print(msg)
         self.memory[new_name] = parsed
+        return parsed
 
     def process_line(self, line):
         # One of 2 options:
@@ -188,13 +234,7 @@ class Terminal:
 
     def parse_expr(self, raw_expr):
         try:
-            parsed = Expr.from_string(raw_expr)
-            free = parsed.get_free_vars()
-            free_names = [expr.var_name for expr in free]
-            mapping = {k: v.clone() for k, v in self.memory.items()
-                        if k in free_names and k not in self.HIDDEN_NAMES}
-            parsed = SubstituteVisitor().visit(parsed, mapping)
-            return parsed
+            return Expr.from_string(raw_expr)
         except Exception as e:
             print("Parsing Lambda Expr Error: %s" % e)
 
@@ -222,22 +262,34 @@ class Terminal:
         if operation == 'show':
             print(self.OUT, self.formatter(stored_expr))
         elif operation == 'as_tree':
-            print(self.OUT, self.formatter.as_tree(repr(stored_expr)))
+            print(self.OUT, self.formatter.as_tree(stored_expr))
         else:
             max_steps = DEFAULT_NUMBER_OF_STEPS
-            if argument:
-                # try to parse the custom number of steps provided
-                try:
-                    max_steps = int(argument)
-                except ValueError:
+            options = {}
+            for arg in filter(None, clean_split_all(argument, ',')):
+                # the custom number of steps, or the name of the backend to use
+                if arg.isdigit():
+                    max_steps = int(arg)
+                elif arg.isidentifier():
+                    options['backend'] = arg
+                else:
                     print("Error: bad argument '%s' for operation '%s'. Type '?' for help"
-                           % (operation, argument))
+                           % (arg, operation))
                     return
 
+            if operation in CACHED_OPERATIONS and self.cache is not None:
+                options['cache'] = self.cache
+
+            # the definitions it refers to are unfolded only now, that the whole term is needed
+            if var in self.memory:
+                stored_expr = self.memory.unfold(var)
+            elif stored_expr is not None:
+                stored_expr = self.memory.unfold_expr(stored_expr)
+
             print(self.OUT)
             func = getattr(stored_expr, operation)
             try:
-                new_expr = func(max_steps=max_steps, verbose=1, formatter=self.formatter)
+                new_expr = func(max_steps=max_steps, verbose=1, formatter=self.trace_formatter, **options)
                 print(self.OUT, self.formatter(new_expr))
                 self.memory[new_name] = new_expr
             except Exception as e:
@@ -265,8 +317,12 @@ class NormalFormatter:
     PS1 = "λh> "
     indent = '|  '
 
+    def __init__(self, width=None):
+        # the text of expressions is cut after width characters, see lamedh.render
+        self.width = width
+
     def __call__(self, expr):
-        return str(expr)
+        return render(expr, width=self.width)
 
     def justify_till_end(self, msg, gap):
         columns, _ = os.get_terminal_size()
@@ -275,28 +331,39 @@ class NormalFormatter:
             msg += ' ' * (columns - gap - length)
         return msg
 
-    def as_tree(self, expr_str):
-        result = "\n"
+    def as_tree(self, expr):
+        # the repr of expr, one node per line
+        result = ["\n"]
         depth = 0
-        for c in expr_str:
-            if c == '(':
-                depth += 1
-                result += '('
-                result += '\n' + (self.indent * depth)
-            elif c == ')':
-                depth -= 1
-                result += '\n' + (self.indent * depth) + ')'
-            elif c == ' ' or c == '.':
-                result += c
-                result += '\n' + (self.indent * depth)
-            else:
-                result += c
-        return result
+        for text in truncated(pieces(expr, repr), self.width):
+            for c in text:
+                if c == '(':
+                    depth += 1
+                    result.append('(')
+                    result.append('\n' + (self.indent * depth))
+                elif c == ')':
+                    depth -= 1
+                    result.append('\n' + (self.indent * depth) + ')')
+                elif c == ' ' or c == '.':
+                    result.append(c)
+                    result.append('\n' + (self.indent * depth))
+                else:
+                    result.append(c)
+        return ''.join(result)
 
 
 class CleanFormatter(NormalFormatter):
 
     def __call__(self, expr):
+        try:
+            txt = clean_string(expr)
+        except Unsupported:
+            txt = self.reparsed(expr)
+        return ''.join(truncated([txt], self.width))
+
+    def reparsed(self, expr):
+        # removes the pairs one at a time, parsing the text after each one.
+        # Left for the expressions clean_string doesn't print
         txt = str(expr)
         # let's minimize the number of parentheses
         open_par = txt.count('(')
@@ -308,7 +375,7 @@ class CleanFormatter(NormalFormatter):
                 parsed = Expr.from_string(new_txt)
             except Exception as e:
                 parsed = None
-            if repr(parsed) == repr(expr):
+            if parsed == expr:
                 # success
                 txt = new_txt
                 removals += 1
@@ -359,7 +426,8 @@ class PrettyFormatter(NormalFormatter):
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-    def __init__(self):
+    def __init__(self, width=None):
+        super().__init__(width)
         self.colors = [self.WHITE, self.PINK, self.BLUE, self.RED, self.CYAN, self.GREEN, self.YELLOW]
 
     def next_color(self, respect_to):
@@ -373,19 +441,22 @@ class PrettyFormatter(NormalFormatter):
         return self.colors[(idx - 1) % len(self.colors)]
 
     def __call__(self, expr):
-        txt = str(expr)
         current_color = self.colors[0]
-        result = '' + current_color
-        for i, c in enumerate(txt):
-            if c == '(':
-                current_color = self.next_color(current_color)
-                result += current_color + c
-            elif c == ')':
-                current_color = self.prev_color(current_color)
-                result += c + current_color
-            else:
-                result += c
-        return result
+        result = [current_color]
+        for text in truncated(pieces(expr), self.width):
+            if '(' not in text and ')' not in text:
+                result.append(text)
+                continue
+            for c in text:
+                if c == '(':
+                    current_color = self.next_color(current_color)
+                    result.append(current_color + c)
+                elif c == ')':
+                    current_color = self.prev_color(current_color)
+                    result.append(c + current_color)
+                else:
+                    result.append(c)
+        return ''.join(result)
 
     def justify_till_end(self, msg, gap):
         columns, _ = os.get_terminal_size()
@@ -1,13 +1,19 @@
+import re
 
-class PreserveTreeStructureMetaClass(type):
-    def __call__(cls, *args, **kwargs):
-        """Called when you call MyNewClass() on classes that use this metaclass"""
-        obj = type.__call__(cls, *args, **kwargs)
-        obj.preserve_tree_structure()
-        return obj
+from lamedh.render import render
 
+# where to_string placed each child, see TreeNode.pieces
+SLOT = re.compile('\x00([0-9]+)\x00')
+
+
+class TreeNode(object):
+    # Nodes are slotted (no __dict__), so subclasses must declare the
+    # attributes they have in __slots__.
+    # Constructors must set the parent of their children, and their own parent
+    # to None. Nodes with few children do it inline, the rest can just call
+    # preserve_tree_structure at the end of __init__
+    __slots__ = ('parent', )
 
-class TreeNode(object, metaclass=PreserveTreeStructureMetaClass):
     def preserve_tree_structure(self):
         for child in self.children():
             assert isinstance(child, TreeNode), f'Child {child} of {self} is not a TreeNode. It is a {type(child)}'
@@ -17,9 +23,27 @@ class TreeNode(object, metaclass=PreserveTreeStructureMetaClass):
     def children(self):
         return []
 
+    # printed before the node by str, repr prints the class name instead
+    str_prefix = ''
+
+    def pieces(self, func, name):
+        # The text of the node, as a list of strings and its children in the
+        # order they're written (see lamedh.render). Taken from to_string,
+        # that receives func to write the rest of objects (operator symbols,
+        # patterns). Common nodes give it directly
+        if not hasattr(self, 'to_string'):
+            return [func(self)]
+        children = list(self.children())
+        slots = {id(child): '\x00%s\x00' % position for position, child in enumerate(children)}
+        text = self.to_string(lambda obj: slots.get(id(obj)) or func(obj), name)
+        # split alternates text and the positions of the children
+        parts = SLOT.split(text)
+        for i in range(1, len(parts), 2):
+            parts[i] = children[int(parts[i])]
+        return parts
+
     def __repr__(self):
-        name = self.__class__.__name__
-        return self.to_string(repr, name)
+        return render(self, repr)
 
     def __str__(self):
-        return self.to_string(str)
+        return render(self)
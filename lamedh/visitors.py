@@ -1,4 +1,4 @@
-from copy import copy
+from functools import reduce
 
 
 class VisitError(Exception):
@@ -6,106 +6,215 @@ class VisitError(Exception):
 
 
 class BaseVisitor:
+    # When provide_children is set, the children of each node are visited first
+    # and their results are given to the node's visit method (visited_children).
+    # That traversal uses an explicit stack instead of recursion, so it handles
+    # trees of any depth, using memory linear in the depth of the tree.
+    # Visitors that need to pass different arguments to the children of a node
+    # can do it by overriding `enter`.
+    # Visitors without provide_children are in charge of visiting the children
+    # themselves, by calling self.visit recursively.
     provide_children = True
     provide_initializer_node = False
 
     def visit(self, expr, *args, **kwargs):
-        if self.provide_initializer_node:
-            if not hasattr(self, 'initializer'):
-                self.initializer = expr
-            kwargs['initializer'] = self.initializer == expr
-        if self.provide_children:
-            if hasattr(expr, 'children'):
-                children = [self.visit(c, *args, **kwargs) for c in expr.children()]
+        if self.provide_initializer_node and not hasattr(self, 'initializer'):
+            self.initializer = expr
+        if not self.provide_children:
+            return self.dispatch(expr, args, kwargs)
+
+        methods_for = self.methods_for
+        results = []
+        # each stack item is (node, args, number of children) where the number
+        # of children is None until the children were pushed to the stack
+        stack = [(expr, args, None)]
+        while stack:
+            node, node_args, children_count = stack.pop()
+            if children_count is None:
+                enter_method, visit_method = methods_for(type(node))
+                children_args = node_args if enter_method is None else enter_method(node, *node_args)
+                if children_args is not None:
+                    children = list(node.children()) if hasattr(node, 'children') else []
+                    stack.append((node, node_args, len(children)))
+                    for child in reversed(children):
+                        stack.append((child, children_args, None))
+                    continue
+                visited_children = None
+            elif children_count:
+                visited_children = results[-children_count:]
+                del results[-children_count:]
             else:
-                children = []
-            args = (children, ) + args
-
-        custom_visit_method = 'visit_' + type(expr).__name__.lower()
-        method = getattr(self, custom_visit_method, self.generic_visit)
+                visited_children = []
+            results.append(self.dispatch(node, (visited_children, ) + node_args, kwargs))
+        return results[0]
+
+    def enter(self, expr, *args):
+        # Called before visiting the children of expr, returns the arguments
+        # they will be visited with. Returning None means the children won't be
+        # visited, and the visit method will receive None as visited_children.
+        # Customizable per node type by defining enter_<type> methods
+        method = getattr(self, 'enter_' + type(expr).__name__.lower(), None)
+        if method is None:
+            return args
+        return method(expr, *args)
+
+    def dispatch(self, expr, args, kwargs):
+        if self.provide_initializer_node:
+            kwargs = dict(kwargs, initializer=self.initializer is expr)
+        method = self.methods_for(type(expr))[1]
         return method(expr, *args, **kwargs)
 
+    def methods_for(self, node_type):
+        # (enter method, visit method) for nodes of node_type, looked up once per type
+        try:
+            return self._methods[node_type]
+        except AttributeError:
+            self._methods = {}
+        except KeyError:
+            pass
+        type_name = node_type.__name__.lower()
+        if type(self).enter is BaseVisitor.enter:
+            enter = getattr(self, 'enter_' + type_name, None)
+        else:
+            enter = self.enter
+        self._methods[node_type] = (
+            enter,
+            getattr(self, 'visit_' + type_name, self.generic_visit),
+        )
+        return self._methods[node_type]
+
     def generic_visit(self, expr, *args, **kwargs):
         raise VisitError
 
 
 class FreeVarVisitor(BaseVisitor):
+    # List of the Var nodes that are free. Closed subtrees are skipped,
+    # using the cached names of free variables of each node.
+    # Nodes are collected in lists: alpha-equivalent nodes are equal (see Expr.__eq__)
+    # and a set would keep only one of the occurrences of each name
+
+    def enter(self, expr):
+        if not expr.free_var_names():
+            return None
+        return ()
 
     def visit_var(self, expr, visited_children):
-        return {expr}
+        return [expr]
 
     def visit_lam(self, expr, visited_children):
+        if visited_children is None:
+            return []
         body_free_vars = visited_children[0]
-        return set([v for v in body_free_vars if v.var_name != expr.var_name])
+        return [v for v in body_free_vars if v.var_name != expr.var_name]
 
     def visit_app(self, expr, visited_children):
-        set_a, set_b = visited_children
-        return copy(set_a).union(set_b)
-
-    def generic_visit(self, expr, *args, **kwargs):
-        return set()
+        if visited_children is None:
+            return []
+        return merge_lists(*visited_children)
+
+    def generic_visit(self, expr, visited_children):
+        if not visited_children:
+            return []
+        scope = expr.key_scope()
+        if scope is not None:
+            names, positions = scope
+            visited_children = [[v for v in free_vars if v.var_name not in names] if i in positions else free_vars
+                                for i, free_vars in enumerate(visited_children)]
+        return reduce(merge_lists, visited_children)
 
 class BoundVarVisitor(BaseVisitor):
+    # List of the Var nodes bound by the lambda the visit starts from
     provide_initializer_node = True
 
+    def enter(self, expr, name):
+        # subtrees where name is not free don't have occurrences bound to the initializer
+        if expr is not self.initializer and name not in expr.free_var_names():
+            return None
+        return (name, )
+
     def visit_var(self, expr, visited_children, name, initializer):
         if expr.var_name == name:
-            return {expr}
+            return [expr]
         else:
-            return set()
+            return []
 
     def visit_lam(self, expr, visited_children, name, initializer):
+        if visited_children is None:
+            return []
         if initializer:
             # The body of thise lambda is where we are checking bindings
             return visited_children[0]
         if expr.var_name == name:
             # inside this expression, the `name` doesn't bind any more the outside Lambda,
             # becuase will start binding with current inner Lambda
-            return set()
+            return []
         else:
             return visited_children[0]
 
     def visit_app(self, expr, visited_children, name, initializer):
-        set_a, set_b = visited_children
-        return copy(set_a).union(set_b)
+        if visited_children is None:
+            return []
+        return merge_lists(*visited_children)
+
+    def generic_visit(self, expr, visited_children, name, initializer):
+        if not visited_children:
+            return []
+        scope = expr.key_scope()
+        if scope is not None and name in scope[0]:
+            # name is bound again by expr in these children
+            visited_children = [[] if i in scope[1] else occurrences
+                                for i, occurrences in enumerate(visited_children)]
+        return reduce(merge_lists, visited_children)
 
 
 class SubstituteVisitor(BaseVisitor):
-    provide_children = False
-    provide_initializer_node = True
+    # Subtrees without free variables to substitute are not visited, and are
+    # returned as they are. See Expr.substitute
 
-    def visit_var(self, expr, substitution_map, initializer):
-        if expr.var_name in substitution_map:
-            return substitution_map[expr.var_name].clone()
-        else:
-            return expr
+    def __init__(self, meter=None):
+        self.meter = meter
+        # nodes of the copies of the substituted expressions, all of them end in the result
+        self.copied = 0
+
+    def enter(self, expr, substitution_map):
+        if expr.free_var_names().isdisjoint(substitution_map):
+            return None
+        return super().enter(expr, substitution_map)
 
-    def visit_app(self, expr, substitution_map, initializer):
-        visited_optr = self.visit(expr.operator, substitution_map)
-        visited_operand = self.visit(expr.operand, substitution_map)
+    def visit_var(self, expr, visited_children, substitution_map):
+        if expr.var_name not in substitution_map:
+            return expr
+        meter = self.meter
+        copy = substitution_map[expr.var_name].clone(meter)
+        if meter:
+            self.copied += copy.size()
+            meter.check(meter.steps, self.copied)
+        return copy
+
+    def visit_app(self, expr, visited_children, substitution_map):
+        if visited_children is None:
+            return expr
+        visited_optr, visited_operand = visited_children
         App_ = expr.__class__
         return App_(visited_optr, visited_operand)
 
-    def visit_lam(self, expr, substitution_map, initializer):
-        # check if this lambda is binding stronger the variable that we want to substitute
-        if not initializer:
-            if expr.var_name in substitution_map:
-                new_map = {k: v.clone() for k,v in substitution_map.items() if k != expr.var_name}
-                substitution_map = new_map
+    def enter_lam(self, expr, substitution_map):
+        # check if this lambda is binding stronger the variable that we want to substitute.
+        # Applies to the lambda the substitution starts from too: (λx.e)[x:=a] is λx.e
+        if expr.var_name in substitution_map:
+            new_map = {k: v for k,v in substitution_map.items() if k != expr.var_name}
+            substitution_map = new_map
 
         if not substitution_map:
-            return expr.clone()
+            return None  # nothing to substitute in the body, see visit_lam
 
         # before propagating substitution, we need to be sure that lam.var_name is safe
         names_not_to_use = set()
-        free_vars_in_body = [
-            e for e in expr.body.get_free_vars()
-            if e.var_name != expr.var_name
-        ] # excluding the free-vars bound to this lambda
-        for fv in free_vars_in_body:
-            subs_expr = substitution_map.get(fv.var_name, fv)
-            subs_fv = subs_expr.get_free_vars()
-            names_not_to_use = names_not_to_use.union([_.var_name for _ in subs_fv])
+        for name in expr.body.free_var_names() - {expr.var_name}:
+            if name in substitution_map:
+                names_not_to_use.update(substitution_map[name].free_var_names())
+            else:
+                names_not_to_use.add(name)
         if expr.var_name in names_not_to_use:
             # need renaming
             new_name = expr.var_name
@@ -113,25 +222,84 @@ class SubstituteVisitor(BaseVisitor):
             while new_name in names_not_to_use:
                 new_name = next(name_gen)
             expr.rename(new_name)
+        return (substitution_map, )
 
-        new_body = self.visit(expr.body, substitution_map)
+    def visit_lam(self, expr, visited_children, substitution_map):
+        if visited_children is None:
+            return expr
         Lam_ = expr.__class__
-        return Lam_(expr.var_name, new_body)
+        return Lam_(expr.var_name, visited_children[0])
 
-    def generic_visit(self, expr, *args, **kwargs):
-        return expr
+    def enter_letin(self, expr, substitution_map):
+        # children are substituted by visit_letin, each one with its own map
+        return None
+
+    enter_letrec = enter_letin
+
+    def visit_letin(self, expr, visited_children, substitution_map):
+        if expr.free_var_names().isdisjoint(substitution_map):
+            return expr
+        names, positions = expr.key_scope()
+        inner_map = {k: v for k, v in substitution_map.items() if k not in names}
+        # same than with lambdas, bound names that would capture substituted variables are renamed
+        children = list(expr.children())
+        names_not_to_use = set()
+        for position in positions:
+            for name in children[position].free_var_names().difference(names):
+                if name in inner_map:
+                    names_not_to_use.update(inner_map[name].free_var_names())
+        for name in names:
+            if name in names_not_to_use:
+                taken = names_not_to_use.union(names, *(children[i].free_var_names() for i in positions))
+                new_name = name
+                name_gen = var_name_generator_numerical(name)
+                while new_name in taken:
+                    new_name = next(name_gen)
+                expr.rename(name, new_name)
+        children = list(expr.children())
+        return expr.rebuild([
+            self.visit(child, inner_map if position in positions else substitution_map)
+            for position, child in enumerate(children)])
+
+    visit_letrec = visit_letin
+
+    def generic_visit(self, expr, visited_children, substitution_map):
+        if visited_children is None:
+            return expr
+        return expr.rebuild(visited_children)
+
+
+class CloneVisitor(BaseVisitor):
+    # Copies a tree node by node. Cached data is still valid for the copy, so it's kept.
+    # With a meter, time and memory are checked every CHECK_EVERY nodes
+    CHECK_EVERY = 1024
+
+    def __init__(self, meter=None):
+        self.meter = meter
+        self.copied = 0
+
+    def generic_visit(self, expr, visited_children):
+        if self.meter:
+            self.copied += 1
+            if not self.copied % self.CHECK_EVERY:
+                self.meter.check(self.meter.steps)
+        new = expr.rebuild(visited_children)
+        for attr in expr.CACHED_ATTRS:
+            setattr(new, attr, getattr(expr, attr))
+        return new
 
 
 class EvalVisitor(BaseVisitor):
     provide_children = False
     ARROW = ' ???> '
 
-    def __init__(self, max_steps, verbose=False, formatter=None) -> None:
+    def __init__(self, max_steps, verbose=False, formatter=None, meter=None) -> None:
         super().__init__()
         self.steps = 0
         self.max_steps = max_steps
         self.verbose = verbose
         self.formatter = formatter
+        self.meter = meter
 
     def format(self, expr):
         if self.formatter:
@@ -168,6 +336,14 @@ class EvalVisitor(BaseVisitor):
         if self.steps >= self.max_steps:
             raise StopEvaluation('Reached max number of steps: %s' % self.max_steps)
         self.steps += 1
+        if self.meter:
+            self.meter.check(self.steps)
+
+    def measure(self, expr):
+        # checks the size of a term built by substitution against the budget
+        if self.meter:
+            self.meter.check(self.steps, expr.size())
+        return expr
 
     def visit_lam(self, expr, breadcrumbs):
         self._register_step()
@@ -183,9 +359,12 @@ class EvalVisitor(BaseVisitor):
         e1.parent = None
         e2.parent = None
         e1_canonic_form = self.try_going_to_canonic_form(e1, breadcrumbs + 'a')
+        from lamedh.expr import Lam  # type: ignore
+        if not isinstance(e1_canonic_form, Lam):
+            self.type_error(e1_canonic_form, 'Cant apply %s' % repr(e1_canonic_form))
         e2 = self.reduce_operand(e2, breadcrumbs)  # this will differ in Eager vs Normal
         mapping = {e1_canonic_form.var_name: e2}
-        new_e = e1_canonic_form.body.substitute(mapping)
+        new_e = self.measure(e1_canonic_form.body.substitute(mapping, self.meter))
         last_branch = self.visit(new_e, breadcrumbs + self.last_branch_name)
         self.show('', breadcrumbs + '(t)', success=last_branch, explanation="Finished " + breadcrumbs)
         return last_branch
@@ -198,10 +377,168 @@ class EvalVisitor(BaseVisitor):
             raise CantEvalException()
         return canonic_form
 
+    def evaluate(self, expr, breadcrumbs=''):
+        # Canonical form of expr, or the error (or typeerror) it evaluates to
+        from lamedh.expr import EvalErrorException  # type: ignore
+        try:
+            return self.visit(expr, breadcrumbs)
+        except EvalErrorException as error:
+            self.show('', breadcrumbs + '(t)', success=error.result, explanation=str(error))
+            return error.result
+
+    # -- Applicative language. Sub-expressions are evaluated on copies,
+    # like the operator and operand of applications
+    def evaluate_child(self, expr, breadcrumbs):
+        return self.try_going_to_canonic_form(expr.clone(), breadcrumbs)
+
+    def finish(self, result, breadcrumbs):
+        self.show('', breadcrumbs + '(t)', success=result, explanation="Finished " + breadcrumbs)
+        return result
+
+    def type_error(self, expr, msg):
+        from lamedh.expr import EvalErrorException  # type: ignore
+        from lamedh.expr.applicative import TypeError  # type: ignore
+        raise EvalErrorException(TypeError(), msg)
+
+    def constant_value(self, canonic_form, kind):
+        # Python value of a constant of the given kind (any kind if None)
+        from lamedh.expr.applicative import BooleanConstant  # type: ignore
+        if not isinstance(canonic_form, BooleanConstant) or kind not in (None, canonic_form.kind):
+            self.type_error(canonic_form, 'Expected %s, got %s' % (
+                kind.name if kind else 'a constant', repr(canonic_form)))
+        return canonic_form.python_value
+
+    def visit_booleanconstant(self, expr, breadcrumbs):
+        self._register_step()
+        self.show(expr, breadcrumbs, success='...', explanation="Const rule")
+        return expr
+
+    visit_naturalconstant = visit_booleanconstant
+
+    def visit_error(self, expr, breadcrumbs):
+        from lamedh.expr import EvalErrorException  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Error rule")
+        raise EvalErrorException(expr.__class__())
+
+    visit_typeerror = visit_error
+
+    def visit_unaryop(self, expr, breadcrumbs):
+        from lamedh.expr.applicative import constant  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Unary op rule")
+        operand = self.evaluate_child(expr.operand, breadcrumbs + 'a')
+        value = self.constant_value(operand, expr.operand_kind)
+        return self.finish(constant(expr.compute(value)), breadcrumbs)
+
+    def visit_binaryop(self, expr, breadcrumbs):
+        from lamedh.expr import EvalErrorException  # type: ignore
+        from lamedh.expr.applicative import constant, Error, SHORT_CIRCUITS  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Binary op rule")
+        kind = expr.operand_kind
+        left = self.evaluate_child(expr.left, breadcrumbs + 'a')
+        left_value = self.constant_value(left, kind)
+        if SHORT_CIRCUITS.get(expr.operator, None) is left_value:
+            return self.finish(constant(left_value), breadcrumbs)
+        right = self.evaluate_child(expr.right, breadcrumbs + 'b')
+        right_value = self.constant_value(right, kind or left.kind)
+        try:
+            result = expr.compute(left_value, right_value)
+        except ZeroDivisionError:
+            raise EvalErrorException(Error(), 'Division by zero')
+        return self.finish(constant(result), breadcrumbs)
+
+    def visit_ifthenelse(self, expr, breadcrumbs):
+        from lamedh.expr.applicative import ConstType  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="If rule")
+        guard = self.evaluate_child(expr.guard, breadcrumbs + 'a')
+        branch = expr.then_body if self.constant_value(guard, ConstType.Boolean) else expr.else_body
+        return self.finish(self.visit(branch.clone(), breadcrumbs + 'b'), breadcrumbs)
+
+    def visit_tuple(self, expr, breadcrumbs):
+        from lamedh.expr.applicative import Tuple  # type: ignore
+        self._register_step()
+        if not self.eager_components:
+            self.show(expr, breadcrumbs, success='...', explanation="Tuple rule")
+            return expr
+        self.show(expr, breadcrumbs, explanation="Tuple rule")
+        elems = [self.evaluate_child(elem, breadcrumbs + branch_name(i))
+                 for i, elem in enumerate(expr.elems)]
+        return self.finish(Tuple(elems), breadcrumbs)
+
+    def visit_indexing(self, expr, breadcrumbs):
+        from lamedh.expr.applicative import Tuple  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Indexing rule")
+        container = self.evaluate_child(expr.container, breadcrumbs + 'a')
+        index = expr.index.python_value
+        if not isinstance(container, Tuple) or index >= len(container.elems):
+            self.type_error(container, 'Cant index %s with %s' % (repr(container), index))
+        elem = container.elems[index]
+        elem.parent = None
+        if not self.eager_components:
+            elem = self.visit(elem, breadcrumbs + 'b')
+        return self.finish(elem, breadcrumbs)
+
+    def visit_letin(self, expr, breadcrumbs):
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Let rule")
+        mapping = {}
+        definitions = expr.definitions()
+        for i, (pattern, definition) in enumerate(definitions):
+            if self.eager_components:
+                value = self.evaluate_child(definition, breadcrumbs + branch_name(i))
+            else:
+                value = definition.clone()
+            self.bind(pattern, value, mapping)
+        body = self.measure(expr.in_expr.clone().substitute(mapping, self.meter))
+        return self.finish(self.visit(body, breadcrumbs + branch_name(len(definitions))), breadcrumbs)
+
+    def bind(self, pattern, value, mapping):
+        # adds to mapping what the variables of pattern are bound to, when matched against value
+        from lamedh.expr.applicative import Tuple, Indexing, NaturalConstant  # type: ignore
+        if pattern.var:
+            mapping[pattern.var.var_name] = value
+        elif not self.eager_components:
+            # value is not evaluated, each variable is bound to its component
+            for i, sub_pattern in enumerate(pattern.sub_patterns):
+                self.bind(sub_pattern, Indexing(value.clone(), NaturalConstant(str(i))), mapping)
+        elif isinstance(value, Tuple) and len(value.elems) == len(pattern.sub_patterns):
+            for sub_pattern, elem in zip(pattern.sub_patterns, value.elems):
+                self.bind(sub_pattern, elem, mapping)
+        else:
+            self.type_error(value, 'Cant match %s with %s' % (pattern, repr(value)))
+
+    def visit_letrec(self, expr, breadcrumbs):
+        # each defined variable is bound to its lambda, which body is wrapped in the letrec again.
+        # Terms can't refer to themselves, so unlike lamedh.compiler this unfolds on every call
+        from lamedh.expr import CantEvalException  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Letrec rule")
+        mapping = {}
+        for pattern, definition in expr.definitions():
+            if not pattern.var:
+                raise CantEvalException('Cant evaluate letrec defining %s' % pattern)
+            mapping[pattern.var.var_name] = expr.unfolding(definition)
+        body = self.measure(expr.in_expr.clone().substitute(mapping, self.meter))
+        return self.finish(self.visit(body, breadcrumbs + 'a'), breadcrumbs)
+
 
 class EvalNormalVisitor(EvalVisitor):
     ARROW = ' =N=> '
     last_branch_name = 'b'
+    eager_components = False
+
+    def visit_rec(self, expr, breadcrumbs):
+        # rec e evaluates like e (rec e)
+        from lamedh.expr import App  # type: ignore
+        from lamedh.expr.applicative import Rec  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Rec rule")
+        unfolded = App(expr.body.clone(), Rec(expr.body.clone()))
+        return self.finish(self.visit(unfolded, breadcrumbs + 'a'), breadcrumbs)
 
     def app_rule_explanation(self, breadcrumbs):
         return "App rule. Two children: %s & %s" % tuple(breadcrumbs+c for c in 'ab')
@@ -213,6 +550,20 @@ class EvalNormalVisitor(EvalVisitor):
 class EvalEagerVisitor(EvalVisitor):
     ARROW = ' =E=> '
     last_branch_name = 'c'
+    eager_components = True
+
+    def visit_rec(self, expr, breadcrumbs):
+        # rec e, being λf.b the canonical form of e, evaluates like b[f:=rec λf.b]
+        from lamedh.expr import Lam  # type: ignore
+        from lamedh.expr.applicative import Rec  # type: ignore
+        self._register_step()
+        self.show(expr, breadcrumbs, explanation="Rec rule")
+        function = self.evaluate_child(expr.body, breadcrumbs + 'a')
+        if not isinstance(function, Lam):
+            self.type_error(function, 'Cant apply %s' % repr(function))
+        recursion = Rec(function.clone())
+        unfolded = self.measure(function.body.substitute({function.var_name: recursion}, self.meter))
+        return self.finish(self.visit(unfolded, breadcrumbs + 'b'), breadcrumbs)
 
     def app_rule_explanation(self, breadcrumbs):
         return "App rule. Three children: %s, %s & %s" % tuple(breadcrumbs+c for c in 'abc')
@@ -221,6 +572,61 @@ class EvalEagerVisitor(EvalVisitor):
         return self.try_going_to_canonic_form(expr, breadcrumbs + 'b')
 
 
+class EvalLazyVisitor(EvalVisitor):
+    # Normal order evaluation, but arguments are not substituted. They are bound
+    # in an environment to thunks that are evaluated at most once (call-by-need).
+    # Visiting an expression returns a Closure, that is read back into a Lam by Expr.evalL
+    ARROW = ' =L=> '
+
+    def show(self, expr, breadcrumbs, success='', explanation=''):
+        if not self.verbose:
+            return
+        from lamedh.closures import Closure  # type: ignore
+        if isinstance(expr, Closure):
+            expr = expr.readback()
+        if isinstance(success, Closure):
+            success = success.readback()
+        super().show(expr, breadcrumbs, success, explanation)
+
+    def visit_var(self, expr, breadcrumbs, env):
+        from lamedh.expr import CantEvalException  # type: ignore
+        if expr.var_name not in env:
+            raise CantEvalException('Cant evaluate variable %s' % repr(expr))
+        thunk = env[expr.var_name]
+        if thunk.value is None:
+            thunk.value = self.visit(thunk.expr, breadcrumbs, thunk.env)
+        return thunk.value
+
+    def visit_lam(self, expr, breadcrumbs, env):
+        from lamedh.closures import Closure  # type: ignore
+        self._register_step()
+        closure = Closure(expr, env)
+        self.show(closure, breadcrumbs, success='...', explanation="Abs rule")
+        return closure
+
+    def visit_app(self, expr, breadcrumbs, env):
+        from lamedh.closures import Thunk  # type: ignore
+        self._register_step()
+        if self.verbose:
+            self.show(Thunk(expr, env).readback(), breadcrumbs,
+                      explanation="App rule. Two children: %s & %s" % tuple(breadcrumbs+c for c in 'ab'))
+        closure = self.visit(expr.operator, breadcrumbs + 'a', env)
+        new_env = dict(closure.env)
+        new_env[closure.lam.var_name] = Thunk(expr.operand, env)
+        last_branch = self.visit(closure.lam.body, breadcrumbs + 'b', new_env)
+        self.show('', breadcrumbs + '(t)', success=last_branch, explanation="Finished " + breadcrumbs)
+        return last_branch
+
+    def visit_applicative(self, expr, breadcrumbs, env):
+        # the rules of EvalVisitor don't take environments, only lambda terms are evaluated lazily
+        from lamedh.expr import CantEvalException  # type: ignore
+        raise CantEvalException('Cant evaluate %s lazily' % repr(expr))
+
+    visit_booleanconstant = visit_naturalconstant = visit_error = visit_typeerror = visit_applicative
+    visit_unaryop = visit_binaryop = visit_ifthenelse = visit_applicative
+    visit_tuple = visit_indexing = visit_letin = visit_letrec = visit_rec = visit_applicative
+
+
 class RedicesVisitor(BaseVisitor):
     # each Redex will be an instances of App class where it's operator it's a Lam
 
@@ -239,6 +645,23 @@ class RedicesVisitor(BaseVisitor):
         assert len(visited_children) == 1  # only one child, the body
         return visited_children[0]
 
+    def generic_visit(self, expr, visited_children):
+        return [redex for redices in visited_children for redex in redices]
+
+
+def branch_name(position):
+    # breadcrumbs of the position-th child evaluated by a rule
+    return chr(ord('a') + position)
+
+
+def merge_lists(list_a, list_b):
+    # Both lists are owned by the visitor, so the bigger one is extended in-place
+    # instead of copying it on every level of the tree. Order is not kept
+    if len(list_a) < len(list_b):
+        list_a, list_b = list_b, list_a
+    list_a.extend(list_b)
+    return list_a
+
 
 def var_name_generator_numerical(orig_name):
     # split orig_name into chars per se, and number
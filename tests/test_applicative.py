@@ -0,0 +1,139 @@
+import unittest
+from lamedh.expr import Expr, Var, StopEvaluation, CantEvalException
+from lamedh.expr.applicative import Error, TypeError
+
+Factory = Expr.from_string
+
+FACT = '(rec (λf.(λn.(if (n == 0) then 1 else (n * (f (n - 1)))))))'
+
+
+class Evaluation(unittest.TestCase):
+
+    def assertEvaluates(self, txt, expected, expected_eager=None, max_steps=200):
+        self.assertEqual(str(Factory(txt).evalN(max_steps)), expected)
+        self.assertEqual(str(Factory(txt).evalE(max_steps)), expected_eager or expected)
+
+
+class TestOperations(Evaluation):
+
+    def test_constants_are_canonical(self):
+        self.assertEvaluates('7', '7')
+        self.assertEvaluates('true', 'true')
+
+    def test_arithmetic(self):
+        self.assertEvaluates('(2 * 3) + 1', '7')
+        self.assertEvaluates('7 / 2', '3')
+        self.assertEvaluates('7 % 2', '1')
+        self.assertEvaluates('- 5', '-5')
+
+    def test_comparisons_and_logic(self):
+        self.assertEvaluates('3 <= (1 + 2)', 'true')
+        self.assertEvaluates('true == false', 'false')
+        self.assertEvaluates('not (1 != 1)', 'true')
+        self.assertEvaluates('(1 < 2) and (2 < 1)', 'false')
+
+    def test_logic_short_circuits(self):
+        self.assertEvaluates('false and error', 'false')
+        self.assertEvaluates('true or (1 / 0 == 1)', 'true')
+
+    def test_if_then_else(self):
+        self.assertEvaluates('if (1 < 2) then 10 else error', '10')
+        self.assertEvaluates('if false then error else 20', '20')
+
+    def test_does_not_modify_the_expression(self):
+        expr = Factory('if (1 < 2) then (λx.(x + 1)) else 0')
+        before = str(expr)
+        result = expr.evalE()
+        self.assertEqual(str(result), '(λx.(x + 1))')
+        self.assertIsNone(result.parent)
+        self.assertEqual(str(expr), before)
+
+
+class TestErrors(Evaluation):
+
+    def test_division_by_zero(self):
+        self.assertIsInstance(Factory('1 / 0').evalN(), Error)
+        self.assertIsInstance(Factory('(λx.(x % 0)) 3').evalE(), Error)
+
+    def test_type_errors(self):
+        for txt in ['true + 1', '1 == true', 'not 1', 'if 1 then 2 else 3', '5 3', '<1, 2>.2', '(λx.x).0']:
+            self.assertIsInstance(Factory(txt).evalN(), TypeError, txt)
+            self.assertIsInstance(Factory(txt).evalE(), TypeError, txt)
+
+    def test_errors_propagate(self):
+        self.assertEvaluates('(λx.(x + 1)) error', 'error')
+        self.assertEvaluates('typeerror + 1', 'typeerror')
+
+    def test_unused_error_argument(self):
+        # only eager evaluation evaluates arguments that are not used
+        self.assertEvaluates('(λx.1) error', '1', 'error')
+
+    def test_free_variable_fails(self):
+        with self.assertRaises(CantEvalException):
+            Factory('x + 1').evalE()
+
+
+class TestTuples(Evaluation):
+
+    def test_tuples(self):
+        # normal evaluation doesn't evaluate the components of a tuple
+        self.assertEvaluates('<1 + 1, true>', '<(1 + 1), true>', '<2, true>')
+
+    def test_indexing(self):
+        self.assertEvaluates('<1 + 1, 2>.0', '2')
+        self.assertEvaluates('<1, <2, 3 * 3>>.1.1', '9')
+        self.assertEvaluates('<1, error>.0', '1', 'error')
+
+
+class TestLocalDefinitions(Evaluation):
+
+    def test_let(self):
+        self.assertEvaluates('let x := 2 in (x * x)', '4')
+        self.assertEvaluates('let x := 1, y := 2 in (x + y)', '3')
+        self.assertEvaluates('let x := 1 in (let x := 2 in x)', '2')
+
+    def test_definitions_only_bound_in_body(self):
+        with self.assertRaises(CantEvalException):
+            Factory('let x := 1, y := x in y').evalE()
+
+    def test_patterns(self):
+        self.assertEvaluates('let <a, b> := <1, 2> in (a + b)', '3')
+        self.assertEvaluates('let <a, <b, c>> := <1, <2, 3>> in (a + (b * c))', '7')
+        self.assertEvaluates('let <a, b> := 3 in 1', '1', 'typeerror')
+
+    def test_let_is_lazy_on_normal_evaluation(self):
+        self.assertEvaluates('let x := error in 1', '1', 'error')
+
+    def test_substitution_avoids_capture(self):
+        # y is substituted inside the let, which binds x
+        self.assertEvaluates('((λy.(let x := y in (λy.(x + y)))) 3) 4', '7')
+        expr = Factory('(λy.(let x := 1 in (x + y))) x')
+        self.assertEqual(str(expr.operator.body.substitute({'y': Var('x')})), '(let x1:=1 in (x1 + x))')
+
+    def test_free_vars(self):
+        expr = Factory('let <x, y> := <z, x> in ((x + y) + w)')
+        self.assertEqual(expr.free_var_names(), {'z', 'x', 'w'})
+        self.assertEqual({v.var_name for v in expr.get_free_vars()}, {'z', 'x', 'w'})
+
+
+class TestRecursion(Evaluation):
+
+    def test_rec(self):
+        self.assertEvaluates(f'{FACT} 5', '120', max_steps=1000)
+
+    def test_letrec(self):
+        program = ('letrec even := λn.(if (n == 0) then true else (odd (n - 1))), '
+                   'odd := λn.(if (n == 0) then false else (even (n - 1))) in (even 7)')
+        self.assertEvaluates(program, 'false', max_steps=1000)
+
+    def test_letrec_lambda_shadowing_definitions(self):
+        self.assertEvaluates('letrec f := λf.(f + 1) in (f 1)', '2')
+        self.assertEvaluates('(λx.(letrec f := λn.(x + n) in (f 1))) 10', '11')
+
+    def test_max_steps(self):
+        with self.assertRaises(StopEvaluation):
+            Factory('(rec (λf.(λn.(f n)))) 1').evalE(100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from lamedh import batch
+from lamedh.budget import Budget
+from lamedh.expr import Expr, StopEvaluation, BudgetExceeded
+
+Factory = Expr.from_string
+
+OMEGA = '(λx.(x x)) (λx.(x x))'
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_results_in_order(self):
+        texts = ['(λx.x) (λy.y)', '(λx.(x x)) (λy.y)', 'let x := 2 in (x * x)']
+        outcomes = list(batch.evaluate(texts, 'evalN', workers=2))
+        self.assertEqual([o.index for o in outcomes], [0, 1, 2])
+        self.assertEqual([str(o.result) for o in outcomes], ['(λy.y)', '(λy.y)', '4'])
+        self.assertTrue(all(o.ok for o in outcomes))
+
+    def test_expr_items_and_strategies(self):
+        items = [Factory('(λx.(λy.((λz.z) y))) w'), Factory('(λx.x) (λy.((λz.z) y))')]
+        outcomes = list(batch.evaluate(items, 'goto_normal_form', max_steps=10, workers=2))
+        self.assertEqual([str(o.result) for o in outcomes], ['(λy.y)', '(λy.y)'])
+        # results can be compared to the expressions of this process
+        self.assertEqual(outcomes[0].result, Factory('λa.a'))
+        outcomes = list(batch.evaluate(items[1:], 'evalE', backend='compiled', workers=1))
+        self.assertEqual(str(outcomes[0].result), '(λy.((λz.z) y))')
+
+    def test_failing_items(self):
+        texts = [OMEGA, '(λx.x) (λy.y)', '((', OMEGA]
+        budget = Budget(seconds=0.1)
+        outcomes = list(batch.evaluate(texts, 'evalN', max_steps=10 ** 9, budget=budget, workers=2,
+                                       backend='krivine'))
+        self.assertIsInstance(outcomes[0].error, BudgetExceeded)
+        self.assertEqual(outcomes[0].error.resource, 'seconds')
+        self.assertEqual(str(outcomes[1].result), '(λy.y)')
+        self.assertFalse(outcomes[2].ok)
+        outcomes = list(batch.evaluate([OMEGA], 'evalN', max_steps=10, workers=1, backend='krivine'))
+        self.assertIsInstance(outcomes[0].error, StopEvaluation)
+
+    def test_deep_terms(self):
+        deep = 'λf.λx.' + 'f (' * 3000 + 'x' + ')' * 3000
+        items = ['(λx.x) (λy.y)', deep, Factory('(λx.x) (%s)' % deep), '(λx.x) (λz.z)']
+        outcomes = list(batch.evaluate(items, 'goto_normal_form', workers=2))
+        self.assertTrue(all(o.ok for o in outcomes))
+        self.assertEqual(outcomes[1].result, Factory(deep))
+        self.assertEqual(outcomes[2].result, Factory(deep))
+        self.assertEqual(str(outcomes[3].result), '(λz.z)')
+
+    def test_unordered(self):
+        texts = ('let x := %s in (x + 1)' % i for i in range(20))
+        outcomes = list(batch.evaluate(texts, 'evalE', workers=2, ordered=False))
+        self.assertEqual(sorted(o.index for o in outcomes), list(range(20)))
+        for o in outcomes:
+            self.assertEqual(str(o.result), str(o.index + 1))
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            list(batch.evaluate(['x'], 'evalX'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from lamedh.expr import Expr, Var, Lam, App
+from lamedh.expr import binary
+
+Factory = Expr.from_string
+
+EXPRESSIONS = [
+    'x',
+    'λx.λy.(x y)',
+    '(λx.(x x)) (λy.y)',
+    '<a, <b, c>>.1.0',
+    'not true or - 3 < 007',
+    'if a == b then error else typeerror',
+    'let x := 1, <y, <z, w>> := t in x + y',
+    'letrec f := λn.if n == 0 then 1 else n * f (n - 1), g := λx.x in f 5',
+    'rec λf.λn.f n',
+]
+
+
+class TestBinary(unittest.TestCase):
+
+    def test_round_trip(self):
+        for txt in EXPRESSIONS:
+            expr = Factory(txt)
+            loaded = binary.loads(binary.dumps(expr))
+            self.assertEqual(repr(loaded), repr(expr))
+            self.assertIsNone(loaded.parent)
+
+    def test_definitions(self):
+        definitions = [('name%s' % i, Factory(txt)) for i, txt in enumerate(EXPRESSIONS)]
+        data = binary.dump_definitions(definitions)
+        self.assertTrue(binary.is_binary(data))
+        loaded = binary.load_definitions(data)
+        self.assertEqual([(name, repr(expr), free_names) for name, expr, free_names in loaded],
+                         [(name, repr(expr), expr.free_var_names()) for name, expr in definitions])
+
+    def test_names_are_written_once(self):
+        expr = Factory(' '.join(['some_long_name'] * 50))
+        self.assertEqual(binary.dumps(expr).count(b'some_long_name'), 1)
+
+    def test_deep_trees(self):
+        expr = Var('x')
+        for _ in range(20000):
+            expr = Lam('x', App(expr, Var('y')))
+        self.assertEqual(binary.loads(binary.dumps(expr)), expr)
+
+    def test_bad_data(self):
+        data = binary.dumps(Factory('λx.(x y)'))
+        for bad in [b'x = y', data[:-2], binary.MAGIC + b'\x63' + data[len(binary.MAGIC) + 1:]]:
+            with self.assertRaises(binary.FormatError):
+                binary.loads(bad)
+
+
+if __name__ == '__main__':
+    unittest.main()
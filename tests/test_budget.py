@@ -0,0 +1,97 @@
+import tracemalloc
+import unittest
+from lamedh.budget import Budget, Meter
+from lamedh.expr import Expr, StopEvaluation, BudgetExceeded
+
+Factory = Expr.from_string
+
+OMEGA = '(λx.(x x)) (λx.(x x))'
+# each reduction step makes the term bigger
+GROWING = '(λx.((x x) x)) (λx.((x x) x))'
+
+
+class TestBudget(unittest.TestCase):
+
+    def test_size(self):
+        self.assertEqual(Factory('x').size(), 1)
+        expr = Factory('(λx.(x y)) z')
+        self.assertEqual(expr.size(), 6)
+        self.assertEqual(expr.reduce().size(), 3)
+
+    def test_seconds(self):
+        # visitors would hit the recursion limit evaluating omega, machines are iterative
+        for method, backend in [('goto_normal_form', 'named'), ('goto_normal_form', 'debruijn'),
+                                ('goto_normal_form', 'nbe'), ('evalN', 'krivine'), ('evalE', 'cek'),
+                                ('evalN', 'compiled'), ('evalE', 'compiled')]:
+            operation = getattr(Factory(OMEGA), method)
+            with self.assertRaises(BudgetExceeded) as caught:
+                operation(10 ** 9, backend=backend, budget=Budget(seconds=0.05))
+            self.assertEqual(caught.exception.resource, 'seconds')
+            stats = caught.exception.stats
+            self.assertGreater(stats['steps'], 0)
+            self.assertGreaterEqual(stats['seconds'], 0.05)
+
+    def test_nodes(self):
+        for backend in ['named', 'debruijn']:
+            with self.assertRaises(BudgetExceeded) as caught:
+                Factory(GROWING).goto_normal_form(10 ** 6, backend=backend, budget=Budget(nodes=100))
+            stats = caught.exception.stats
+            self.assertEqual(caught.exception.resource, 'nodes')
+            self.assertGreater(stats['nodes'], 100)
+        with self.assertRaises(BudgetExceeded):
+            # terms evaluated by the visitors: the bodies of the applications, substituted
+            Factory('(λx.((x x) x)) (λy.y)').evalE(budget=Budget(nodes=6))
+
+    def test_memory(self):
+        with self.assertRaises(BudgetExceeded) as caught:
+            Factory(GROWING).goto_normal_form(10 ** 6, budget=Budget(memory=10 ** 5))
+        self.assertEqual(caught.exception.resource, 'memory')
+        self.assertGreater(caught.exception.stats['memory'], 10 ** 5)
+
+    def test_is_a_stop_evaluation(self):
+        with self.assertRaises(StopEvaluation):
+            Factory(OMEGA).evalN(10 ** 9, backend='krivine', budget=Budget(seconds=0.01))
+
+    def test_within_budget(self):
+        budget = Budget(seconds=10, nodes=100, memory=10 ** 7)
+        self.assertEqual(str(Factory('(λx.x) y').goto_normal_form(budget=budget)), 'y')
+        self.assertEqual(str(Factory('(λx.x) (λy.y)').evalE(budget=budget)), '(λy.y)')
+        self.assertEqual(str(Factory('(λx.x) (λy.y)').evalN(budget=budget, backend='compiled')), '(λy.y)')
+
+    def test_single_substitution(self):
+        # the step doesn't finish: the copies of the argument already exceed the budget
+        redex = Factory('(λx.((((x x) x) x) x)) (λy.((y y) (y y)))')
+        meter = Meter(Budget(nodes=20))
+        with self.assertRaises(BudgetExceeded) as caught:
+            redex.reduce(meter)
+        self.assertLessEqual(caught.exception.stats['nodes'], 30)
+        with self.assertRaises(BudgetExceeded):
+            redex.goto_normal_form(budget=Budget(nodes=20))
+
+    def test_memory_without_reset_peak(self):
+        # before Python 3.9, a peak reached before the meter is ignored
+        tracemalloc.start()
+        try:
+            waste = bytearray(10 ** 6)
+            del waste
+            reset_peak = tracemalloc.reset_peak
+            del tracemalloc.reset_peak
+            try:
+                meter = Meter(Budget(memory=10 ** 5))
+            finally:
+                tracemalloc.reset_peak = reset_peak
+            meter.check(1)
+            self.assertLess(meter.stats()['memory'], 10 ** 5)
+        finally:
+            tracemalloc.stop()
+
+    def test_meter_stats(self):
+        meter = Meter(Budget(nodes=10))
+        meter.check(3, 7)
+        stats = meter.stats()
+        self.assertEqual((stats['steps'], stats['nodes'], stats['memory']), (3, 7, None))
+        meter.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from lamedh.cache import ResultCache
+from lamedh.expr import Expr, StopEvaluation
+
+Factory = Expr.from_string
+
+EXPR = '(λx.(x x)) ((λy.y) (λz.z))'
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache()
+
+    def test_same_result_than_without_cache(self):
+        for operation in ['goto_normal_form', 'evalN', 'evalE']:
+            expected = getattr(Factory(EXPR), operation)()
+            for _ in range(2):
+                result = getattr(Factory(EXPR), operation)(cache=self.cache)
+                self.assertEqual(str(result), str(expected))
+        self.assertEqual(self.cache.hits, 3)
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_alpha_equivalent_expressions_keep_their_names(self):
+        Factory('(λa.(a a)) ((λb.b) (λc.c))').evalN(cache=self.cache)
+        result = Factory(EXPR).evalN(cache=self.cache)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(str(result), '(λz.z)')
+
+    def test_results_are_copies(self):
+        first = Factory(EXPR).goto_normal_form(cache=self.cache)
+        first.rename('w')
+        second = Factory(EXPR).goto_normal_form(cache=self.cache)
+        self.assertEqual(str(second), '(λz.z)')
+
+    def test_keyed_by_operation_and_backend(self):
+        Factory(EXPR).evalN(cache=self.cache)
+        Factory(EXPR).evalE(cache=self.cache)
+        Factory(EXPR).evalN(cache=self.cache, backend='krivine')
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_fewer_steps_than_cached_run_again(self):
+        Factory(EXPR).evalN(max_steps=25, cache=self.cache)
+        Factory(EXPR).evalN(max_steps=100, cache=self.cache)
+        self.assertEqual(self.cache.hits, 1)
+        with self.assertRaises(StopEvaluation):
+            Factory(EXPR).evalN(max_steps=3, cache=self.cache)
+
+    def test_unfinished_reductions_are_not_cached(self):
+        omega = '(λx.(x x)) (λx.(x x))'
+        Factory(omega).goto_normal_form(max_steps=5, cache=self.cache)
+        self.assertEqual(len(self.cache.entries), 0)
+
+    def test_least_recently_used_are_discarded(self):
+        cache = ResultCache(maxsize=2)
+        for txt in ['(λx.x) a', '(λx.x) b', '(λx.x) a', '(λx.x) c']:
+            Factory(txt).goto_normal_form(cache=cache)
+        self.assertEqual(len(cache.entries), 2)
+        Factory('(λx.x) a').goto_normal_form(cache=cache)
+        self.assertEqual(cache.hits, 2)
+
+    def test_results_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            Factory(EXPR).goto_normal_form(cache=ResultCache(directory=directory))
+            other_session = ResultCache(directory=directory)
+            result = Factory(EXPR).goto_normal_form(cache=other_session)
+            self.assertEqual(other_session.hits, 1)
+            self.assertEqual(str(result), '(λz.z)')
+
+
+if __name__ == '__main__':
+    unittest.main()
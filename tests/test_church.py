@@ -0,0 +1,125 @@
+import unittest
+from lamedh.expr import Expr
+from lamedh.expr.church import Church, Combinator, recognize
+from lamedh.expr.debruijn import to_debruijn
+from lamedh.expr.nbe import Normalizer, normalize
+
+Factory = Expr.from_string
+
+TRUE = '(λx.λy.x)'
+FALSE = '(λx.λy.y)'
+SUC = '(λn.λf.λx.(f ((n f) x)))'
+PLUS = '(λm.λn.λf.λx.((m f) ((n f) x)))'
+MULT = '(λm.λn.λf.(m (n f)))'
+PRED = '(λn.λf.λx.(((n (λg.λh.(h (g f)))) (λu.x)) (λu.u)))'
+ISZERO = '(λn.((n (λx.λt.λf.f)) (λt.λf.t)))'
+NOT = '(λb.λx.λy.((b y) x))'
+AND = '(λb.λc.λx.λy.((b ((c x) y)) y))'
+OR = '(λb.λc.λx.λy.((b x) ((c x) y)))'
+IF = '(λb.λx.λy.((b x) y))'
+OMEGA = '((λx.(x x)) (λx.(x x)))'
+Y = '(λf.((λx.(f (x x))) (λx.(f (x x)))))'
+
+
+def numeral(n):
+    return '(λf.λx.%s)' % ('(f ' * n + 'x' + ')' * n)
+
+
+class TestRecognize(unittest.TestCase):
+
+    def recognize(self, txt):
+        return recognize(to_debruijn(Factory(txt)), Normalizer())
+
+    def test_numerals_and_booleans(self):
+        self.assertEqual(self.recognize(numeral(3)).value, 3)
+        self.assertEqual(self.recognize(numeral(0)).value, 0)
+        self.assertIs(self.recognize(TRUE).value, True)
+        self.assertIsInstance(self.recognize(FALSE), Church)
+
+    def test_combinators_modulo_alpha(self):
+        combinator = self.recognize('(λa.λb.λc.((a b) c))')
+        self.assertIsInstance(combinator, Combinator)
+        self.assertEqual(combinator.name, 'if')
+        self.assertIsNone(self.recognize('(λa.λb.((a b) b))'))
+
+
+class TestNativeNormalization(unittest.TestCase):
+
+    def assertSameNormalForm(self, txt, max_steps=1000):
+        native, _ = normalize(Factory(txt), max_steps=max_steps)
+        pure, _ = normalize(Factory(txt), max_steps=max_steps, natives=False)
+        # the same names too
+        self.assertEqual(str(native), str(pure))
+        return native
+
+    def test_arithmetic(self):
+        self.assertEqual(self.assertSameNormalForm(f'{SUC} {numeral(2)}'), Factory(numeral(3)))
+        self.assertEqual(self.assertSameNormalForm(f'({PLUS} {numeral(2)}) {numeral(3)}'),
+                         Factory(numeral(5)))
+        self.assertEqual(self.assertSameNormalForm(f'({MULT} {numeral(2)}) {numeral(3)}'),
+                         Factory(numeral(6)))
+        self.assertEqual(self.assertSameNormalForm(f'{PRED} {numeral(0)}'), Factory(numeral(0)))
+        self.assertEqual(self.assertSameNormalForm(f'{ISZERO} {numeral(0)}'), Factory(TRUE))
+        self.assertEqual(self.assertSameNormalForm(f'{ISZERO} {numeral(2)}'), Factory(FALSE))
+
+    def test_logic(self):
+        self.assertEqual(self.assertSameNormalForm(f'{NOT} {TRUE}'), Factory(FALSE))
+        self.assertEqual(self.assertSameNormalForm(f'({AND} {TRUE}) {FALSE}'), Factory(FALSE))
+        self.assertEqual(self.assertSameNormalForm(f'({OR} {FALSE}) {TRUE}'), Factory(TRUE))
+        self.assertEqual(self.assertSameNormalForm(f'(({IF} {FALSE}) a) b'), Factory('b'))
+
+    def test_names_of_the_lambda_terms(self):
+        two = '(λs.λz.(s (s z)))'
+        for txt in [f'(λa.λg.λy.(g ((a g) y))) {two}', f'((λm.λn.λf.λx.((m f) ((n f) x))) {two}) {two}',
+                    f'((λp.λq.λg.(p (q g))) {two}) {two}', f'((λp.λq.λg.(p (q g))) {numeral(0)}) {two}',
+                    f'(λn.λf.λx.(((n (λg.λh.(h (g f)))) (λu.x)) (λu.u))) {two}',
+                    f'(λn.((n (λa.λb.λc.c)) (λd.λe.d))) {two}', f'(λn.((n (λa.λb.λc.c)) (λd.λe.d))) {numeral(0)}',
+                    f'(λb.λp.λq.((b q) p)) {TRUE}', f'((λb.λc.λp.λq.((b ((c p) q)) q)) {TRUE}) {TRUE}',
+                    f'((λb.λc.λp.λq.((b p) ((c p) q))) {FALSE}) {FALSE}']:
+            self.assertSameNormalForm(txt)
+
+    def test_same_as_named_backend(self):
+        txt = f'(({IF} ({ISZERO} ({PRED} {numeral(1)}))) ({SUC} {numeral(1)})) z'
+        named = Factory(txt).goto_normal_form(max_steps=200)
+        self.assertEqual(Factory(txt).goto_normal_form(max_steps=200, backend='nbe'), named)
+
+    def test_arguments_not_natively_handled(self):
+        # the combinators behave like the lambda they stand for
+        self.assertSameNormalForm(f'{SUC} a')
+        self.assertSameNormalForm(f'({AND} {TRUE}) {numeral(3)}')
+        self.assertSameNormalForm(f'{NOT} (λx.x)')
+        self.assertSameNormalForm(f'({PLUS} {numeral(2)})')
+        self.assertSameNormalForm(f'{numeral(3)} g')
+        self.assertSameNormalForm(MULT)
+
+    def test_partially_applied_values_are_not_numerals(self):
+        # (3 FALSE) a is λy.y, not the numeral 0
+        txt = f'({MULT} (({numeral(3)} {FALSE}) a)) {numeral(3)}'
+        self.assertEqual(self.assertSameNormalForm(txt), Factory(numeral(3)))
+
+    def test_arguments_not_needed_are_not_evaluated(self):
+        self.assertEqual(self.assertSameNormalForm(f'({AND} {FALSE}) {OMEGA}'), Factory(FALSE))
+        self.assertEqual(self.assertSameNormalForm(f'({MULT} {numeral(0)}) {OMEGA}'),
+                         Factory(numeral(0)))
+        self.assertEqual(self.assertSameNormalForm(f'(({IF} {TRUE}) a) {OMEGA}'), Factory('a'))
+
+    def test_numerals_bigger_than_max_steps_are_left_to_lambda_terms(self):
+        result = self.assertSameNormalForm(f'({MULT} {numeral(12)}) {numeral(12)}', max_steps=100)
+        self.assertEqual(result, Factory(numeral(144)))
+
+    def test_fewer_steps(self):
+        txt = f'({MULT} {numeral(20)}) {numeral(20)}'
+        native, native_steps = normalize(Factory(txt), max_steps=10000)
+        pure, pure_steps = normalize(Factory(txt), max_steps=10000, natives=False)
+        self.assertEqual(native, pure)
+        self.assertLess(native_steps, pure_steps)
+
+    def test_recursion(self):
+        fact = (f'{Y} (λr.λn.((({IF} ({ISZERO} n)) {numeral(1)}) '
+                f'(({MULT} n) (r ({PRED} n)))))')
+        result, _ = normalize(Factory(f'({fact}) {numeral(4)}'), max_steps=10000)
+        self.assertEqual(result, Factory(numeral(24)))
+
+
+if __name__ == '__main__':
+    unittest.main()
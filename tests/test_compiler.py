@@ -0,0 +1,136 @@
+import unittest
+from lamedh.compiler import compile_expr, evaluate, trampoline, NORMAL, EAGER, Run
+from lamedh.expr import Expr, StopEvaluation, CantEvalException
+from lamedh.expr.applicative import Error, TypeError
+from lamedh.visitors import EvalNormalVisitor, EvalEagerVisitor
+
+from tests.test_machines import EXPRESSIONS
+from tests.test_applicative import FACT
+
+Factory = Expr.from_string
+
+
+class TestCompiledEvaluation(unittest.TestCase):
+
+    def check_same_as_visitor(self, strategy, visitor_class):
+        for txt in EXPRESSIONS:
+            visitor = visitor_class(max_steps=100)
+            try:
+                expected = str(visitor.visit(Factory(txt), ''))
+            except (CantEvalException, StopEvaluation) as e:
+                expected = type(e)
+            expr = Factory(txt)
+            run = Run(expr, max_steps=100)
+            try:
+                result = str(trampoline(compile_expr(expr, strategy), None, run).readback())
+            except (CantEvalException, StopEvaluation) as e:
+                result = type(e)
+            self.assertEqual(result, expected, txt)
+            if isinstance(result, str):
+                self.assertEqual(run.steps, visitor.steps, txt)
+
+    def test_call_by_name_same_results_and_steps_than_visitor(self):
+        self.check_same_as_visitor(NORMAL, EvalNormalVisitor)
+
+    def test_call_by_value_same_results_and_steps_than_visitor(self):
+        self.check_same_as_visitor(EAGER, EvalEagerVisitor)
+
+    def test_eval_backends(self):
+        expr = Factory(EXPRESSIONS[1])
+        self.assertEqual(str(expr.evalN(100, backend='compiled')), str(expr.evalN(100)))
+        self.assertEqual(str(expr.evalE(100, backend='compiled')), str(expr.evalE(100)))
+
+    def test_code_is_shared_by_alpha_equivalent_expressions(self):
+        a = Factory('(λx.(x x)) (λy.y)')
+        b = Factory('(λa.(a a)) (λb.b)')
+        self.assertIs(compile_expr(a, NORMAL), compile_expr(b, NORMAL))
+        self.assertIsNot(compile_expr(a, NORMAL), compile_expr(a, EAGER))
+        # results keep the names of each expression
+        self.assertEqual(str(evaluate(a, NORMAL)), '(λy.y)')
+        self.assertEqual(str(evaluate(b, NORMAL)), '(λb.b)')
+
+    def test_result_with_environment(self):
+        result = Factory('(λx.λy.(x y)) (λz.z)').evalN(backend='compiled')
+        self.assertEqual(str(result), '(λy.((λz.z) y))')
+
+    def test_max_steps(self):
+        omega = Factory('(λx.(x x)) (λx.(x x))')
+        # runs in constant Python stack
+        with self.assertRaises(StopEvaluation):
+            omega.evalN(3000, backend='compiled')
+        with self.assertRaises(StopEvaluation):
+            omega.evalE(3000, backend='compiled')
+
+    def test_free_variable_fails(self):
+        with self.assertRaises(CantEvalException):
+            Factory('(λx.y) z').evalN(backend='compiled')
+        with self.assertRaises(CantEvalException):
+            Factory('(λx.x) z').evalE(backend='compiled')
+
+
+FIB = 'letrec fib := λn.(if (n < 2) then n else ((fib (n - 1)) + (fib (n - 2)))) in (fib %s)'
+EVEN = ('letrec even := λn.(if (n == 0) then true else (odd (n - 1))), '
+        'odd := λn.(if (n == 0) then false else (even (n - 1))) in %s')
+
+
+class TestCompiledApplicative(unittest.TestCase):
+
+    def assertSameAsVisitor(self, txt, max_steps=1000):
+        for method in ['evalN', 'evalE']:
+            expected = getattr(Factory(txt), method)(max_steps)
+            result = getattr(Factory(txt), method)(max_steps, backend='compiled')
+            self.assertEqual(str(result), str(expected), (method, txt))
+
+    def test_operations(self):
+        for txt in ['(2 * 3) + 1', '- 5', 'not (1 != 1)', 'false and error', 'true or (1 / 0 == 1)',
+                    'if (1 < 2) then (λx.(x + 1)) else 0', '(λx.1) error']:
+            self.assertSameAsVisitor(txt)
+
+    def test_errors(self):
+        self.assertIsInstance(Factory('1 / 0').evalE(backend='compiled'), Error)
+        for txt in ['true + 1', 'if 1 then 2 else 3', '5 3', '<1, 2>.2', 'let <a, b> := 3 in a']:
+            self.assertIsInstance(Factory(txt).evalN(backend='compiled'), TypeError, txt)
+            self.assertIsInstance(Factory(txt).evalE(backend='compiled'), TypeError, txt)
+
+    def test_tuples_and_let(self):
+        for txt in ['<1 + 1, true>', '<1, <2, 3 * 3>>.1.1', '<1, error>.0', 'let x := error in 1',
+                    'let <a, <b, c>> := <1, <2, 3>> in (a + (b * c))', 'let <a, b> := <(λx.x) 1, 2> in <b, a>',
+                    '((λy.(let x := y in (λy.(x + y)))) 3) 4']:
+            self.assertSameAsVisitor(txt)
+
+    def test_recursion(self):
+        for txt in [f'{FACT} 5', FACT, f'(λx.{FACT}) 3', EVEN % '(even 7)', EVEN % 'even',
+                    'letrec f := λf.(f + 1) in (f 1)', '(λx.(letrec f := λn.(x + n) in f)) 10', 'rec (λf.3)']:
+            self.assertSameAsVisitor(txt)
+
+    def test_recursion_steps_are_linear_in_calls(self):
+        # each call of fib takes a bounded number of steps, unfolding the letrec is not needed
+        steps = []
+        for n in [10, 15]:
+            run = Run(Factory(FIB % n), max_steps=10 ** 6)
+            result = trampoline(compile_expr(run.root, EAGER), None, run).readback()
+            steps.append(run.steps)
+        self.assertEqual(str(result), '610')
+        calls = [177, 1973]  # calls to fib, computing fib 10 and fib 15
+        self.assertEqual(steps[1] * calls[0], steps[0] * calls[1])
+
+    def test_deep_recursion(self):
+        # recursive calls in tail position don't grow the Python stack
+        countdown = 'letrec f := λn.(if (n == 0) then 0 else (f (n - 1))) in (f 20000)'
+        self.assertEqual(str(Factory(countdown).evalE(10 ** 6, backend='compiled')), '0')
+
+
+    def test_deep_expressions(self):
+        depth = 5000
+        numeral = '(λf.λx.%s)' % ('f (' * depth + 'x' + ')' * depth)
+        nested = '(' * depth + 'λx.x' + ' (λy.y))' * depth
+        for method in ['evalN', 'evalE']:
+            evaluate = lambda txt: getattr(Factory(txt), method)(10 ** 6, backend='compiled')
+            self.assertEqual(evaluate(numeral).size(), 2 * depth + 3)
+            self.assertEqual(str(evaluate(f'{numeral} (λy.y) (λz.z)')), '(λz.z)')
+            self.assertEqual(str(evaluate(nested)), '(λy.y)')
+            self.assertEqual(str(evaluate(' + '.join(['1'] * depth))), str(depth))
+
+
+if __name__ == '__main__':
+    unittest.main()
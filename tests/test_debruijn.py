@@ -0,0 +1,74 @@
+import unittest
+from lamedh.expr import Expr, Lam
+from lamedh.expr.debruijn import to_debruijn, from_debruijn, Abs, Apply, Bound, Free
+
+Factory = Expr.from_string
+
+
+class TestConversion(unittest.TestCase):
+
+    def test_indices(self):
+        term = to_debruijn(Factory('λx.λy.(x (y z))'))
+        self.assertIsInstance(term, Abs)
+        inner = term.body.body
+        self.assertIsInstance(inner, Apply)
+        self.assertEqual(inner.operator.index, 1)
+        self.assertEqual(inner.operand.operator.index, 0)
+        self.assertIsInstance(inner.operand.operand, Free)
+
+    def test_inner_lambda_binds_stronger(self):
+        term = to_debruijn(Factory('λx.λx.x'))
+        self.assertIsInstance(term.body.body, Bound)
+        self.assertEqual(term.body.body.index, 0)
+
+    def test_round_trip_keeps_names(self):
+        for txt in ['(λx.(λy.(x (y z))))', '((λf.(f f)) (λa.a))', '(λx.(λx.x))']:
+            self.assertEqual(str(from_debruijn(to_debruijn(Factory(txt)))), txt)
+
+    def test_readback_renames_to_avoid_capture(self):
+        # λx.λx.<outer x> has no named form that keeps both names
+        term = Abs('x', Abs('x', Bound(1)))
+        self.assertEqual(str(from_debruijn(term)), '(λx.(λx1.x))')
+        term = Abs('z', Free('z'))
+        self.assertEqual(str(from_debruijn(term)), '(λz1.z)')
+
+
+class TestReductions(unittest.TestCase):
+
+    def test_goto_normal_form_same_as_named(self):
+        txt = '((λf.λx.(f (f x))) (λz.λx.λy.((z y) x))) (λz.λw.z)'
+        named = Factory(txt).goto_normal_form(max_steps=100)
+        nameless = Factory(txt).goto_normal_form(max_steps=100, backend='debruijn')
+        self.assertTrue(nameless.is_normal_form())
+        # same term, but the nameless backend never needed to rename x
+        self.assertEqual(str(named), '(λx1.(λy.x1))')
+        self.assertEqual(str(nameless), '(λx.(λy.x))')
+
+    def test_substitution_does_not_capture(self):
+        reduced = Factory('(λz.λw.(z w)) (w a)').goto_normal_form(backend='debruijn')
+        self.assertEqual(str(reduced), '(λw1.((w a) w1))')
+
+    def test_max_steps(self):
+        omega = Factory('(λx.(x x)) (λx.(x x))')
+        reduced = omega.goto_normal_form(max_steps=10, backend='debruijn')
+        self.assertEqual(str(reduced), str(omega))
+
+    def test_goto_canonical(self):
+        expr = Factory('(λx.x) ((λy.y) (λz.z))')
+        self.assertEqual(str(expr.goto_canonical(backend='debruijn')), '(λz.z)')
+
+    def test_deep_terms(self):
+        depth = 5000
+        numeral = 'λf.λx.' + 'f (' * depth + 'x' + ')' * depth
+        expr = Factory('(λn.λf.λx.f (n f x)) (%s)' % numeral)
+        self.assertEqual(expr.goto_normal_form(max_steps=10, backend='debruijn').size(), 2 * depth + 5)
+        self.assertEqual(str(from_debruijn(to_debruijn(Factory(numeral)))), str(Factory(numeral)))
+        self.assertIsInstance(expr.goto_canonical(backend='debruijn'), Lam)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Factory('x').goto_normal_form(backend='yadda')
+
+
+if __name__ == '__main__':
+    unittest.main()
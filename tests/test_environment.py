@@ -0,0 +1,60 @@
+import unittest
+from lamedh.environment import Environment
+from lamedh.expr import Expr
+
+Factory = Expr.from_string
+
+
+class TestEnvironment(unittest.TestCase):
+
+    def setUp(self):
+        self.env = Environment(hidden=['_'])
+        self.env['a'] = Factory('λx.x')
+        self.env['b'] = Factory('λy.y')
+        self.env['c'] = Factory('a b')
+
+    def test_definitions_are_kept_as_written(self):
+        self.assertEqual(str(self.env['c']), '(a b)')
+        self.assertIs(self.env.definitions['c'].references['a'], self.env.definitions['a'])
+
+    def test_unfold(self):
+        self.assertEqual(str(self.env.unfold('c')), '((λx.x) (λy.y))')
+        self.assertEqual(str(self.env.unfold_expr(Factory('c z'))), '(((λx.x) (λy.y)) z)')
+        # the definitions are not changed by unfolding nor by what's done with the unfolded tree
+        self.env.unfold('c').goto_normal_form()
+        self.assertEqual(str(self.env['c']), '(a b)')
+        self.assertEqual(str(self.env['a']), '(λx.x)')
+
+    def test_redefining_keeps_the_old_references(self):
+        self.env['a'] = Factory('λz.(z z)')
+        self.assertEqual(str(self.env.unfold('c')), '((λx.x) (λy.y))')
+        self.assertFalse(self.env.is_current('c'))
+        self.assertTrue(self.env.is_current('a'))
+        del self.env['b']
+        self.assertEqual(str(self.env.unfold('c')), '((λx.x) (λy.y))')
+
+    def test_self_reference_is_the_previous_definition(self):
+        self.env['a'] = Factory('a a')
+        self.assertEqual(str(self.env.unfold('a')), '((λx.x) (λx.x))')
+
+    def test_unfolding_avoids_captures(self):
+        self.env['k'] = Factory('λq.y')
+        self.env['d'] = Factory('λy.k y')
+        self.assertEqual(str(self.env.unfold('d')), '(λy1.((λq.y) y1))')
+
+    def test_hidden_names_are_not_referred(self):
+        self.env['_'] = Factory('λw.w')
+        self.env['e'] = Factory('_ a')
+        self.assertEqual(str(self.env.unfold('e')), '(_ (λx.x))')
+
+    def test_memory_grows_with_the_source(self):
+        # each layer uses the previous one twice, unfolded sizes double
+        self.env['l0'] = Factory('λx.x')
+        for i in range(1, 40):
+            self.env['l%s' % i] = Factory('l%s l%s' % (i - 1, i - 1))
+        self.assertEqual(sum(self.env[name].size() for name in self.env if name.startswith('l')), 3 * 39 + 2)
+        self.assertEqual(self.env.unfold('l10').size(), 2 ** 10 * 2 + 2 ** 10 - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
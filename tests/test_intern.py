@@ -0,0 +1,70 @@
+import unittest
+from lamedh.expr import Expr, Var, Lam, App
+from lamedh.expr.applicative import LetIn
+
+Factory = Expr.from_string
+
+
+class TestAlphaKeys(unittest.TestCase):
+
+    def test_alpha_equivalent_expressions_share_key(self):
+        a = Factory('λx.λy.(x (y z))')
+        b = Factory('λa.λb.(a (b z))')
+        self.assertIs(a.alpha_key(), b.alpha_key())
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(a.alpha_digest(), b.alpha_digest())
+
+    def test_subexpressions_are_shared(self):
+        a = Factory('(λx.x) (λy.y)')
+        self.assertIs(a.operator.alpha_key(), a.operand.alpha_key())
+
+    def test_free_variables_are_not_renamed(self):
+        self.assertNotEqual(Factory('λx.y'), Factory('λx.z'))
+        self.assertNotEqual(Factory('λx.y'), Factory('λy.y'))
+        self.assertNotEqual(Factory('λx.λy.x'), Factory('λx.λy.y'))
+        self.assertNotEqual(Var('x'), Lam('x', Var('x')))
+
+    def test_inner_lambda_binds_stronger(self):
+        self.assertEqual(Factory('λx.λx.x'), Factory('λy.λx.x'))
+        self.assertNotEqual(Factory('λx.λx.x'), Factory('λx.λy.x'))
+
+    def test_digest_is_stable(self):
+        # digests identify expressions outside the process, they must not change
+        self.assertEqual(Factory('λx.x').alpha_digest(), '4b1c6ec555062d0cfa77c298cab4b241')
+
+    def test_key_is_updated_after_reduce(self):
+        expr = Factory('λa.((λx.x) a)')
+        self.assertNotEqual(expr, Factory('λb.b'))
+        expr.body.reduce()
+        self.assertEqual(expr, Factory('λb.b'))
+
+    def test_key_is_updated_after_rename(self):
+        expr = Factory('λa.(a b)')
+        expr.body.operand.rename('c')
+        self.assertEqual(expr, Factory('λa.(a c)'))
+
+    def test_expressions_in_sets(self):
+        exprs = {Factory('λx.x'), Factory('λy.y'), Factory('λx.λy.x')}
+        self.assertEqual(len(exprs), 2)
+        self.assertIn(Factory('λz.z'), exprs)
+
+    def test_applicative_expressions(self):
+        self.assertEqual(Factory('λx.(x + 1)'), Factory('λy.(y + 1)'))
+        self.assertNotEqual(Factory('λx.(x + 1)'), Factory('λx.(x * 1)'))
+        self.assertNotEqual(Factory('λx.(x + 1)'), Factory('λx.(x + 2)'))
+
+    def test_names_bound_by_let(self):
+        def let(name, value, body):
+            return LetIn([(Var(name), value)], body)
+        # x in the body is the one bound by let, not by the lambda
+        a = Lam('x', let('x', Var('x'), Var('x')))
+        b = Lam('z', let('x', Var('z'), Var('x')))
+        c = Lam('z', let('x', Var('x'), Var('z')))
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(b, c)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,69 +1,133 @@
 import unittest
-from lamedh.expr import Expr, Var, Lam, App
+from unittest.mock import patch
+
+from lamedh.expr import Expr, Var, Lam, App, StopEvaluation, CantEvalException
 
 Factory = Expr.from_string
 
 
 class TestFreeVars(unittest.TestCase):
+
+    def free_ids(self, expr):
+        # the very nodes: equal Var nodes (with the same name) are different occurrences
+        return sorted(map(id, expr.get_free_vars()))
+
+    def assertFreeVars(self, expr, expected):
+        self.assertEqual(self.free_ids(expr), sorted(map(id, expected)))
+
     def test_var(self):
         e = Var('x')
-        self.assertEqual(e.get_free_vars(), {e})
+        self.assertFreeVars(e, [e])
 
     def test_lambda_identity_is_closed(self):
         e = Lam('x', Var('x'))
-        self.assertEqual(e.get_free_vars(), set())
+        self.assertFreeVars(e, [])
 
     def test_lambda_simple(self):
         y = Var('y')
         e = Lam('x', y)
-        self.assertEqual(e.get_free_vars(), {y})
+        self.assertFreeVars(e, [y])
 
     def test_nested_var_in_app(self):
         v0 = Var('x')
         v1 = Var('a')
         e2 = App(v1, v0)
         e3 = Lam('x', e2)
-        self.assertEqual(e3.get_free_vars(), {v1})
-        self.assertEqual(e2.get_free_vars(), {v0, v1})
+        self.assertFreeVars(e3, [v1])
+        self.assertFreeVars(e2, [v0, v1])
 
     def test_application_of_vars(self):
         x, z = Var('x'), Var('z')
         e1 = App(x, z)
-        self.assertEqual(e1.get_free_vars(), {x, z})
+        self.assertFreeVars(e1, [x, z])
         m1, m2 = Var('m'), Var('m')
         e2 = App(m1, m2)
-        self.assertEqual(e2.get_free_vars(), {m1, m2})
+        self.assertFreeVars(e2, [m1, m2])
 
     def test_lambda_of_apps_binds_both_branches(self):
         m1, m2 = Var('m'), Var('m')
         e = App(m1, m2)
         lam = Lam('m', e)
-        self.assertEqual(lam.get_free_vars(), set())
+        self.assertFreeVars(lam, [])
 
     def test_nested_var_in_lambda(self):
         e0 = Var('x')
         e1 = Lam('A', e0)
         e2 = Lam('B', e1)
         # neither e1 nor e2 bound "x" from e0
-        self.assertIn(e0, e1.get_free_vars())
-        self.assertIn(e0, e2.get_free_vars())
+        self.assertIn(id(e0), self.free_ids(e1))
+        self.assertIn(id(e0), self.free_ids(e2))
         e3 = Lam('x', e2)
         # e3 bound "x" from e0
-        self.assertNotIn(e0, e3.get_free_vars())
+        self.assertNotIn(id(e0), self.free_ids(e3))
 
     def test_nested_var_in_app_deep(self):
         e0 = Var('x')
         e1 = App(Var('A'), e0)
         e2 = App(Var('B'), e1)
         # neither e1 nor e2 bound "x" from e0
-        self.assertIn(e0, e1.get_free_vars())
-        self.assertIn(e0, e2.get_free_vars())
+        self.assertIn(id(e0), self.free_ids(e1))
+        self.assertIn(id(e0), self.free_ids(e2))
         e3 = App(Var('x'), e2)
         # still free
-        self.assertIn(e0, e3.get_free_vars())
+        self.assertIn(id(e0), self.free_ids(e3))
         e4 = Lam('x', e3)
         # e4 bound "x" from e0
-        self.assertNotIn(e0, e4.get_free_vars())
+        self.assertNotIn(id(e0), self.free_ids(e4))
+
+    def test_free_var_names(self):
+        for txt in ['λx.(x (y (λy.(y z))))', 'λx.((x y) (λy.(y z)))']:
+            e = Factory(txt)
+            self.assertEqual(e.free_var_names(), {'y', 'z'})
+            self.assertEqual(e.body.free_var_names(), {'x', 'y', 'z'})
+            # computed once, then cached
+            self.assertIs(e.free_var_names(), e.free_var_names())
+
+    def test_free_var_names_updated_after_replace_child(self):
+        e = Factory('λx.(x y)')
+        self.assertEqual(e.free_var_names(), {'y'})
+        e.body.replace_child(e.body.operand, Var('w'))
+        self.assertEqual(e.free_var_names(), {'w'})
+        self.assertEqual(e.body.free_var_names(), {'x', 'w'})
+        app = App(Var('x'), Var('y'))
+        e = Lam('x', app)
+        app.replace_child(app.operand, Var('z'))
+        self.assertEqual(e.free_var_names(), {'z'})
+
+    def test_free_var_names_updated_after_rename(self):
+        e = Factory('λx.(x y)')
+        self.assertEqual(e.free_var_names(), {'y'})
+        e.body.operand.rename('w')
+        self.assertEqual(e.free_var_names(), {'w'})
+        e.rename('z')
+        self.assertEqual(e.free_var_names(), {'w'})
+        self.assertEqual(e.body.free_var_names(), {'z', 'w'})
+        y = Var('y')
+        e = Lam('x', App(Var('x'), y))
+        y.rename('w')
+        self.assertEqual(e.free_var_names(), {'w'})
+        self.assertFreeVars(e, [y])
+
+    def test_free_var_names_updated_after_reduce(self):
+        e = Factory('λa.((λx.(x b)) c)')
+        self.assertEqual(e.free_var_names(), {'b', 'c'})
+        e.body.reduce()
+        self.assertEqual(str(e), '(λa.(c b))')
+        self.assertEqual(e.free_var_names(), {'b', 'c'})
+        e = Factory('λa.((λx.a) c)')
+        self.assertEqual(e.free_var_names(), {'c'})
+        e.body.reduce()
+        self.assertEqual(e.free_var_names(), set())
+        e = Factory('λx.((λy.(y a)) b)')
+        e.get_innermost_redex().reduce()
+        self.assertEqual(str(e), '(λx.(b a))')
+        self.assertEqual(e.free_var_names(), {'a', 'b'})
+        e.replace_child(e.body, Var('x'))
+        self.assertEqual(e.free_var_names(), set())
+
+    def test_clone_keeps_free_var_names(self):
+        e = Factory('λx.(x y)')
+        self.assertEqual(e.clone().free_var_names(), {'y'})
 
 
 class TestRenames(unittest.TestCase):
@@ -105,6 +169,27 @@ class TestRenames(unittest.TestCase):
         self.assertEqual(str(expr), '(λT.(T (y (λx.x))))')
 
 
+class TestClone(unittest.TestCase):
+
+    def test_clone_is_a_new_tree(self):
+        expr = Factory('(λx.(x y)) (λz.z)')
+        clone = expr.clone()
+        self.assertEqual(repr(clone), repr(expr))
+        self.assertIsNot(clone.operator, expr.operator)
+        self.assertIs(clone.operator.parent, clone)
+
+    def test_clone_of_subtree_does_not_copy_ancestors(self):
+        expr = Factory('(λx.(x y)) (λz.z)')
+        clone = expr.operator.body.clone()
+        self.assertIsNone(clone.parent)
+        self.assertEqual(str(clone), '(x y)')
+
+    def test_clone_applicative_expressions(self):
+        for txt in ['if a then <1, b> else -c', 'let <x, y>:=<1, 2> in x + y', 'letrec f:=λx.f x in f 1']:
+            expr = Factory(txt)
+            self.assertEqual(repr(expr.clone()), repr(expr))
+
+
 class TestLambdaApply(unittest.TestCase):
 
     def assertStringsEqual(self, o1, o2):
@@ -172,6 +257,35 @@ class TestRedexes(unittest.TestCase):
         reduced = expr.reduce()
         self.assertEqual(str(reduced), '(λz.(λx.(λy.x)))')
 
+    def test_outermost_and_innermost_redex(self):
+        expr = Expr.from_string('(λx.((λy.y) x)) ((λz.z) ((λw.w) a))')
+        redices = expr.get_redices()
+        self.assertEqual(expr.count_redices(), len(redices))
+        self.assertIs(expr.get_outermost_redex(), redices[0])
+        self.assertIs(expr.get_innermost_redex(), redices[-1])
+
+    def test_redex_count_is_updated_after_reduce(self):
+        expr = Expr.from_string('(λx.(x x)) ((λz.z) ((λw.w) a))')
+        self.assertEqual(expr.count_redices(), 3)
+        while expr.count_redices():
+            redex = expr.get_innermost_redex()
+            expr = redex.reduce().goto_root()
+            self.assertEqual(expr.count_redices(), len(expr.get_redices()))
+        self.assertEqual(str(expr), '(a a)')
+        self.assertIsNone(expr.get_outermost_redex())
+
+    def test_reductions_dont_list_all_redices(self):
+        expr = Expr.from_string('(λx.(x x)) ((λz.z) ((λw.w) a))')
+        with patch.object(Expr, 'get_redices', side_effect=AssertionError('walks the whole tree')):
+            self.assertEqual(str(expr.goto_normal_form(backend='named', cache=None)), '(a a)')
+            expr = Expr.from_string('(λx.x) ((λz.z) (λw.w))')
+            self.assertEqual(str(expr.goto_canonical()), '(λw.w)')
+
+    def test_outer_lambda_of_substitution_binds_stronger(self):
+        expr = Expr.from_string('((λx.(λx.x)) J)')
+        reduced = expr.reduce()
+        self.assertEqual(str(reduced), '(λx.x)')
+
     def test_eval_normal_form(self):
         ffx = Expr.from_string('(λf.λx.(f (f x)))')
         zyx = Expr.from_string('λz.λx.λy.((z y) x)')
@@ -180,6 +294,59 @@ class TestRedexes(unittest.TestCase):
         normal_can = expr.evalN(100)
         self.assertTrue(normal_can.is_canonical())
 
+    def test_eval_lazy_same_as_normal(self):
+        for txt in ['(λx.(x x)) (λx.x)',
+                    '((λf.λx.(f (f x))) (λz.λx.λy.((z y) x))) (λz.λw.z)',
+                    '(λx.(x (λy.x))) ((λz.z) (λw.w))',
+                    '(λx y.x) (λa.a) ((λx.x x) (λx.x x))']:
+            expr = Expr.from_string(txt)
+            self.assertEqual(str(expr.evalL(100)), str(expr.evalN(100)))
+
+    def test_eval_lazy_evaluates_arguments_once(self):
+        expr = Expr.from_string('(λx.((x x) x)) ((λa.a) ((λb.b) (λc.c)))')
+        with self.assertRaises(StopEvaluation):
+            expr.evalN(10)
+        self.assertEqual(str(expr.evalL(10)), '(λc.c)')
+
+    def test_eval_lazy_free_variable_fails(self):
+        with self.assertRaises(CantEvalException):
+            Expr.from_string('(λx.y) z').evalL()
+
+    def test_eval_lazy_applicative_fails(self):
+        for txt in ['1 + 2', 'true', '(λx.x) (if true then 1 else 2)', 'let x := λy.y in x']:
+            with self.assertRaises(CantEvalException):
+                Expr.from_string(txt).evalL()
+        # arguments that are never evaluated can be anything
+        self.assertEqual(str(Expr.from_string('(λx.λy.y) (1 + 2)').evalL()), '(λy.y)')
+
+
+class TestDeepExpressions(unittest.TestCase):
+    # deeper than the recursion limit
+    DEPTH = 5000
+
+    def setUp(self):
+        body = Var('x')
+        for _ in range(self.DEPTH):
+            body = App(Var('f'), body)
+        self.numeral = Lam('f', Lam('x', body))
+
+    def test_print(self):
+        self.assertEqual(len(str(self.numeral)), 4 * self.DEPTH + 11)
+        self.assertTrue(repr(self.numeral).startswith('Lam(λf.Lam(λx.App(<Var:f> App('))
+
+    def test_free_and_bound_vars(self):
+        self.assertEqual(self.numeral.get_free_vars(), [])
+        self.assertEqual(len(self.numeral.bound_var_occurrence()), self.DEPTH)
+        self.numeral.rename('g')
+        self.assertTrue(str(self.numeral).startswith('(λg.(λx.(g (g '))
+
+    def test_substitute_and_redices(self):
+        applied = App(self.numeral, Var('s'))
+        self.assertEqual(len(applied.get_redices()), 1)
+        self.assertEqual(applied.count_redices(), 1)
+        substituted = self.numeral.body.substitute({'f': Var('s')})
+        self.assertTrue(str(substituted).startswith('(λx.(s (s '))
+
 
 if __name__ == '__main__':
     unittest.main()
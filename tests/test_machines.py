@@ -0,0 +1,76 @@
+import unittest
+from lamedh.expr import Expr, StopEvaluation, CantEvalException
+from lamedh.visitors import EvalNormalVisitor, EvalEagerVisitor
+from lamedh.machines import KrivineMachine, CEKMachine
+
+Factory = Expr.from_string
+
+EXPRESSIONS = [
+    '(λx.(x x)) (λx.x)',
+    '((λf.λx.(f (f x))) (λz.λx.λy.((z y) x))) (λz.λw.z)',
+    '(λx.(x (λy.x))) ((λz.z) (λw.w))',
+    '(λx y.x) (λa.a) ((λx.x x) (λx.x x))',
+    '(λx.(λx.(x x))) (λx.x) (λy.y)',
+    '(λm n f x.m f (n f x)) (λf x.f (f x)) (λf x.f x)',
+]
+
+
+class TestKrivineMachine(unittest.TestCase):
+
+    def test_same_results_and_steps_than_visitor(self):
+        for txt in EXPRESSIONS:
+            visitor = EvalNormalVisitor(max_steps=100)
+            expected = visitor.visit(Factory(txt), '')
+            machine = KrivineMachine(max_steps=100)
+            result = machine.run(Factory(txt))
+            self.assertEqual(str(result), str(expected))
+            self.assertEqual(machine.steps, visitor.steps)
+
+    def test_evalN_backend(self):
+        expr = Factory(EXPRESSIONS[1])
+        self.assertEqual(str(expr.evalN(100, backend='krivine')), str(expr.evalN(100)))
+
+    def test_max_steps(self):
+        omega = Factory('(λx.(x x)) (λx.(x x))')
+        with self.assertRaises(StopEvaluation):
+            omega.evalN(1000, backend='krivine')
+
+    def test_free_variable_fails(self):
+        with self.assertRaises(CantEvalException):
+            Factory('(λx.y) z').evalN(backend='krivine')
+
+    def test_does_not_modify_expression(self):
+        expr = Factory(EXPRESSIONS[1])
+        before = repr(expr)
+        expr.evalN(100, backend='krivine')
+        self.assertEqual(repr(expr), before)
+
+
+class TestCEKMachine(unittest.TestCase):
+
+    def test_same_results_and_steps_than_visitor(self):
+        for txt in EXPRESSIONS[:3] + EXPRESSIONS[4:]:
+            visitor = EvalEagerVisitor(max_steps=100)
+            expected = visitor.visit(Factory(txt), '')
+            machine = CEKMachine(max_steps=100)
+            result = machine.run(Factory(txt))
+            self.assertEqual(str(result), str(expected))
+            self.assertEqual(machine.steps, visitor.steps)
+
+    def test_evalE_backend(self):
+        expr = Factory(EXPRESSIONS[1])
+        self.assertEqual(str(expr.evalE(100, backend='cek')), str(expr.evalE(100)))
+
+    def test_operand_is_evaluated_eagerly(self):
+        expr = Factory(EXPRESSIONS[3])  # operand without canonical form is discarded
+        self.assertEqual(str(expr.evalN(100, backend='krivine')), '(λa.a)')
+        with self.assertRaises(StopEvaluation):
+            expr.evalE(1000, backend='cek')
+
+    def test_free_variable_fails(self):
+        with self.assertRaises(CantEvalException):
+            Factory('(λx.x) z').evalE(backend='cek')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from lamedh.expr import Expr, StopEvaluation
+from lamedh.expr.nbe import normalize
+
+Factory = Expr.from_string
+
+TWO = '(λf.λx.(f (f x)))'
+THREE = '(λf.λx.(f (f (f x))))'
+MULT = '(λm.λn.λf.(m (n f)))'
+
+
+class TestNormalizationByEvaluation(unittest.TestCase):
+
+    def test_same_normal_form_than_named(self):
+        for txt in ['(λx.x) Z', '((λf.λx.(f (f x))) (λz.λx.λy.((z y) x))) (λz.λw.z)',
+                    '(λz.λw.(z w)) (w a)', 'λx.((λy.(y x)) (λz.z))', f'({MULT} {TWO}) {THREE}']:
+            named = Factory(txt).goto_normal_form(max_steps=100)
+            nbe = Factory(txt).goto_normal_form(max_steps=100, backend='nbe')
+            self.assertTrue(named.is_normal_form())
+            self.assertEqual(nbe, named)
+
+    def test_keeps_names_when_possible(self):
+        reduced = Factory('(λz.λw.(z w)) (w a)').goto_normal_form(backend='nbe')
+        self.assertEqual(str(reduced), '(λw1.((w a) w1))')
+        reduced = Factory('(λx.λx.x) a').goto_normal_form(backend='nbe')
+        self.assertEqual(str(reduced), '(λx.x)')
+
+    def test_normalizes_if_there_is_a_normal_form(self):
+        # the argument that has no normal form is never evaluated
+        expr = Factory('(λx.y) ((λx.(x x)) (λx.(x x)))')
+        self.assertEqual(str(expr.goto_normal_form(backend='nbe')), 'y')
+
+    def test_arguments_are_normalized_once(self):
+        # the named backend reduces ((λy.y) a) once per occurrence of x
+        _, steps = normalize(Factory('(λx.(x (x x))) ((λy.y) a)'))
+        self.assertEqual(steps, 2)
+
+    def test_max_steps(self):
+        omega = Factory('(λx.(x x)) (λx.(x x))')
+        with self.assertRaises(StopEvaluation):
+            normalize(omega, max_steps=10)
+        # like the other backends, the term reached in max_steps
+        for txt in [str(omega), '(λx.(x x x)) (λx.(x x x))']:
+            for backend in ['named', 'debruijn']:
+                expected = Factory(txt).goto_normal_form(max_steps=10, backend=backend)
+                result = Factory(txt).goto_normal_form(max_steps=10, backend='nbe')
+                self.assertEqual(result, expected)
+
+    def test_long_evaluations(self):
+        omega = Factory('(λx.(x x)) (λx.(x x))')
+        with self.assertRaises(StopEvaluation):
+            normalize(omega, max_steps=5000)
+        self.assertEqual(omega.goto_normal_form(max_steps=5000, backend='nbe'), omega)
+
+    def test_deep_terms(self):
+        depth = 5000
+        numeral = '(λf.λx.%s)' % ('f (' * depth + 'x' + ')' * depth)
+        for natives in [True, False]:
+            reduced, _ = normalize(Factory(f'(λn.λf.λx.(f ((n f) x))) {numeral}'), natives=natives)
+            self.assertEqual(reduced.size(), 2 * depth + 5)
+            reduced, _ = normalize(Factory(f'(λn.((n (λx.x)) z)) {numeral}'), max_steps=2 * depth,
+                                   natives=natives)
+            self.assertEqual(str(reduced), 'z')
+
+    def test_large_church_numerals(self):
+        # 3^5 = 243, read back as a deep term
+        power = Factory(f'(λf.λx.(f (f (f (f (f x)))))) {THREE}')
+        reduced = power.goto_normal_form(max_steps=10000, backend='nbe')
+        body = reduced.body.body
+        depth = 0
+        while body.__class__.__name__ == 'App':
+            body = body.operand
+            depth += 1
+        self.assertEqual(depth, 243)
+
+
+if __name__ == '__main__':
+    unittest.main()
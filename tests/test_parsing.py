@@ -1,10 +1,14 @@
+import random
 import unittest
 
-from lamedh.expr import Var, Lam, App
+from lamedh.expr import Expr, Var, Lam, App
 from lamedh.expr.applicative import (
     BooleanConstant, NaturalConstant, UnaryOp, BinaryOp, IfThenElse, Error, TypeError,
-    Tuple, LetIn, Rec, LetRec)
+    Tuple, Indexing, LetIn, Rec, LetRec)
 from lamedh.parsing.simple import parser  # type: ignore
+from lamedh.parsing.precedence import PrecedenceParser, Ambiguous, parser as precedence_parser  # type: ignore
+from lamedh.parsing.printer import clean_string, Unsupported
+from lamedh.terminal import CleanFormatter
 
 class Parsing(unittest.TestCase):
     def parse(self, expr_str):
@@ -181,6 +185,12 @@ class TestApplicativeParsing(Parsing):
         self.assertTrue(isinstance(expr, Tuple))
         self.assertEqual(str(expr), '<x, (y >= z)>')
 
+    def test_tuple_indexing(self):
+        expr = self.parse('<x, y>.1')
+        self.assertIsInstance(expr, Indexing)
+        self.assertEqual(str(expr), '(<x, y>.1)')
+        self.assertEqual(str(self.parse('f x.0.1')), '(f ((x.0).1))')
+
     def test_local_variable(self):
         loc = 'let x:=8 in x + 1'
         explicit_parenthesis = '(let x:=8 in (x + 1))'
@@ -224,5 +234,180 @@ class TestApplicativeParsing(Parsing):
         self.assertEqual(str(expr), explicit_parenthesis)
 
 
+class PrecedenceParsing(Parsing):
+    def parse(self, expr_str):
+        return precedence_parser.parse(expr_str)
+
+
+class TestPrecedenceParsing(PrecedenceParsing, TestParsing):
+    pass
+
+
+class TestPrecedenceApplicativeParsing(PrecedenceParsing, TestApplicativeParsing):
+    pass
+
+
+class TestSameTreesAsEarley(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = PrecedenceParser(fallback=False)
+
+    def assertSameTree(self, txt):
+        self.assertEqual(repr(self.parser.parse(txt)), repr(parser.parse(txt)), txt)
+
+    def test_precedence(self):
+        for txt in ['a b c', 'a + b * c', 'a + b c', 'a b + c d', '- a + b', 'not a + b', 'a + - b',
+                    'a - - b', 'rec f + 1', 'a + rec b', 'λx.x + 1', 'λx.x y + 1', 'λx.- x + 1',
+                    'f λx.x y', 'a λx.x + b', 'λx y z.x', '/x.x', 'lambda x.x', 'a / b', 'f /x.x',
+                    'x or y', 'a == b + c', 'f - x']:
+            self.assertSameTree(txt)
+
+    def test_constructs(self):
+        for txt in ['if a then b else c + d', 'if a == b then c + d else e', 'λx.if a then b else c + 1',
+                    'if a then b else if c then d else e'.replace('else if', 'else (if') + ')',
+                    'let x := 1, <y, <z, w>> := t in x + y', 'letrec f := λn.n + 1, g := λx.x in f 1',
+                    '(λx.x) (rec λf.λn.if (n == 0) then 1 else n * f (n - 1))']:
+            self.assertSameTree(txt)
+
+    def test_tuples(self):
+        for txt in ['<a, b>', '<a>', '<a, <b, c>>.1.0', 'f <a, b>', 'a < b', '<(a < b), c>',
+                    '<x, y >= z>', '<a, b>.0 < c', 'f (<a, b>).0']:
+            self.assertSameTree(txt)
+
+    def test_printed_expressions(self):
+        for txt in ['(λx.(λy.(x (y z))))', '((a + b) * (- c))', '(let <a, b>:=c in (a b))',
+                    '(letrec f:=λx.(f x), g:=λy.y in (f g))', '(rec (λf.f))', '(<a, b>.0)',
+                    '((not true) or (1 <= 2))']:
+            self.assertSameTree(txt)
+
+    def test_ties_are_left_to_earley(self):
+        # Earley breaks these ties by the order it builds its parse forest
+        for txt in ['a + b + c d', 'f a b.0', 'f rec x', 'x or - y', 'f λx.x λy.y', 'notx',
+                    'if a then b else if c then d else e.0', 'λn.if n == 0 then 1 else 2', '<a > b>',
+                    'f let x := 1 in x']:
+            with self.assertRaises(Ambiguous, msg=txt):
+                self.parser.parse(txt)
+            self.assertEqual(repr(precedence_parser.parse(txt)), repr(parser.parse(txt)), txt)
+        # and the keywords Earley reads as names
+        self.assertEqual(repr(precedence_parser.parse('let x in y')), repr(parser.parse('let x in y')))
+
+    def test_names_starting_with_keywords(self):
+        for txt in ['inc', 'order', 'android', 'inc + 1', 'f inc 1', 'iffy', '(order)']:
+            self.assertSameTree(txt)
+        for txt in ['f order x', 'a orb', 'x andy', 'if iffy then 1 else 2', 'let inc := 1 in inc',
+                    'x * 2 - y λx.z', 'λx.rec false > z * f λx.<a, b>']:
+            with self.assertRaises(Ambiguous, msg=txt):
+                self.parser.parse(txt)
+            self.assertEqual(repr(precedence_parser.parse(txt)), repr(parser.parse(txt)), txt)
+
+    def test_random_texts(self):
+        rnd = random.Random(19)
+        names = ['x', 'y', 'f', 'x1', 'inc', 'order', 'notx', 'iffy', 'android']
+        operators = ['+', '-', '*', '==', '<', '>=', 'and', 'or']
+
+        def text(depth):
+            choice = rnd.random()
+            if depth == 0 or choice < 0.2:
+                return rnd.choice(names + ['1', '2', 'true', 'error'])
+            depth -= 1
+            if choice < 0.3:
+                return '(%s)' % text(depth)
+            if choice < 0.45:
+                return '%s %s' % (text(depth), text(depth))
+            if choice < 0.6:
+                return '%s %s %s' % (text(depth), rnd.choice(operators), text(depth))
+            if choice < 0.7:
+                return 'λ%s.%s' % (rnd.choice('xyf'), text(depth))
+            if choice < 0.75:
+                return rnd.choice(['rec ', 'not ', '- ']) + text(depth)
+            if choice < 0.8:
+                return 'if %s then %s else %s' % (text(depth), text(depth), text(depth))
+            if choice < 0.85:
+                return 'let %s := %s in %s' % (rnd.choice(names), text(depth), text(depth))
+            if choice < 0.93:
+                return '<%s, %s>' % (text(depth), text(depth))
+            return '%s.0' % text(depth)
+
+        for _ in range(300):
+            txt = text(rnd.randint(1, 3))
+            try:
+                expected = repr(parser.parse(txt))
+            except Exception as earley:
+                with self.assertRaises(type(earley), msg=txt):
+                    precedence_parser.parse(txt)
+            else:
+                self.assertEqual(repr(precedence_parser.parse(txt)), expected, txt)
+
+    def test_same_errors(self):
+        for txt in ['', 'a +', '(a', 'λ.x', 'let x := in y', 'a := b']:
+            with self.assertRaises(Exception) as earley:
+                parser.parse(txt)
+            with self.assertRaises(type(earley.exception)):
+                precedence_parser.parse(txt)
+
+    def test_deep_nesting(self):
+        depth = 5000
+        expr = self.parser.parse('(' * depth + 'x' + ')' * depth)
+        self.assertEqual(str(expr), 'x')
+        expr = self.parser.parse('λx.' * depth + 'x')
+        self.assertEqual(expr.size(), depth + 1)
+        expr = self.parser.parse(' + '.join(['1'] * depth))
+        self.assertEqual(expr.size(), 2 * depth - 1)
+
+
+class TestCleanString(unittest.TestCase):
+
+    def setUp(self):
+        self.formatter = CleanFormatter()
+
+    def assertSameAsReparsed(self, expr):
+        self.assertEqual(clean_string(expr), self.formatter.reparsed(expr), str(expr))
+
+    def test_parentheses(self):
+        for txt, expected in [('x', 'x'), ('(f x) y', 'f x y'), ('f (x y)', 'f (x y)'),
+                              ('λx.λy.x y', 'λx.λy.x y'), ('f λx.x y', 'f λx.x y'),
+                              ('λx.f 1 true error', 'λx.f 1 true error'),
+                              # outer pairs the removals one at a time never take out
+                              ('(λx.x) y', '((λx.x) y)'), ('f (λx.x) y', '(f (λx.x) y)')]:
+            self.assertEqual(clean_string(Expr.from_string(txt)), expected)
+
+    def test_same_as_reparsed(self):
+        # including the pairs the removals one at a time can't take out
+        for txt in ['((x1 x1) (λx1.y)) g', '(λx1.λx.g) (λy.x (λf.f))', 'λab.(y x) (λg.f) ab',
+                    'λg.(λg.ab) x1', 'g (g y) λx1.x (λab.ab) λx.f f', 'f λx.g λy.h h',
+                    'a b (f λx.g λy.h)', '(λy.x1) (((λy.y) λg.λx1.g) λx.(λg.x1) λg.ab)']:
+            self.assertSameAsReparsed(Expr.from_string(txt))
+
+    def test_random_terms(self):
+        rnd = random.Random(24)
+        atoms = [Var('x'), Var('y'), Var('f'), Var('x1'), NaturalConstant('2'), BooleanConstant('true')]
+
+        def term(depth):
+            choice = rnd.random()
+            if depth == 0 or choice < 0.2:
+                return rnd.choice(atoms).clone()
+            if choice < 0.55:
+                return Lam(rnd.choice('xyf'), term(depth - 1))
+            return App(term(depth - 1), term(depth - 1))
+
+        for _ in range(200):
+            self.assertSameAsReparsed(term(rnd.randint(1, 7)))
+
+    def test_unsupported(self):
+        for txt in ['f (x + 1) * 2', 'let x := 3 in x + 1', '- (f x)', 'f (if x then y else z)']:
+            expr = Expr.from_string(txt)
+            if 'if' not in txt:
+                with self.assertRaises(Unsupported):
+                    clean_string(expr)
+            self.assertEqual(self.formatter(expr), self.formatter.reparsed(expr))
+
+    def test_deep_nesting(self):
+        depth = 5000
+        expr = Expr.from_string('λx.' * depth + 'x')
+        self.assertEqual(clean_string(expr), 'λx.' * depth + 'x')
+        expr = Expr.from_string('f ' * depth + 'x')
+        self.assertEqual(clean_string(expr), 'f ' * depth + 'x')
+
+
 if __name__ == '__main__':
     unittest.main()
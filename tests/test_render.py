@@ -0,0 +1,80 @@
+from io import StringIO
+import unittest
+
+from lamedh.expr import Expr, Var, Lam, App
+from lamedh.render import ELLIPSIS, pieces, render, write
+from lamedh.terminal import NormalFormatter, PrettyFormatter, CleanFormatter
+
+
+class TestRender(unittest.TestCase):
+
+    def setUp(self):
+        self.expr = Expr.from_string('λx.x y')
+
+    def test_str_and_repr(self):
+        self.assertEqual(render(self.expr), '(λx.(x y))')
+        self.assertEqual(render(self.expr, repr), 'Lam(λx.App(<Var:x> <Var:y>))')
+        self.assertEqual(str(self.expr), render(self.expr))
+        self.assertEqual(repr(self.expr), render(self.expr, repr))
+
+    def test_nodes_from_to_string(self):
+        expr = Expr.from_string('let <a, b> := t, c := - 1 in <a.0, c + error>')
+        self.assertEqual(str(expr), '(let <a, b>:=t, c:=(- 1) in <(a.0), (c + error)>)')
+        self.assertEqual(repr(expr), "(LetIn<<Var:a>, <Var:b>>:=<Var:t>, <Var:c>:=UnaryOp('-' <NaturalConstant:1>) "
+                                     "in <Tuple:(Indexing:<Var:a>.<NaturalConstant:0>), BinaryOp(<Var:c> '+' <Error>)>)")
+
+    def test_node_limit(self):
+        self.assertEqual(render(self.expr, nodes=3), '(λx.(x %s))' % ELLIPSIS)
+        self.assertEqual(render(self.expr, nodes=0), ELLIPSIS)
+        self.assertEqual(render(self.expr, nodes=4), str(self.expr))
+
+    def test_width(self):
+        self.assertEqual(render(self.expr, width=5), '(λx.(' + ELLIPSIS)
+        self.assertEqual(render(self.expr, width=10), str(self.expr))
+
+    def test_write(self):
+        stream = StringIO()
+        write(self.expr, stream, width=7)
+        self.assertEqual(stream.getvalue(), '(λx.(x ' + ELLIPSIS)
+
+    def test_cut_huge_terms(self):
+        expr = Var('f')
+        for _ in range(100000):
+            expr = App(expr, Var('x'))
+        self.assertEqual(render(expr, width=20), '(' * 20 + ELLIPSIS)
+        self.assertEqual(render(expr, nodes=3), '(((%s %s) %s) %s)' % ((ELLIPSIS, ) * 4))
+        # pieces are generated as they're read
+        self.assertEqual(next(pieces(expr)), '(')
+
+    def test_deep_nesting(self):
+        depth = 100000
+        expr = Var('x')
+        for _ in range(depth):
+            expr = Lam('x', expr)
+        self.assertEqual(str(expr), '(λx.' * depth + 'x' + ')' * depth)
+
+
+class TestFormatters(unittest.TestCase):
+
+    def setUp(self):
+        self.expr = Expr.from_string('(λx.x) y')
+
+    def test_pretty(self):
+        formatter = PrettyFormatter()
+        white, pink, blue = formatter.WHITE, formatter.PINK, formatter.BLUE
+        self.assertEqual(formatter(self.expr),
+                         f'{white}{pink}({blue}(λx.x){pink} y){white}')
+
+    def test_as_tree(self):
+        self.assertEqual(NormalFormatter().as_tree(Lam('x', Var('x'))),
+                         '\nLam(\n|  λx.\n|  <Var:x>\n)')
+
+    def test_width(self):
+        self.assertEqual(NormalFormatter(width=8)(self.expr), '((λx.x) ' + ELLIPSIS)
+        self.assertEqual(CleanFormatter(width=7)(self.expr), '((λx.x)' + ELLIPSIS)
+        formatter = PrettyFormatter(width=1)
+        self.assertEqual(formatter(self.expr), f'{formatter.WHITE}{formatter.PINK}(' + ELLIPSIS)
+
+
+if __name__ == '__main__':
+    unittest.main()
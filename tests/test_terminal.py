@@ -1,12 +1,18 @@
 from copy import deepcopy
 from io import StringIO
+import os
+import subprocess
+import sys
 import tempfile
 from unittest.mock import patch
 import unittest
 
 from prompt_toolkit.document import Document
 
-from lamedh.terminal import Terminal, HELP, PromptCompleter
+from lamedh.cache import ResultCache
+from lamedh.expr import binary
+from lamedh.prompt import PromptCompleter
+from lamedh.terminal import Terminal, help_text
 
 
 class BaseTestTerminal(unittest.TestCase):
@@ -19,7 +25,7 @@ class BaseTestTerminal(unittest.TestCase):
         if 'exit' not in inputs:
             # prevent never ending loop
             inputs = inputs + ['exit']  # avoiding modify received inputs
-        with patch('lamedh.terminal.session.prompt', side_effect=inputs):
+        with patch('lamedh.prompt.PromptSession.prompt', side_effect=inputs):
             with patch('os.get_terminal_size') as term_size:
                 # there is an issue with get_terminal_size and pytest
                 term_size.return_value = (80, 24)
@@ -60,8 +66,23 @@ class TestTerminalParsing(BaseTestTerminal):
         self.call_main([f'a = (λx.x)'])
         self.call_main([f'b = (λy.y)'])
         self.call_main([f'c = a b'])
-        c_expr = self.terminal.memory['c']
-        self.assertEqual(str(c_expr), '((λx.x) (λy.y))', )
+        self.assertEqual(str(self.terminal.memory['c']), '(a b)')
+        self.assertEqual(str(self.terminal.memory.unfold('c')), '((λx.x) (λy.y))', )
+
+    def test_operations_unfold_the_definitions(self):
+        self.call_main(['a = (λx.x)', 'b = (λy.y)', 'c = a b'])
+        self.call_main(['result = c -> evalN'])
+        self.assertEqual(str(self.terminal.memory['result']), '(λy.y)')
+        self.call_main(['result = c z -> goto_normal_form'])
+        self.assertEqual(str(self.terminal.memory['result']), 'z')
+
+    def test_redefinitions_dont_change_previous_definitions(self):
+        self.call_main(['a = (λx.x)', 'b = a', 'a = (λz.(z z))', 'a = a a'])
+        self.call_main(['result = b -> evalN'])
+        self.assertEqual(str(self.terminal.memory['result']), '(λx.x)')
+        stdout = self.call_main(['dump'])
+        self.assertIn('b = (λx.x)', stdout.getvalue())
+        self.assertIn('a = ((λz.(z z)) (λz.(z z)))', stdout.getvalue())
 
 
 class TestTerminalHelp(BaseTestTerminal):
@@ -69,7 +90,7 @@ class TestTerminalHelp(BaseTestTerminal):
     def test_help(self):
         inputs = ['?']
         stdout = self.call_main(inputs)
-        self.assertIn(HELP, stdout.getvalue())
+        self.assertIn(help_text(), stdout.getvalue())
 
 
 class TestTerminalMemory(BaseTestTerminal):
@@ -135,6 +156,78 @@ class TestTerminalMemory(BaseTestTerminal):
         self.assertIn(name, self.terminal.memory)
         self.assertEqual(str(self.terminal.memory[name]), expr)
 
+    def test_dump_and_load_binary_memory(self):
+        self.call_main(['a = (λx.x)', 'b = a <1, true>', 'a = a a'])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = temp_dir + '/memory.lmdb'
+            self.call_main(['dump %s' % fname])
+            with open(fname, 'rb') as f:
+                self.assertTrue(f.read().startswith(binary.MAGIC))
+            self.terminal = Terminal()
+            stdout = self.call_main(['load %s' % fname])
+        self.assertIn('2 expressions loaded', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['b']), '((λx.x) <1, true>)')
+        self.assertEqual(str(self.terminal.memory['a']), '((λx.x) (λx.x))')
+
+    def test_dump_and_load_redefinitions(self):
+        for fname in ['memory', 'memory.lmdb']:
+            self.terminal = Terminal()
+            self.call_main(['a = λx.x', 'b = λz.z', 'a = b'])
+            with tempfile.TemporaryDirectory() as temp_dir:
+                self.call_main(['dump %s/%s' % (temp_dir, fname)])
+                self.terminal = Terminal()
+                self.call_main(['load %s/%s' % (temp_dir, fname)])
+            self.assertEqual(list(self.terminal.memory), ['b', 'a'])
+            self.assertEqual(str(self.terminal.memory.unfold('a')), '(λz.z)')
+            self.assertEqual(str(self.terminal.memory.unfold('a').evalN()), '(λz.z)')
+
+    def test_load_compiles_the_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = temp_dir + '/prelude.lmd'
+            with open(fname, 'w') as f:
+                f.write('I = λx.x\nK = λx y.x\nKI = K I\n')
+            self.call_main(['load %s' % fname])
+            self.assertTrue(os.path.isfile(temp_dir + '/prelude.lmdc'))
+
+            self.terminal = Terminal()
+            stdout = self.call_main(['load %s' % fname])
+            self.assertNotIn('new expression parsed:', stdout.getvalue())
+            self.assertIn('3 expressions loaded', stdout.getvalue())
+            self.assertEqual(str(self.terminal.memory['KI']), '(K I)')
+            self.assertEqual(str(self.terminal.memory.unfold('KI')), '((λx.(λy.x)) (λx.x))')
+
+            # compiled again when the source changes
+            with open(fname, 'w') as f:
+                f.write('I = λz.z\n')
+            self.terminal = Terminal()
+            stdout = self.call_main(['load %s' % fname])
+            self.assertIn('new expression parsed:', stdout.getvalue())
+            self.assertEqual(str(self.terminal.memory['I']), '(λz.z)')
+            self.terminal = Terminal()
+            stdout = self.call_main(['load %s' % fname])
+            self.assertIn('1 expressions loaded', stdout.getvalue())
+
+    def test_files_with_errors_are_not_compiled(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = temp_dir + '/prelude.lmd'
+            with open(fname, 'w') as f:
+                f.write('I = λx.x\nexit = λx.x\n')
+            self.call_main(['load %s' % fname])
+            self.assertFalse(os.path.exists(temp_dir + '/prelude.lmdc'))
+
+    def test_unreadable_compiled_files_are_ignored(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = temp_dir + '/prelude.lmd'
+            with open(fname, 'w') as f:
+                f.write('I = λx.x\n')
+            self.call_main(['load %s' % fname])
+            with open(temp_dir + '/prelude.lmdc', 'r+b') as f:
+                f.truncate(30)
+            self.terminal = Terminal()
+            stdout = self.call_main(['load %s' % fname])
+            self.assertIn('new expression parsed:', stdout.getvalue())
+            self.assertEqual(str(self.terminal.memory['I']), '(λx.x)')
+
     def test_load_memory_unexistent_file_fails(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             fname = temp_dir + '/prelude'  # temp_dir just created. File doesn't exist
@@ -281,6 +374,63 @@ class TestOperationsToExpressions(BaseTestTerminal):
         output = stdout.getvalue()
         self.assertIn(expr_txt, output)
 
+    def test_eval_lazy(self):
+        self.call_main(['name = (λx.(x x)) (λy.y)'])
+        stdout = self.call_main(['result = name -> evalL'])
+        self.assertIn('=L=>', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['result']), '(λy.y)')
+
+    def test_provide_backend_to_operation(self):
+        self.call_main(['name = (λx.(x x)) (λy.y)'])
+        stdout = self.call_main(['result = name -> goto_normal_form(10, nbe)'])
+        self.assertIn('0 redices', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['result']), '(λy.y)')
+
+    def test_nbe_backend_stops_at_max_steps(self):
+        self.call_main(['name = (λx.(x x)) (λx.(x x))'])
+        stdout = self.call_main(['result = name -> goto_normal_form(nbe)'])
+        self.assertIn('reducing with the named backend', stdout.getvalue())
+        self.assertNotIn('Error', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['result']), '((λx.(x x)) (λx.(x x)))')
+
+    def test_provide_unknown_backend_fails(self):
+        self.call_main(['name = (λx.(x x)) (λy.y)'])
+        stdout = self.call_main(['name -> evalN(yadda)'])
+        self.assertIn('Unknown backend yadda', stdout.getvalue())
+
+    def test_operation_results_are_not_cached_by_default(self):
+        self.call_main(['name = (λx.(x x)) (λy.y)', 'name -> evalN'])
+        stdout = self.call_main(['result = name -> evalN'])
+        self.assertNotIn('cached result', stdout.getvalue())
+        self.assertIn('=N=>', stdout.getvalue())
+
+    def test_operation_results_are_cached(self):
+        self.terminal.cache = ResultCache()
+        self.call_main(['name = (λx.(x x)) (λy.y)'])
+        self.call_main(['name -> evalN'])
+        stdout = self.call_main(['result = name -> evalN'])
+        self.assertIn('cached result', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['result']), '(λy.y)')
+        # alpha-equivalent terms get results with their own names
+        stdout = self.call_main(['other = (λa.(a a)) (λb.b)', 'other = other -> evalN'])
+        self.assertNotIn('cached result', stdout.getvalue())
+        self.assertEqual(str(self.terminal.memory['other']), '(λb.b)')
+
+    def test_as_tree(self):
+        self.call_main(['name = λx.x'])
+        stdout = self.call_main(['name -> as_tree'])
+        self.assertIn('Lam(\n|  λx.\n|  <Var:x>\n)', stdout.getvalue())
+
+    def test_trace_width(self):
+        self.call_main(['name = (λx.x) (λy.y y y y)', 'TRACE_WIDTH = 10'])
+        stdout = self.call_main(['result = name -> goto_normal_form'])
+        output = stdout.getvalue()
+        self.assertIn('step 0 -> ((λx.x) (λ...', output)
+        self.assertIn('step 1 -> (λy.(((y y...', output)
+        # the result is shown whole
+        self.assertEqual(self.last_line(stdout), self.terminal.OUT + ' (λy.(((y y) y) y))')
+        self.assertNotIn('TRACE_WIDTH', dict(self.terminal.dumped_definitions()))
+
     def test_provide_max_steps_no_parse_gracefully(self):
         # just test that the terminal does not crash
         name = 'name'
@@ -302,5 +452,23 @@ class TestUnnamedExpression(BaseTestTerminal):
         self.assertEqual(len(self.terminal.memory),2)
         self.assertIn("_", self.terminal.memory)
 
+
+class TestLazyStartup(unittest.TestCase):
+
+    def imported_modules(self, code):
+        # modules loaded by running code in a fresh interpreter
+        script = code + '; import sys; print(" ".join(sys.modules))'
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        return output.stdout.split()
+
+    def test_importing_the_terminal_skips_prompt_toolkit_and_lark(self):
+        modules = self.imported_modules('import lamedh.cli; lamedh.cli.Terminal()')
+        self.assertNotIn('prompt_toolkit', modules)
+        self.assertNotIn('lark', modules)
+
+    def test_parsing_skips_lark(self):
+        modules = self.imported_modules('from lamedh.expr import Expr; Expr.from_string("λx.x y")')
+        self.assertNotIn('lark', modules)
+
 if __name__ == '__main__':
     unittest.main()